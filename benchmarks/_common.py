@@ -0,0 +1,27 @@
+"""Helpers shared by the benchmark scripts."""
+
+import platform
+import timeit
+from datetime import datetime
+
+OPTIONAL_MODULES = ('scipy', 'pyfftw') # versions recorded when installed
+
+def time_call(func, repeat: int) -> float:
+    """Best time of one call of func() in seconds."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def machine_info() -> dict:
+    """When and where a benchmark ran, for the meta of its results."""
+    import numpy as np # imported here, import_time.py times it in fresh interpreters
+    info = dict(date=datetime.now().isoformat(timespec='seconds'),
+                python=platform.python_version(), numpy=np.__version__,
+                machine=platform.machine(), processor=platform.processor(),
+                node=platform.node())
+    for module in OPTIONAL_MODULES:
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            pass
+    return info
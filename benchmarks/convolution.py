@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""Time linear convolution methods over signal and kernel lengths.
+
+Every method is checked against a zero-padded FFT reference before it is
+timed. Results are written as JSON, and --compare flags any case that got
+slower than a stored baseline by more than --threshold.
+
+--calibrate instead times the methods the way dsp.convolution.calibrate
+does and saves the cost models convolve picks its method by, replacing the
+static defaults on this machine.
+
+Examples:
+    python benchmarks/convolution.py -o baseline.json
+    python benchmarks/convolution.py --compare baseline.json
+    python benchmarks/convolution.py --calibrate
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1])) # repo root, for the dsp package
+from dsp.convolution import (calibrate, calibration_path, direct_convolve, fft_convolve,
+                              overlap_add, overlap_save)
+from _common import machine_info, time_call
+
+def scipy_oaconvolve(x, h):
+    from scipy.signal import oaconvolve
+    return oaconvolve(x, h)
+
+METHODS = {
+    'direct': direct_convolve,
+    'fft': fft_convolve,
+    'overlap_add': overlap_add,
+    'overlap_save': overlap_save,
+    'scipy_oaconvolve': scipy_oaconvolve,
+}
+
+SIGNAL_LENGTHS = (64, 256, 1024, 4096, 16384, 65536, 262144)
+KERNEL_LENGTHS = (8, 16, 64, 256, 1024)
+QUICK_SIGNAL_LENGTHS = (256, 4096, 65536)
+QUICK_KERNEL_LENGTHS = (16, 256)
+
+def run(signal_lengths, kernel_lengths, methods, dtype, repeat: int, max_direct: float,
+        seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    results = []
+    failures = []
+    for n in signal_lengths:
+        for m in kernel_lengths:
+            if m > n:
+                continue
+            x = rng.standard_normal(n)
+            h = rng.standard_normal(m)
+            if np.issubdtype(dtype, np.complexfloating):
+                x = x + 1j*rng.standard_normal(n)
+            x = x.astype(dtype)
+            ref = fft_convolve(x.astype(np.result_type(dtype, np.float64)), h)
+            tol = 1e-5 if np.finfo(dtype).bits == 32 else 1e-9 # relative to the peak output
+
+            for name in methods:
+                if name == 'direct' and n * m > max_direct:
+                    continue
+                func = METHODS[name]
+                y = func(x, h)
+                if y.shape != ref.shape or not np.allclose(y, ref, rtol=0, atol=tol * np.abs(ref).max()):
+                    failures.append((name, n, m))
+                    print(f'{name:>16} n={n:<7} m={m:<5} INCORRECT')
+                    continue
+                seconds = time_call(lambda: func(x, h), repeat)
+                results.append(dict(method=name, signal_length=n, kernel_length=m,
+                                    dtype=np.dtype(dtype).name, seconds=seconds))
+                print(f'{name:>16} n={n:<7} m={m:<5} {seconds*1e6:12.1f} us')
+
+    return dict(meta=machine_info(), results=results,
+                failures=[dict(method=f, signal_length=n, kernel_length=m) for f, n, m in failures])
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Cases in results slower than baseline by more than a factor of threshold."""
+    def key(r):
+        return r['method'], r['signal_length'], r['kernel_length'], r['dtype']
+
+    base = {key(r): r['seconds'] for r in baseline['results']}
+    regressions = []
+    for r in results['results']:
+        if key(r) not in base:
+            continue
+        ratio = r['seconds'] / base[key(r)]
+        if ratio > threshold:
+            regressions.append(dict(r, baseline_seconds=base[key(r)], ratio=ratio))
+    return regressions
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', type=Path, help='write results to this JSON file')
+    parser.add_argument('--compare', type=Path, help='baseline JSON file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown factor counted as a regression (default 1.25)')
+    parser.add_argument('--methods', nargs='+', default=list(METHODS), choices=list(METHODS))
+    parser.add_argument('-n', '--signal-lengths', nargs='+', type=int)
+    parser.add_argument('-m', '--kernel-lengths', nargs='+', type=int)
+    parser.add_argument('--dtype', default='float64', choices=['float32', 'float64', 'complex64', 'complex128'])
+    parser.add_argument('--repeat', type=int, default=5, help='timing repeats, the best is kept')
+    parser.add_argument('--max-direct', type=float, default=1e9,
+                        help='skip direct convolution above this many multiplies')
+    parser.add_argument('--quick', action='store_true', help='small sweep for a fast check')
+    parser.add_argument('--calibrate', action='store_true',
+                        help='save cost models of this machine for convolve, then exit')
+    args = parser.parse_args()
+
+    if args.calibrate:
+        calibrate()
+        print(f'saved the convolution cost models to {calibration_path()}')
+        sys.exit(0)
+
+    signal_lengths = args.signal_lengths or (QUICK_SIGNAL_LENGTHS if args.quick else SIGNAL_LENGTHS)
+    kernel_lengths = args.kernel_lengths or (QUICK_KERNEL_LENGTHS if args.quick else KERNEL_LENGTHS)
+
+    results = run(signal_lengths, kernel_lengths, args.methods, np.dtype(args.dtype),
+                  args.repeat, args.max_direct)
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    status = 1 if results['failures'] else 0
+
+    if args.compare is not None:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['method']} n={r['signal_length']} m={r['kernel_length']}: "
+                  f"{r['baseline_seconds']*1e6:.1f} us -> {r['seconds']*1e6:.1f} us ({r['ratio']:.2f}x)")
+        if regressions:
+            status = 1
+        else:
+            print(f'no regressions against {args.compare}')
+
+    sys.exit(status)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""Time the FFT backends on the transform shapes the package uses.
+
+Each installed backend is checked against numpy.fft and then timed on
+single transforms (spectrum plots, the hw3 timing loop, matched filter
+references) and on batches of blocks (overlap-save, the matched filter
+bank), where the worker threads can help. Results are written as JSON.
+
+Examples:
+    python benchmarks/fft.py
+    python benchmarks/fft.py --workers 1 4 -o fft.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1])) # repo root, for the dsp package
+from dsp.transforms import FFT_BACKENDS, fft, use_fft_backend
+from _common import machine_info, time_call
+
+# (batch, length): one transform or a stack transformed along the last axis
+SHAPES = ((1, 256), (1, 3096), (1, 8192), (1, 2**16), (1, 2**20), (256, 64), (1024, 1024), (64, 4096))
+DTYPES = ('complex128', 'complex64')
+
+def available_backends() -> list:
+    backends = []
+    for name in FFT_BACKENDS:
+        try:
+            with use_fft_backend(name):
+                pass
+        except ImportError:
+            print(f'{name} is not installed, skipped')
+            continue
+        backends.append(name)
+    return backends
+
+def run(backends, workers, shapes, dtypes, repeat: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    results, failures = [], []
+    for dtype in dtypes:
+        tol = 1e-4 if np.dtype(dtype) == np.complex64 else 1e-10 # relative to the peak output
+        for shape in shapes:
+            x = (rng.standard_normal(shape) + 1j*rng.standard_normal(shape)).astype(dtype)
+            ref = np.fft.fft(x.astype(np.complex128), axis=-1)
+            for name in backends:
+                # numpy.fft has no threads, one run is enough
+                for n_workers in (workers if name != 'numpy' else workers[:1]):
+                    with use_fft_backend(name, n_workers):
+                        y = fft(x, axis=-1)
+                        if y.dtype != x.dtype or not np.allclose(y, ref, rtol=0, atol=tol * np.abs(ref).max()):
+                            failures.append(dict(backend=name, shape=list(shape), dtype=dtype))
+                            print(f'{name:>7} {dtype:>10} {str(shape):>12} INCORRECT')
+                            continue
+                        seconds = time_call(lambda: fft(x, axis=-1), repeat)
+                    results.append(dict(backend=name, workers=n_workers, shape=list(shape),
+                                        dtype=dtype, seconds=seconds))
+                    print(f'{name:>7} x{n_workers:<3} {dtype:>10} {str(shape):>12} {seconds*1e6:12.1f} us')
+    return dict(meta=machine_info(), results=results, failures=failures)
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', type=Path, help='write results to this JSON file')
+    parser.add_argument('--backends', nargs='+', choices=list(FFT_BACKENDS),
+                        help='backends to time (default every installed one)')
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, -1],
+                        help='worker counts to time, -1 for all CPUs (default 1 -1)')
+    parser.add_argument('--dtype', nargs='+', default=list(DTYPES), choices=list(DTYPES))
+    parser.add_argument('--repeat', type=int, default=5, help='timing repeats, the best is kept')
+    args = parser.parse_args()
+
+    results = run(args.backends or available_backends(), args.workers, SHAPES, args.dtype, args.repeat)
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    sys.exit(1 if results['failures'] else 0)
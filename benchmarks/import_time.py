@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""Time `import dsp` in fresh interpreters and check it stays numpy-only.
+
+Each run starts a new Python process, so nothing is already cached in
+sys.modules. The import fails the check if it pulls in any of the heavy
+optional modules (scipy, matplotlib, ...), and --compare flags a startup
+slower than a stored baseline by more than --threshold.
+
+Examples:
+    python benchmarks/import_time.py -o baseline.json
+    python benchmarks/import_time.py --compare baseline.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from _common import machine_info
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# modules only the functions that need them may import
+HEAVY_MODULES = ('scipy', 'matplotlib', 'concurrent.futures', 'pyfftw')
+
+PROBE = '''
+import sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(seconds)
+print(' '.join(sorted(sys.modules)))
+'''
+
+def time_import(module: str, baseline_module: Optional[str] = None) -> Tuple[float, List[str]]:
+    """Seconds to import module in a new interpreter, and the modules it loaded.
+
+    Args:
+        module (str): Module to import
+        baseline_module (str, optional): Imported before starting the clock,
+            so its cost is left out. Defaults to None.
+
+    Returns:
+        (float, list): Import time in seconds and the names in sys.modules after it
+    """
+    code = PROBE.format(module=module)
+    if baseline_module is not None:
+        code = f'import {baseline_module}\n' + code
+    out = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, check=True,
+                         stdout=subprocess.PIPE, universal_newlines=True).stdout.splitlines()
+    return float(out[0]), out[1].split()
+
+def run(repeat: int) -> dict:
+    # numpy dominates the total, so also time dsp on top of an imported numpy
+    totals, own = [], []
+    for _ in range(repeat):
+        seconds, modules = time_import('dsp')
+        totals.append(seconds)
+        own.append(time_import('dsp', baseline_module='numpy')[0])
+
+    heavy = sorted(m for m in modules
+                   if any(m == h or m.startswith(h + '.') for h in HEAVY_MODULES))
+    numpy_seconds = min(time_import('numpy')[0] for _ in range(repeat))
+
+    return dict(meta=machine_info(),
+                results=dict(total_seconds=min(totals), dsp_seconds=min(own),
+                             numpy_seconds=numpy_seconds),
+                heavy_modules=heavy)
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Timings in results slower than baseline by more than a factor of threshold.
+
+    Only the time spent in dsp itself is compared, as numpy's own import
+    time depends on the installed version.
+    """
+    seconds = results['results']['dsp_seconds']
+    base = baseline['results']['dsp_seconds']
+    ratio = seconds / base
+    if ratio > threshold:
+        return [dict(name='dsp_seconds', seconds=seconds, baseline_seconds=base, ratio=ratio)]
+    return []
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', type=Path, help='write results to this JSON file')
+    parser.add_argument('--compare', type=Path, help='baseline JSON file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='slowdown factor counted as a regression (default 1.5)')
+    parser.add_argument('--repeat', type=int, default=7, help='fresh interpreters per timing, the best is kept')
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    r = results['results']
+    print(f"import dsp: {r['total_seconds']*1e3:.1f} ms "
+          f"({r['dsp_seconds']*1e3:.1f} ms after numpy, numpy alone {r['numpy_seconds']*1e3:.1f} ms)")
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    status = 0
+    if results['heavy_modules']:
+        print('HEAVY IMPORTS', ' '.join(results['heavy_modules']))
+        status = 1
+
+    if args.compare is not None:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.threshold)
+        for reg in regressions:
+            print(f"REGRESSION {reg['name']}: {reg['baseline_seconds']*1e3:.1f} ms -> "
+                  f"{reg['seconds']*1e3:.1f} ms ({reg['ratio']:.2f}x)")
+        if regressions:
+            status = 1
+        else:
+            print(f'no regressions against {args.compare}')
+
+    sys.exit(status)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""Compare single precision processing against the double precision reference.
+
+Runs the hw1 quantization SQNR measurement and the hw4 receiver chain
+(fs/4 downconversion, three decimate by 5 stages and pulse compression)
+once under each precision policy. The receiver input is generated once in
+double precision and rounded to complex64 for the single precision run, so
+the differences are those of the arithmetic alone. The check fails if a
+pulse compression peak or an SQNR moves by more than its tolerance.
+
+Examples:
+    python benchmarks/precision.py
+    python benchmarks/precision.py --duration 2e-4 -o precision.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1])) # repo root, for the dsp package
+from dsp import (CFARDetector, MatchedFilterBank, PulseScenario, SNRMetrics, chirp,
+                 get_quantization_levels, multitone, quantize, receive, sinusoid, use_precision)
+from _common import machine_info
+
+PRECISIONS = ('double', 'single')
+NUM_TAPS = 64 # taps of every hw4 filter stage
+
+def sqnr_report(bits=(2, 4, 6, 8, 10, 12, 14, 16)) -> list:
+    """hw1 SQNR of a three tone signal for each number of bits, per precision."""
+    rows = []
+    for num_bits in bits:
+        row = dict(num_bits=num_bits)
+        for name in PRECISIONS:
+            with use_precision(name):
+                x = multitone(3000, [100, 200, 300], 300e-3) / 3
+                x_max = max(max(x.real), max(x.imag))
+                xq = quantize(x, get_quantization_levels(x_max, num_bits))
+                metrics = SNRMetrics()
+                metrics.update(x, xq)
+                row[name] = metrics.snr
+        rows.append(row)
+    return rows
+
+def receiver_input(duration: float, snr: float, seed: int):
+    """hw4 scenario: LFM pulses on an fs/4 carrier in unit power noise, in double precision."""
+    fs, pw, bw = 5e9, 10e-6, 8e6
+    n_pw = round(fs * pw)
+    lfm = chirp(fs=fs, pw=pw, bw=bw, dtype=np.complex128)
+    lfm = lfm * float(np.sqrt(10**(snr/10)) / np.std(lfm))
+    lfm = lfm * sinusoid(fs, fs/4, n_pw / fs, dtype=np.complex128)
+
+    rng = np.random.default_rng(seed)
+    num_slots = round(duration / pw)
+    starts = np.flatnonzero(rng.integers(0, 2, size=num_slots)) * n_pw
+    with PulseScenario(round(fs * duration), lfm, starts, seed=seed, dtype=np.complex128) as scenario:
+        return scenario.generate(), starts, fs, pw, bw
+
+def pulse_compression(x: np.ndarray, fs: float, pw: float, bw: float, block_size: int = 2**20):
+    """Run the hw4 chain over x under the current policy; seconds, |r| and CFAR detections."""
+    from scipy import signal
+    fsd = fs / 4 / 5**3
+    lpf = signal.firwin(NUM_TAPS, cutoff=fs/8, width=1e6, fs=fs)
+    lpf_dec5 = signal.firwin(NUM_TAPS, cutoff=1/10, width=1/20, fs=1)
+    bank = MatchedFilterBank.lfm(fs=fsd, pulses=[(pw, bw)])
+    detector = CFARDetector(sample_rate=fsd)
+
+    start = time.perf_counter()
+    blocks = (x[i : i + block_size] for i in range(0, len(x), block_size))
+    outputs, detections = [], []
+    for _, (r,) in receive(blocks, lpf, lpf_dec5, bank):
+        outputs.append(r)
+        detections += detector.process(r)
+    detections += detector.flush()
+    seconds = time.perf_counter() - start
+    return seconds, np.concatenate(outputs), detections
+
+def pulse_report(duration: float, snr: float, seed: int) -> dict:
+    x, starts, fs, pw, bw = receiver_input(duration, snr, seed)
+    inputs = dict(double=x, single=x.astype(np.complex64))
+
+    runs = {}
+    for name in PRECISIONS:
+        with use_precision(name):
+            runs[name] = pulse_compression(inputs[name], fs, pw, bw)
+    (t64, r64, d64), (t32, r32, d32) = runs['double'], runs['single']
+    if r32.dtype != np.float32:
+        raise TypeError(f'single precision chain returned {r32.dtype}')
+
+    # compression peaks at the pulse centres, delayed by the decimate by 5 filters
+    delay = sum((NUM_TAPS - 1) / 2 / 5**k for k in range(1, 4))
+    centres = np.round((starts + round(fs * pw) / 2) / 500 + delay).astype(int)
+    peaks = []
+    for c in centres:
+        window = slice(max(c - 2, 0), c + 3)
+        i = window.start + int(np.argmax(r64[window]))
+        peaks.append((i, r64[i], window.start + int(np.argmax(r32[window])), r32[i]))
+    peaks = np.array(peaks)
+    peak_error_db = 20 * np.log10(peaks[:, 3] / peaks[:, 1])
+
+    return dict(num_samples=len(x), num_pulses=len(starts),
+                seconds=dict(double=t64, single=t32),
+                input_bytes=dict(double=inputs['double'].nbytes, single=inputs['single'].nbytes),
+                max_peak_error_db=float(np.max(np.abs(peak_error_db))),
+                mean_peak_error_db=float(np.mean(peak_error_db)),
+                peak_index_changes=int(np.sum(peaks[:, 0] != peaks[:, 2])),
+                relative_rms_error_db=float(10 * np.log10(np.sum((r32 - r64)**2) / np.sum(r64**2))),
+                detections=dict(double=len(d64), single=len(d32),
+                                same_indices=[d.index for d in d64] == [d.index for d in d32]))
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', type=Path, help='write results to this JSON file')
+    parser.add_argument('--duration', type=float, default=1e-3, help='receiver input length in seconds')
+    parser.add_argument('--snr', type=float, default=-20, help='pulse SNR in dB at the input')
+    parser.add_argument('--seed', type=int, default=123)
+    parser.add_argument('--peak-tolerance', type=float, default=0.01,
+                        help='largest pulse compression peak change in dB (default 0.01)')
+    parser.add_argument('--sqnr-tolerance', type=float, default=0.1,
+                        help='largest SQNR change in dB (default 0.1)')
+    args = parser.parse_args()
+
+    sqnr = sqnr_report()
+    print('hw1 SQNR (dB)')
+    print(f"{'bits':>6} {'double':>10} {'single':>10} {'change':>10}")
+    for row in sqnr:
+        print(f"{row['num_bits']:>6} {row['double']:>10.4f} {row['single']:>10.4f} "
+              f"{row['single'] - row['double']:>10.4f}")
+
+    pulses = pulse_report(args.duration, args.snr, args.seed)
+    print(f"\nhw4 pulse compression, {pulses['num_pulses']} pulses in {pulses['num_samples']} samples")
+    print(f"  time: {pulses['seconds']['double']:.2f} s double, {pulses['seconds']['single']:.2f} s single")
+    print(f"  input: {pulses['input_bytes']['double']/2**20:.0f} MiB double, "
+          f"{pulses['input_bytes']['single']/2**20:.0f} MiB single")
+    print(f"  peak change: max {pulses['max_peak_error_db']:.2e} dB, mean {pulses['mean_peak_error_db']:.2e} dB, "
+          f"{pulses['peak_index_changes']} peaks moved")
+    print(f"  output error: {pulses['relative_rms_error_db']:.1f} dB relative to the output power")
+    d = pulses['detections']
+    print(f"  CFAR detections: {d['double']} double, {d['single']} single, "
+          f"{'same' if d['same_indices'] else 'different'} indices")
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(dict(meta=machine_info(), sqnr=sqnr, pulse_compression=pulses),
+                                          indent=2))
+
+    status = 0
+    worst_sqnr = max(abs(row['single'] - row['double']) for row in sqnr)
+    if worst_sqnr > args.sqnr_tolerance:
+        print(f'SQNR changed by {worst_sqnr:.3f} dB, more than {args.sqnr_tolerance} dB')
+        status = 1
+    if pulses['max_peak_error_db'] > args.peak_tolerance or pulses['peak_index_changes']:
+        print(f"pulse compression peaks changed by up to {pulses['max_peak_error_db']:.3g} dB")
+        status = 1
+    sys.exit(status)
@@ -0,0 +1,25 @@
+"""Reusable DSP building blocks shared by the homework scripts."""
+
+from .precision import (as_precision, complex_dtype, get_precision, real_dtype, set_precision,
+                        use_precision)
+from .transforms import get_fft_backend, get_fft_workers, set_fft_backend, use_fft_backend
+from .quantization import get_quantization_levels, quantization_sqnr, quantize
+from .decimation import FS4Downconverter, PolyphaseDecimator, decimate, fs4_downconvert
+from .capture import IQCapture, write_iq
+from .scenario import NoiseSource, PulseScenario, add_pulses, complex_noise
+from .waveforms import (NCO, chirp, dirac_comb, kronecker_delta, multitone, rect, sinusoid,
+                        waveform_cache)
+from .matched_filter import MatchedFilterBank, lfm_spectrum, matched_filter, reference_spectrum
+from .convolution import (choose_method, convolve, correlate, direct_convolve, fft_convolve,
+                          overlap_add, overlap_save)
+from .spectrum import SpectrumEstimator, spectrum
+from .cfar import CFARDetector, Detection, cfar, cfar_threshold, score_detections
+from .multistage import DecimationPlan, DecimationStage, design_stage, plan_decimation
+from .pipeline import Pipeline, PipelineAborted, RingBuffer
+from .profiling import Profiler, Span
+from .receiver import receive, receiver_pipeline
+from .equalizer import InverseSincEqualizer, design_inverse_sinc, passband_error, zoh_response
+from .upsampling import ZeroOrderHold
+from .metrics import SignalMetrics, SNRMetrics
+from .sweep import SweepResult, code_hash, sweep
+from .figures import FigureRenderer, FigureSpec, figure
@@ -0,0 +1,144 @@
+"""Block-streamed access to interleaved IQ capture files."""
+
+from pathlib import Path
+from typing import Iterator, Union
+import numpy as np
+
+# on-disk element type for each supported IQ file format
+FORMATS = {
+    'int16': np.dtype(np.int16),
+    'float32': np.dtype(np.float32),
+    'complex64': np.dtype(np.complex64),
+}
+
+INT16_FULL_SCALE = 2**15
+
+class IQCapture:
+    """Read an interleaved IQ file through np.memmap in fixed-size blocks.
+
+    Nothing is read until a block is used, and float32/complex64 blocks are
+    complex64 views into the mapped file, so peak resident memory depends
+    on the block size and not on the length of the capture.
+
+    Consecutive blocks start block_size - overlap samples apart, so each
+    block repeats the last overlap samples of the one before it. The final
+    block may be shorter than block_size.
+
+    Args:
+        path (str or Path): IQ file, I and Q interleaved
+        fmt (str, optional): 'int16', 'float32' or 'complex64'. Defaults to 'complex64'.
+        block_size (int, optional): Samples per block. Defaults to 2**20.
+        overlap (int, optional): Samples shared by consecutive blocks. Defaults to 0.
+        offset (int, optional): Header size in bytes to skip. Defaults to 0.
+    """
+
+    def __init__(self, path: Union[str, Path], fmt: str = 'complex64',
+                 block_size: int = 2**20, overlap: int = 0, offset: int = 0):
+        if fmt not in FORMATS:
+            raise ValueError(f'fmt must be one of {sorted(FORMATS)}, not {fmt!r}')
+        if not 0 <= overlap < block_size:
+            raise ValueError('overlap must be in [0, block_size)')
+
+        self.path = Path(path)
+        self.fmt = fmt
+        self.block_size = int(block_size)
+        self.overlap = int(overlap)
+
+        raw = np.memmap(self.path, dtype=FORMATS[fmt], mode='r', offset=offset)
+        if fmt == 'complex64':
+            self._samples = raw
+        elif fmt == 'float32':
+            self._samples = raw[: len(raw) // 2 * 2].view(np.complex64)
+        else:
+            self._samples = raw[: len(raw) // 2 * 2].reshape((-1, 2))
+
+    @property
+    def num_samples(self) -> int:
+        """Number of complex samples in the file."""
+        return len(self._samples)
+
+    @property
+    def hop(self) -> int:
+        """Distance in samples between the starts of consecutive blocks."""
+        return self.block_size - self.overlap
+
+    def __len__(self) -> int:
+        """Number of blocks."""
+        if self.num_samples == 0:
+            return 0
+        return max(1, -(-(self.num_samples - self.overlap) // self.hop))
+
+    def block(self, index: int) -> np.ndarray:
+        """Return block index as a view into the file.
+
+        Blocks of a float32 or complex64 file are complex64. Blocks of an
+        int16 file are (n, 2) int16 arrays of raw I/Q counts; use
+        complex_blocks to get them scaled to complex values.
+
+        Args:
+            index (int): Block number
+
+        Returns:
+            np.ndarray: View of the samples in the block
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f'block {index} out of range for {len(self)} blocks')
+        start = index * self.hop
+        return self._samples[start : start + self.block_size]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for index in range(len(self)):
+            yield self.block(index)
+
+    def complex_blocks(self, dtype=np.complex64) -> Iterator[np.ndarray]:
+        """Yield every block as a complex array.
+
+        float32 and complex64 files yield views into the file when dtype is
+        complex64. int16 files are scaled to [-1, 1) and written into one
+        preallocated buffer that is reused for every block, so each block
+        must be consumed before asking for the next.
+
+        Args:
+            dtype (optional): Complex output type. Defaults to np.complex64.
+
+        Yields:
+            np.ndarray: Complex samples of the next block
+        """
+        dtype = np.dtype(dtype)
+        buffer = np.empty(min(self.block_size, self.num_samples), dtype=dtype)
+        for raw in self:
+            if raw.dtype == dtype:
+                yield raw
+                continue
+            out = buffer[: len(raw)]
+            if raw.ndim == 2:
+                np.multiply(raw[:, 0], 1 / INT16_FULL_SCALE, out=out.real)
+                np.multiply(raw[:, 1], 1 / INT16_FULL_SCALE, out=out.imag)
+            else:
+                out[:] = raw
+            yield out
+
+def write_iq(path: Union[str, Path], x: np.ndarray, fmt: str = 'complex64', append: bool = False):
+    """Write complex samples to an interleaved IQ file.
+
+    Call with append=True to write a long signal one block at a time.
+
+    Args:
+        path (str or Path): Output file
+        x (np.ndarray): Complex samples, scaled to [-1, 1) for int16
+        fmt (str, optional): 'int16', 'float32' or 'complex64'. Defaults to 'complex64'.
+        append (bool, optional): Append to an existing file. Defaults to False.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'fmt must be one of {sorted(FORMATS)}, not {fmt!r}')
+    x = np.asarray(x)
+    if fmt == 'int16':
+        iq = np.empty((len(x), 2), dtype=np.int16)
+        for i, rail in enumerate((x.real, x.imag)):
+            scaled = np.round(rail * INT16_FULL_SCALE)
+            np.clip(scaled, -INT16_FULL_SCALE, INT16_FULL_SCALE - 1, out=scaled)
+            iq[:, i] = scaled
+    else:
+        iq = x.astype(np.complex64, copy=False)
+    with open(path, 'ab' if append else 'wb') as fid:
+        iq.tofile(fid)
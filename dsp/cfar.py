@@ -0,0 +1,287 @@
+"""Constant false alarm rate (CFAR) detection on pulse compression outputs.
+
+Every cell is compared against a threshold scaled from the noise power of
+the training cells either side of it, skipping guard cells next to the
+cell under test so a target does not raise its own threshold. Detection
+is on the square-law power |x|**2, and the threshold scale is set for a
+false alarm probability pfa in exponentially distributed (Gaussian I/Q)
+noise.
+
+Cell averaging (CA) sums the training cells from a running cumulative sum,
+so the cost per cell does not grow with the window. Ordered statistic (OS)
+takes the rank-th smallest training cell instead, which is robust to
+other targets in the window. Cells within num_guard + num_train of either
+end of the signal only have training cells on one side and use those.
+"""
+
+from collections import namedtuple
+from typing import List, Optional, Sequence
+import numpy as np
+
+Detection = namedtuple('Detection', ['index', 'time', 'snr'])
+Detection.__doc__ = """A target found by CFAR.
+
+index (int): Sample index of the peak cell
+time (float): index / sample_rate
+snr (float): Peak power over the estimated noise power, in dB
+"""
+
+def ca_scale(num_cells, pfa: float):
+    """Threshold scale for cell averaging over num_cells training cells."""
+    num_cells = np.asarray(num_cells, dtype=float)
+    return num_cells * (pfa ** (-1 / num_cells) - 1)
+
+def os_scale(num_cells: int, rank: int, pfa: float) -> float:
+    """Threshold scale for the rank-th smallest of num_cells training cells.
+
+    Solves pfa = prod_{i=0}^{rank-1} (num_cells - i) / (num_cells - i + scale)
+    for scale by bisection.
+    """
+    def false_alarm(scale):
+        i = np.arange(rank)
+        return np.prod((num_cells - i) / (num_cells - i + scale))
+
+    lo, hi = 0.0, 1.0
+    while false_alarm(hi) > pfa:
+        hi *= 2
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if false_alarm(mid) > pfa:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+def _window_views(p: np.ndarray, start: int, stop: int, offset: int, length: int) -> np.ndarray:
+    """(stop - start, length) view of p[i + offset : i + offset + length] for each cell i."""
+    first = start + offset
+    step = p.strides[0]
+    return np.lib.stride_tricks.as_strided(p[first:], shape=(stop - start, length),
+                                           strides=(step, step), writeable=False)
+
+def _noise(p: np.ndarray, start: int, stop: int, num_train: int, num_guard: int,
+           method: str, rank: int, pfa: float):
+    """Threshold of cells start..stop-1 of power p, and their noise estimate.
+
+    Training windows that fall outside p are left out. A cell with no
+    training cells at all gets an infinite threshold.
+    """
+    W = num_guard + num_train
+    idx = np.arange(start, stop)
+    lag = idx - W >= 0 # lagging window inside p
+    lead = idx + W < len(p) # leading window inside p
+
+    if method == 'ca':
+        c = np.concatenate([[0.0], np.cumsum(p, dtype=np.float64)])
+        lag_sum = np.where(lag, c[np.clip(idx - num_guard, 0, None)] - c[np.clip(idx - W, 0, None)], 0)
+        lead_sum = np.where(lead, c[np.clip(idx + W + 1, None, len(p))]
+                            - c[np.clip(idx + num_guard + 1, None, len(p))], 0)
+        num_cells = num_train * (lag.astype(int) + lead)
+        trained = num_cells > 0
+        noise = (lag_sum + lead_sum) / np.maximum(num_cells, 1)
+        threshold = np.where(trained, ca_scale(np.maximum(num_cells, 1), pfa) * noise, np.inf)
+        return threshold, noise
+
+    # ordered statistic of both windows where possible, of the one inside p otherwise
+    threshold = np.full(len(idx), np.inf)
+    noise = np.zeros(len(idx))
+    for use_lag, use_lead in ((True, True), (True, False), (False, True)):
+        mask = (lag == use_lag) & (lead == use_lead)
+        cells = idx[mask]
+        if len(cells) == 0:
+            continue
+        # the cells of each case are contiguous, so strided windows cover them
+        a, b = cells[0], cells[-1] + 1
+        windows = []
+        if use_lag:
+            windows.append(_window_views(p, a, b, -W, num_train))
+        if use_lead:
+            windows.append(_window_views(p, a, b, num_guard + 1, num_train))
+        training = np.concatenate(windows, axis=1)
+        k = rank if use_lag and use_lead else -(-rank // 2) # rank scaled to one window
+        stat = np.partition(training, k - 1, axis=1)[:, k - 1]
+        noise[mask] = stat
+        threshold[mask] = os_scale(training.shape[1], k, pfa) * stat
+    return threshold, noise
+
+def cfar_threshold(x: np.ndarray, num_train: int = 16, num_guard: int = 4, pfa: float = 1e-6,
+                   method: str = 'ca', rank: Optional[int] = None) -> np.ndarray:
+    """Detection threshold on |x|**2 for every cell of a whole signal.
+
+    Args:
+        x (np.ndarray): Pulse compression output, complex or its magnitude
+        num_train (int, optional): Training cells on each side. Defaults to 16.
+        num_guard (int, optional): Guard cells on each side. Defaults to 4.
+        pfa (float, optional): False alarm probability. Defaults to 1e-6.
+        method (str, optional): 'ca' or 'os'. Defaults to 'ca'.
+        rank (int, optional): Order statistic for 'os', out of 2*num_train.
+            Defaults to 3/4 of the training cells.
+
+    Returns:
+        np.ndarray: Threshold on the power of each cell
+    """
+    p = np.abs(x) ** 2
+    rank = _check(num_train, num_guard, method, rank)
+    return _noise(p, 0, len(p), num_train, num_guard, method, rank, pfa)[0]
+
+def _check(num_train: int, num_guard: int, method: str, rank: Optional[int]) -> int:
+    if num_train < 1 or num_guard < 0:
+        raise ValueError('need at least one training cell and no negative guard cells')
+    if method not in ('ca', 'os'):
+        raise ValueError(f"method must be 'ca' or 'os', not {method!r}")
+    if rank is None:
+        rank = max(1, (3 * 2 * num_train) // 4)
+    if not 1 <= rank <= 2 * num_train:
+        raise ValueError(f'rank must be between 1 and {2 * num_train}')
+    return rank
+
+class CFARDetector:
+    """Streaming CFAR detector returning one detection per target.
+
+    Blocks of the pulse compression output are processed as they arrive.
+    The last num_guard + num_train samples are carried over as training
+    cells for the next block, so a cell is decided once its leading
+    window has arrived. A run of adjacent cells above threshold is one
+    target, reported at its strongest cell, including runs that span blocks.
+
+    Args:
+        num_train (int, optional): Training cells on each side. Defaults to 16.
+        num_guard (int, optional): Guard cells on each side. Defaults to 4.
+        pfa (float, optional): False alarm probability per cell. Defaults to 1e-6.
+        method (str, optional): 'ca' for cell averaging or 'os' for ordered
+            statistic. Defaults to 'ca'.
+        rank (int, optional): Order statistic for 'os', out of 2*num_train.
+            Defaults to 3/4 of the training cells.
+        sample_rate (float, optional): Sample rate of the input, for the
+            detection times. Defaults to 1.
+    """
+
+    def __init__(self, num_train: int = 16, num_guard: int = 4, pfa: float = 1e-6,
+                 method: str = 'ca', rank: Optional[int] = None, sample_rate: float = 1):
+        self.rank = _check(num_train, num_guard, method, rank)
+        self.num_train = num_train
+        self.num_guard = num_guard
+        self.pfa = pfa
+        self.method = method
+        self.sample_rate = sample_rate
+        self.reset()
+
+    def reset(self):
+        """Clear the stream state so the next block starts a new signal."""
+        self._power = np.zeros(0) # carried cells, from signal index self._offset
+        self._offset = 0
+        self._next = 0 # signal index of the next undecided cell
+        self._run = None # (peak index, peak power, noise) of a run still open
+
+    def process(self, x: np.ndarray) -> List[Detection]:
+        """Test every cell whose training windows the block completes.
+
+        Args:
+            x (np.ndarray): Next block of the pulse compression output
+
+        Returns:
+            list of Detection: Targets whose runs of detections ended
+        """
+        p = np.concatenate([self._power, np.abs(x) ** 2])
+        W = self.num_guard + self.num_train
+        stop = len(p) - W # cells before this have a complete leading window
+        return self._decide(p, stop, final=False)
+
+    def flush(self) -> List[Detection]:
+        """Decide the last cells, using only their lagging windows, and reset."""
+        detections = self._decide(self._power, len(self._power), final=True)
+        self.reset()
+        return detections
+
+    def _decide(self, p: np.ndarray, stop: int, final: bool) -> List[Detection]:
+        start = self._next - self._offset
+        detections = []
+        if stop > start:
+            threshold, noise = _noise(p, start, stop, self.num_train, self.num_guard,
+                                      self.method, self.rank, self.pfa)
+            detections = self._runs(p[start:stop], threshold, noise, self._next)
+            self._next += stop - start
+        if final and self._run is not None:
+            detections.append(self._detection(*self._run))
+            self._run = None
+
+        # keep the lagging training cells of the next undecided cell onwards
+        keep = max(0, self._next - self._offset - self.num_guard - self.num_train)
+        self._power = p[keep:]
+        self._offset += keep
+        return detections
+
+    def _runs(self, p: np.ndarray, threshold: np.ndarray, noise: np.ndarray,
+              first: int) -> List[Detection]:
+        """Peak of each run of cells above threshold, carrying a run left open."""
+        hits = p > threshold
+        # starts and ends of runs of hits, as indices into p
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], hits.astype(np.int8), [0]])))
+        runs = []
+        for a, b in zip(edges[::2], edges[1::2]):
+            peak = a + int(np.argmax(p[a:b]))
+            runs.append((a, b, (first + peak, p[peak], noise[peak])))
+
+        detections = []
+        if self._run is not None:
+            if runs and runs[0][0] == 0:
+                # the first run continues the one open at the end of the last block
+                a, b, peak = runs[0]
+                runs[0] = (a, b, max(self._run, peak, key=lambda run: run[1]))
+            else:
+                detections.append(self._detection(*self._run))
+            self._run = None
+        if runs and runs[-1][1] == len(p):
+            self._run = runs.pop()[2] # may continue into the next block
+        return detections + [self._detection(*peak) for _, _, peak in runs]
+
+    def _detection(self, index: int, power: float, noise: float) -> Detection:
+        snr = 10 * np.log10(power / noise) if noise > 0 else np.inf
+        return Detection(int(index), float(index / self.sample_rate), float(snr))
+
+def cfar(x: np.ndarray, num_train: int = 16, num_guard: int = 4, pfa: float = 1e-6,
+         method: str = 'ca', rank: Optional[int] = None, sample_rate: float = 1) -> List[Detection]:
+    """Run a CFARDetector over a whole signal.
+
+    Returns:
+        list of Detection: One detection per target, in time order
+    """
+    detector = CFARDetector(num_train, num_guard, pfa, method, rank, sample_rate)
+    return detector.process(x) + detector.flush()
+
+def score_detections(detections: Sequence[Detection], truth: Sequence[int],
+                     tolerance: int = 2) -> dict:
+    """Match detections to true target positions.
+
+    Each true position is matched to at most one detection within tolerance
+    samples, nearest first. Other detections within tolerance of a target,
+    e.g. on the range sidelobes of a strong return, are duplicates rather
+    than false alarms.
+
+    Args:
+        detections (sequence of Detection): Detector output
+        truth (sequence of int): True peak sample indices
+        tolerance (int, optional): Largest index error counted as a hit. Defaults to 2.
+
+    Returns:
+        dict: hits, misses, duplicates, false_alarms, probability of
+            detection pd, and the mean absolute index error of the hits
+    """
+    found = np.array([d.index for d in detections], dtype=float)
+    truth = np.sort(np.asarray(truth, dtype=float).ravel())
+    used = np.zeros(len(found), dtype=bool)
+    errors = []
+    for t in truth:
+        distance = np.where(used, np.inf, np.abs(found - t))
+        if len(distance) and distance.min() <= tolerance:
+            i = int(np.argmin(distance))
+            used[i] = True
+            errors.append(distance[i])
+    hits = len(errors)
+    near = np.array([len(truth) > 0 and np.min(np.abs(truth - f)) <= tolerance for f in found],
+                    dtype=bool)
+    duplicates = int(np.sum(~used & near))
+    return dict(hits=hits, misses=len(truth) - hits, duplicates=duplicates,
+                false_alarms=int(np.sum(~used & ~near)),
+                pd=hits / len(truth) if len(truth) else float('nan'),
+                mean_error=float(np.mean(errors)) if errors else float('nan'))
@@ -0,0 +1,383 @@
+"""Linear convolution by direct summation, zero-padded FFT, overlap-add and overlap-save.
+
+Every method returns the full linear convolution, the same as
+np.convolve(x, h). convolve and correlate are drop-in replacements for
+np.convolve and np.correlate that pick the fastest method from cost models,
+static defaults unless calibrate() has timed this machine. They cast a floating point kernel to the
+precision policy, and the FFT methods transform in the precision of their
+inputs, so single precision signals stay single precision.
+"""
+
+import json
+import os
+import platform
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+import numpy as np
+
+from .precision import as_precision
+from .transforms import fft, get_fft_backend, ifft, irfft, rfft
+
+def next_pow2(n: int) -> int:
+    """Smallest power of two >= n."""
+    return 1 << max(0, int(n) - 1).bit_length()
+
+def _transforms(*arrays):
+    """Forward and inverse FFTs to use, rfft when every input is real."""
+    if any(np.iscomplexobj(a) for a in arrays):
+        return fft, ifft
+    return rfft, irfft
+
+def direct_convolve(x: np.ndarray, h: np.ndarray) -> np.ndarray:
+    """Convolution in the time domain, O(N*M), along the last axis of x."""
+    if x.ndim == 1:
+        return np.convolve(x, h)
+    # every channel at once, one shifted multiply-add per sample of the shorter input
+    n, m = x.shape[-1], len(h)
+    y = np.zeros(x.shape[:-1] + (n + m - 1,), dtype=np.result_type(x, h))
+    if m <= n:
+        for k, tap in enumerate(h):
+            y[..., k : k + n] += tap * x
+    else:
+        for k in range(n):
+            y[..., k : k + m] += x[..., k : k + 1] * h
+    return y
+
+def fft_convolve(x: np.ndarray, h: np.ndarray, nfft: Optional[int] = None) -> np.ndarray:
+    """Convolution by multiplying zero-padded spectra, O((N+M) log(N+M)).
+
+    Args:
+        x (np.ndarray): Signal, convolved along its last axis
+        h (np.ndarray): 1-D kernel
+        nfft (int, optional): FFT length, at least x.shape[-1] + len(h) - 1.
+            Defaults to the next power of two.
+
+    Returns:
+        np.ndarray: Full linear convolution
+    """
+    n_out = x.shape[-1] + len(h) - 1
+    nfft = nfft or next_pow2(n_out)
+    if nfft < n_out:
+        raise ValueError(f'nfft={nfft} is shorter than the output length {n_out}')
+    forward, inverse = _transforms(x, h)
+    return inverse(forward(x, nfft) * forward(h, nfft), nfft)[..., :n_out]
+
+def _block_nfft(kernel_length: int, nfft: Optional[int]) -> int:
+    """FFT length for block convolution, leaving at least kernel_length new samples per block."""
+    nfft = nfft or next_pow2(4 * kernel_length)
+    if nfft < 2 * kernel_length - 1:
+        raise ValueError(f'nfft={nfft} must be at least 2*len(h) - 1')
+    return nfft
+
+def overlap_add(x: np.ndarray, h: np.ndarray, nfft: Optional[int] = None) -> np.ndarray:
+    """Convolution by summing the overlapping tails of FFT-convolved blocks.
+
+    Args:
+        x (np.ndarray): Signal, convolved along its last axis
+        h (np.ndarray): 1-D kernel
+        nfft (int, optional): FFT length per block, at least 2*len(h) - 1.
+            Defaults to the power of two at least 4*len(h).
+
+    Returns:
+        np.ndarray: Full linear convolution
+    """
+    M = len(h)
+    nfft = _block_nfft(M, nfft)
+    L = nfft - M + 1 # new samples per block
+    lead, n = x.shape[:-1], x.shape[-1]
+    nb = -(-n // L)
+    forward, inverse = _transforms(x, h)
+
+    blocks = np.zeros(lead + (nb, L), dtype=x.dtype)
+    blocks.reshape(lead + (nb * L,))[..., :n] = x
+    Y = inverse(forward(blocks, nfft, axis=-1) * forward(h, nfft), nfft, axis=-1)
+
+    y = np.zeros(lead + ((nb + 1) * L,), dtype=Y.dtype)
+    y[..., : nb * L] = Y[..., :L].reshape(lead + (nb * L,))
+    tails = np.zeros(lead + (nb, L), dtype=Y.dtype)
+    tails[..., : M - 1] = Y[..., L:]
+    y[..., L:] += tails.reshape(lead + (nb * L,)) # each tail overlaps the start of the next block
+    return y[..., : n + M - 1]
+
+def overlap_save(x: np.ndarray, h: np.ndarray, nfft: Optional[int] = None) -> np.ndarray:
+    """Convolution by discarding the circularly wrapped part of overlapping blocks.
+
+    Args:
+        x (np.ndarray): Signal, convolved along its last axis
+        h (np.ndarray): 1-D kernel
+        nfft (int, optional): FFT length per block, at least 2*len(h) - 1.
+            Defaults to the power of two at least 4*len(h).
+
+    Returns:
+        np.ndarray: Full linear convolution
+    """
+    M = len(h)
+    nfft = _block_nfft(M, nfft)
+    L = nfft - M + 1 # valid outputs per block
+    lead, n = x.shape[:-1], x.shape[-1]
+    n_out = n + M - 1
+    nb = -(-n_out // L)
+    forward, inverse = _transforms(x, h)
+
+    padded = np.zeros(lead + (nb * L + M - 1,), dtype=x.dtype)
+    padded[..., M - 1 : M - 1 + n] = x
+    step = padded.strides[-1]
+    blocks = np.lib.stride_tricks.as_strided(padded, shape=lead + (nb, nfft),
+                                             strides=padded.strides[:-1] + (L * step, step),
+                                             writeable=False)
+    Y = inverse(forward(blocks, axis=-1) * forward(h, nfft), nfft, axis=-1)
+    return Y[..., M - 1 :].reshape(lead + (nb * L,))[..., :n_out]
+
+### Method selection ###
+
+# cost models, in arbitrary units, that each method's run time is fitted to
+def _direct_cost(n: int, m: int) -> float:
+    return n * m
+
+def _fft_cost(n: int, m: int) -> float:
+    nfft = next_pow2(n + m - 1)
+    return nfft * np.log2(max(nfft, 2))
+
+def _overlap_save_cost(n: int, m: int) -> float:
+    nfft = next_pow2(4 * m)
+    nb = -(-(n + m - 1) // (nfft - m + 1))
+    return nb * nfft * np.log2(max(nfft, 2))
+
+METHODS = {
+    'direct': (direct_convolve, _direct_cost),
+    'fft': (fft_convolve, _fft_cost),
+    'overlap_save': (overlap_save, _overlap_save_cost),
+}
+
+CALIBRATION_ENV = 'APPLIED_DSP_CALIBRATION'
+CALIBRATION_SIGNAL_LENGTHS = (64, 256, 1024, 4096, 16384, 65536)
+CALIBRATION_KERNEL_LENGTHS = (4, 16, 64, 256, 1024)
+# signal kinds with their own cost models, single precision arithmetic
+# favours different methods than double
+MODEL_KINDS = ('real', 'complex', 'real_single', 'complex_single')
+
+# run time ~ a * cost + b of each method, fitted on a desktop x86-64 CPU with
+# scipy.fft, used until calibrate() has timed the machine in use
+DEFAULT_CALIBRATION = dict(machine=None, models={
+    'real': dict(direct=[1.2e-10, 2.2e-06], fft=[2.3e-09, 3.3e-05], overlap_save=[9.7e-10, 4.3e-05]),
+    'complex': dict(direct=[5.2e-10, 4.2e-06], fft=[2.9e-09, 3.8e-05],
+                    overlap_save=[1.6e-09, 4.1e-05]),
+    'real_single': dict(direct=[9.5e-11, 2.3e-06], fft=[1.2e-09, 3.0e-05],
+                        overlap_save=[5.2e-10, 3.9e-05]),
+    'complex_single': dict(direct=[2.4e-10, 2.8e-06], fft=[2.7e-09, 2.6e-05],
+                           overlap_save=[1.4e-09, 3.3e-05]),
+})
+
+_calibration = None # (key it was loaded for, calibration)
+_calibration_lock = threading.Lock() # pipeline stages may all ask for it at once
+
+def calibration_path() -> Path:
+    """File the calibration is stored in, $APPLIED_DSP_CALIBRATION if set."""
+    if os.environ.get(CALIBRATION_ENV):
+        return Path(os.environ[CALIBRATION_ENV])
+    return Path.home() / '.cache' / 'applied-dsp' / 'convolution.json'
+
+def _machine() -> dict:
+    # the FFT based methods are only as fast as the backend they were timed with
+    return dict(node=platform.node(), machine=platform.machine(), numpy=np.__version__,
+                fft=get_fft_backend())
+
+def _best_time(func, x, h, min_time: float = 5e-3) -> float:
+    """Seconds per call, looping until at least min_time has elapsed."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func(x, h)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / number
+        number *= 2
+
+def calibrate(path: Optional[Path] = None, signal_lengths=CALIBRATION_SIGNAL_LENGTHS,
+              kernel_lengths=CALIBRATION_KERNEL_LENGTHS) -> dict:
+    """Time each method on this machine and save the fitted cost models.
+
+    Each method's run time is fitted as t = a * cost + b, where cost is its
+    operation count model, separately for real and complex signals in
+    double and in single precision. This takes several seconds and is only
+    run on request, e.g. by benchmarks/convolution.py --calibrate. Later
+    calls of load_calibration use the saved models.
+
+    Args:
+        path (Path, optional): Where to save the calibration. Defaults to calibration_path().
+        signal_lengths (sequence of int, optional): Signal lengths to time
+        kernel_lengths (sequence of int, optional): Kernel lengths to time
+
+    Returns:
+        dict: The calibration, as stored
+    """
+    rng = np.random.default_rng(0)
+    models = {}
+    for kind in MODEL_KINDS:
+        models[kind] = {}
+        dtype = np.float32 if kind.endswith('_single') else np.float64
+        for name, (func, cost) in METHODS.items():
+            costs, times = [], []
+            for n in signal_lengths:
+                for m in kernel_lengths:
+                    if m > n:
+                        continue
+                    x = rng.standard_normal(n)
+                    if kind.startswith('complex'):
+                        x = x + 1j*rng.standard_normal(n)
+                    x = as_precision(x, dtype)
+                    h = rng.standard_normal(m).astype(dtype)
+                    costs.append(cost(n, m))
+                    times.append(_best_time(func, x, h))
+            costs, times = np.array(costs), np.array(times)
+            # least squares on relative error, since times span several decades
+            A = np.stack([costs, np.ones_like(costs)], axis=1) / times[:, None]
+            a, b = np.linalg.lstsq(A, np.ones_like(times), rcond=None)[0]
+            models[kind][name] = [max(a, 0.0), max(b, 0.0)]
+
+    calibration = dict(machine=_machine(), models=models)
+    path = path or calibration_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(calibration, indent=2))
+    global _calibration
+    _calibration = None # read again by the next load_calibration
+    return calibration
+
+def load_calibration() -> dict:
+    """Return the cost models the convolution methods are chosen by.
+
+    These are the models saved by calibrate() at calibration_path() if they
+    were made on this machine, numpy version and FFT backend and cover every
+    kind of signal, and DEFAULT_CALIBRATION otherwise. Nothing is timed or
+    written here. The models are cached, and looked up again when the path
+    or the FFT backend changes.
+    """
+    global _calibration
+    key = (calibration_path(), _machine())
+    cached = _calibration
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with _calibration_lock:
+        path, machine = key
+        calibration = DEFAULT_CALIBRATION
+        if path.exists():
+            try:
+                saved = json.loads(path.read_text())
+            except ValueError:
+                saved = {}
+            if (saved.get('machine') == machine
+                    and set(saved.get('models', {})) == set(MODEL_KINDS)):
+                calibration = saved
+        _calibration = (key, calibration)
+    return calibration
+
+def choose_method(n: int, m: int, complex_input: bool = True, single: bool = False) -> str:
+    """Fastest convolution method for lengths n and m by the cost models.
+
+    Args:
+        n (int): Signal length
+        m (int): Kernel length
+        complex_input (bool, optional): Whether either input is complex. Defaults to True.
+        single (bool, optional): Whether the inputs are single precision. Defaults to False.
+
+    Returns:
+        str: 'direct', 'fft' or 'overlap_save'
+    """
+    n, m = max(n, m), min(n, m)
+    if m <= 1:
+        return 'direct'
+    kind = ('complex' if complex_input else 'real') + ('_single' if single else '')
+    models = load_calibration()['models'][kind]
+    predicted = {name: a * METHODS[name][1](n, m) + b for name, (a, b) in models.items()}
+    return min(predicted, key=predicted.get)
+
+def _signal_kind(x: np.ndarray, h: np.ndarray):
+    """Whether either input is complex, and whether the arithmetic is single precision."""
+    single = np.result_type(x, h) in (np.float32, np.complex64)
+    return np.iscomplexobj(x) or np.iscomplexobj(h), single
+
+def convolve(x: np.ndarray, h: np.ndarray, mode: str = 'full', method: str = 'auto',
+             axis: int = -1) -> np.ndarray:
+    """Drop-in np.convolve that picks the fastest method for the input sizes.
+
+    A multi-channel x is convolved along axis with the same 1-D kernel for
+    every channel, in one vectorized call. Each channel of the result equals
+    convolving that channel alone.
+
+    Args:
+        x (np.ndarray): Signal, 1-D or with channels on the other axes
+        h (np.ndarray): 1-D kernel
+        mode (str, optional): 'full', 'same' or 'valid', as in np.convolve. Defaults to 'full'.
+        method (str, optional): 'auto', 'direct', 'fft' or 'overlap_save'. Defaults to 'auto'.
+        axis (int, optional): Sample axis of a multi-channel x. Defaults to -1.
+
+    Returns:
+        np.ndarray: Convolution of x and h
+    """
+    x, h = np.asarray(x), as_precision(h)
+    if x.ndim > 1:
+        if h.ndim != 1:
+            raise ValueError('the kernel of a multi-channel convolution must be 1-D')
+        x = np.moveaxis(x, axis, -1)
+        n, m = x.shape[-1], len(h)
+        if method == 'auto':
+            method = choose_method(n, m, *_signal_kind(x, h))
+        y = _trim(METHODS[method][0](x, h), mode, max(n, m), min(n, m))
+        return np.moveaxis(y, -1, axis)
+
+    if len(h) > len(x):
+        x, h = h, x # convolution commutes, keep the kernel the shorter one
+    n, m = len(x), len(h)
+    if method == 'auto':
+        method = choose_method(n, m, *_signal_kind(x, h))
+
+    if method == 'direct':
+        return np.convolve(x, h, mode=mode)
+    return _trim(METHODS[method][0](x, h), mode, n, m)
+
+def _trim(y: np.ndarray, mode: str, n: int, m: int) -> np.ndarray:
+    """Cut a full convolution of lengths n >= m down to mode, along the last axis."""
+    if mode == 'full':
+        return y
+    if mode == 'same':
+        start = (m - 1) // 2
+        return y[..., start : start + n]
+    if mode == 'valid':
+        return y[..., m - 1 : n]
+    raise ValueError(f"mode must be 'full', 'same' or 'valid', not {mode!r}")
+
+def correlate(x: np.ndarray, v: np.ndarray, mode: str = 'valid', method: str = 'auto',
+              axis: int = -1) -> np.ndarray:
+    """Drop-in np.correlate that picks the fastest method for the input sizes.
+
+    Args:
+        x (np.ndarray): Signal, 1-D or with channels on the other axes
+        v (np.ndarray): 1-D reference, shared by every channel
+        mode (str, optional): 'full', 'same' or 'valid', as in np.correlate. Defaults to 'valid'.
+        method (str, optional): 'auto', 'direct', 'fft' or 'overlap_save'. Defaults to 'auto'.
+        axis (int, optional): Sample axis of a multi-channel x. Defaults to -1.
+
+    Returns:
+        np.ndarray: Cross-correlation of x with v
+    """
+    x, v = np.asarray(x), as_precision(v)
+    if x.ndim > 1:
+        n = x.shape[axis]
+        if mode == 'same' and len(v) > n:
+            # np.correlate swaps the inputs, which moves the 'same' window
+            y = convolve(x, np.conj(v[::-1]), mode='full', method=method, axis=axis)
+            start = n - 1 - (n - 1) // 2
+            return np.take(y, np.arange(start, start + len(v)), axis=axis)
+        return convolve(x, np.conj(v[::-1]), mode=mode, method=method, axis=axis)
+
+    if method == 'direct':
+        return np.correlate(x, v, mode=mode)
+    if len(v) > len(x):
+        # np.correlate swaps the inputs, which moves the 'same' window
+        return np.conj(correlate(v, x, mode=mode, method=method))[::-1]
+    # correlating is convolving with the conjugated, time reversed reference
+    return convolve(x, np.conj(v[::-1]), mode=mode, method=method)
@@ -0,0 +1,222 @@
+"""Polyphase FIR decimation with filter state carried between blocks."""
+
+import numpy as np
+
+from .convolution import convolve
+from .precision import as_precision
+
+class PolyphaseDecimator:
+    """FIR filter followed by downsampling, computing only the kept outputs.
+
+    The taps are split into factor polyphase branches, each of which runs at
+    the output rate. The last len(taps) - 1 input samples are kept between
+    calls to process, so a long signal can be fed through in blocks of any
+    size. Concatenating the outputs of process over all blocks followed by
+    flush gives np.convolve(x, taps)[phase::factor].
+
+    Blocks may hold several channels, filtered along axis with the same
+    taps in one vectorized pass. Each channel's output matches filtering it
+    alone, and the number of channels is fixed by the first block.
+
+    The taps are cast once to the precision policy in effect when the
+    decimator is built. Zero taps at either end of a branch are skipped, so
+    the exact zeros of a half-band filter cost nothing.
+
+    Args:
+        taps (np.ndarray): FIR filter taps, e.g. from scipy.signal.firwin
+        factor (int): Decimation factor
+        phase (int, optional): Index of the first kept sample of the full
+            convolution. Defaults to 0.
+        axis (int, optional): Sample axis of multi-channel blocks. Defaults to -1.
+    """
+
+    def __init__(self, taps: np.ndarray, factor: int, phase: int = 0, axis: int = -1):
+        if factor < 1:
+            raise ValueError('factor must be a positive integer')
+        if phase < 0:
+            raise ValueError('phase must be non-negative')
+        self.taps = as_precision(taps)
+        self.factor = int(factor)
+        self.phase = int(phase)
+        self.axis = axis
+        # polyphase branches, branch r holds taps[r], taps[r + factor], ...
+        # kept as (leading zeros, taps from the first to the last nonzero one)
+        self._branches = []
+        for r in range(self.factor):
+            h = self.taps[r::self.factor]
+            nonzero = np.flatnonzero(h)
+            if len(nonzero) == 0:
+                self._branches.append((0, h[:0]))
+            else:
+                self._branches.append((nonzero[0], h[nonzero[0] : nonzero[-1] + 1]))
+        self.reset()
+
+    def reset(self):
+        """Clear the filter state so the next block starts a new signal."""
+        self._history = None # last len(taps) - 1 inputs of each channel, sized by the first block
+        self._count = 0 # input samples consumed
+        self._next = self.phase # full convolution index of the next output
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        """Filter and decimate the next block of input samples.
+
+        Args:
+            x (np.ndarray): Next block of input samples
+
+        Returns:
+            np.ndarray: Every output sample that the block completes
+        """
+        x = np.moveaxis(np.asarray(x), self.axis, -1)
+        M = self.factor
+        if self._history is None:
+            self._history = np.zeros(x.shape[:-1] + (len(self.taps) - 1,), dtype=self.taps.dtype)
+        ext = np.concatenate([self._history, x], axis=-1)
+        n_hist, n_in = self._history.shape[-1], x.shape[-1]
+        start = self._count - n_hist # signal index of ext[..., 0]
+        last = self._count + n_in - 1 # newest signal index in ext
+
+        n_out = max(0, (last - self._next) // M + 1)
+        y = np.zeros(x.shape[:-1] + (n_out,), dtype=self._output_dtype(x))
+
+        if n_out > 0:
+            for r, (lead, h) in enumerate(self._branches):
+                if len(h) == 0:
+                    continue
+                # trailing zeros only shorten the segment, leading ones move its start
+                u = self._segment(ext, start, r, lead + len(h), n_out)
+                self._accumulate(y, r, h, u[..., : n_out + len(h) - 1])
+            self._next += n_out * M
+
+        self._count += n_in
+        if n_hist:
+            self._history = ext[..., -n_hist:].copy()
+        return np.moveaxis(y, -1, self.axis)
+
+    def flush(self) -> np.ndarray:
+        """Return the filter tail and reset the state.
+
+        Returns:
+            np.ndarray: Outputs that depend on the zero padding after the signal
+        """
+        history = self._history
+        if history is None:
+            history = np.zeros(len(self.taps) - 1, dtype=self.taps.dtype)
+        y = self.process(np.moveaxis(np.zeros_like(history), -1, self.axis))
+        self.reset()
+        return y
+
+    def _segment(self, ext: np.ndarray, start: int, r: int, num_taps: int, n_out: int) -> np.ndarray:
+        """Strided view of the input samples feeding branch r."""
+        M = self.factor
+        first = self._next - start - r # ext index multiplied by the branch's first tap
+        return ext[..., first - (num_taps - 1)*M : first + (n_out - 1)*M + 1 : M]
+
+    def _output_dtype(self, x: np.ndarray) -> np.dtype:
+        return np.result_type(self.taps, x)
+
+    def _accumulate(self, y: np.ndarray, r: int, h: np.ndarray, u: np.ndarray):
+        """Add the output of polyphase branch r into y."""
+        y += convolve(u, h, mode='valid')
+
+class FS4Downconverter(PolyphaseDecimator):
+    """Multiplier-free digital downconverter for a carrier at fs/4.
+
+    Mixing with an fs/4 oscillator (1, -1j, -1, 1j, ...) and then low-pass
+    filtering and decimating by 4 means each polyphase branch only ever sees
+    one oscillator phase. The mixer is therefore a fixed sign flip and I/Q
+    swap per branch, applied to the branch outputs, and the real low-pass
+    taps filter the I and Q views separately with real arithmetic.
+
+    The output is identical to decimating with the complex band-pass filter
+    taps * 1j**n, i.e. np.convolve(x, taps * 1j**np.arange(len(taps)))[phase::4].
+
+    Args:
+        taps (np.ndarray): Real low-pass FIR taps, e.g. from scipy.signal.firwin
+        phase (int, optional): Index of the first kept sample of the full
+            convolution. Defaults to 0.
+        axis (int, optional): Sample axis of multi-channel blocks. Defaults to -1.
+    """
+
+    def __init__(self, taps: np.ndarray, phase: int = 0, axis: int = -1):
+        if np.iscomplexobj(taps):
+            raise ValueError('taps must be real')
+        super().__init__(taps, 4, phase, axis)
+
+    def _output_dtype(self, x: np.ndarray) -> np.dtype:
+        return np.result_type(self.taps, x, np.complex64)
+
+    def _accumulate(self, y: np.ndarray, r: int, h: np.ndarray, u: np.ndarray):
+        """Add branch r, rotated by 1j**r, into y."""
+        i = convolve(u.real, h, mode='valid')
+        if np.iscomplexobj(u):
+            q = convolve(u.imag, h, mode='valid')
+        else:
+            q = np.zeros_like(i)
+        if r == 0: # 1
+            y.real += i
+            y.imag += q
+        elif r == 1: # 1j
+            y.real -= q
+            y.imag += i
+        elif r == 2: # -1
+            y.real -= i
+            y.imag -= q
+        else: # -1j
+            y.real += q
+            y.imag -= i
+
+def decimate(x: np.ndarray, taps: np.ndarray, factor: int, mode: str = 'full',
+             axis: int = -1) -> np.ndarray:
+    """Filter and decimate a whole signal.
+
+    Equivalent to np.convolve(x, taps, mode=mode)[::factor] but only the kept
+    samples are computed.
+
+    Args:
+        x (np.ndarray): Input signal
+        taps (np.ndarray): FIR filter taps
+        factor (int): Decimation factor
+        mode (str, optional): 'full' or 'same', as in np.convolve. Defaults to 'full'.
+        axis (int, optional): Sample axis of a multi-channel x. Defaults to -1.
+
+    Returns:
+        np.ndarray: Filtered and decimated signal
+    """
+    return _decimate_whole(x, len(taps), factor, mode, axis,
+                           lambda phase: PolyphaseDecimator(taps, factor, phase))
+
+def fs4_downconvert(x: np.ndarray, taps: np.ndarray, mode: str = 'full',
+                    axis: int = -1) -> np.ndarray:
+    """Mix a whole signal down from fs/4, filter and decimate by 4.
+
+    Equivalent to np.convolve(x, taps * 1j**n, mode=mode)[::4], with
+    n = 0, 1, ..., len(taps) - 1, using FS4Downconverter.
+
+    Args:
+        x (np.ndarray): Input signal with its carrier at fs/4
+        taps (np.ndarray): Real low-pass FIR taps
+        mode (str, optional): 'full' or 'same', as in np.convolve. Defaults to 'full'.
+        axis (int, optional): Sample axis of a multi-channel x. Defaults to -1.
+
+    Returns:
+        np.ndarray: Complex baseband signal at fs/4
+    """
+    return _decimate_whole(x, len(taps), 4, mode, axis,
+                           lambda phase: FS4Downconverter(taps, phase))
+
+def _decimate_whole(x: np.ndarray, num_taps: int, factor: int, mode: str, axis: int,
+                    make) -> np.ndarray:
+    """Run a decimator built by make(phase) over x, matching np.convolve modes."""
+    x = np.moveaxis(np.asarray(x), axis, -1)
+    n = x.shape[-1]
+    if mode == 'full':
+        dec = make(0)
+        y = np.concatenate([dec.process(x), dec.flush()], axis=-1)
+    elif mode == 'same':
+        # np.convolve centres 'same' output on the longer of the two inputs
+        dec = make((min(n, num_taps) - 1) // 2)
+        n_out = -(-max(n, num_taps) // factor) # ceil
+        y = np.concatenate([dec.process(x), dec.flush()], axis=-1)[..., :n_out]
+    else:
+        raise ValueError(f"mode must be 'full' or 'same', not {mode!r}")
+    return np.moveaxis(y, -1, axis)
@@ -0,0 +1,257 @@
+"""FIR pre-equalization of the sinc roll-off of a zero-order hold.
+
+A DAC that holds each sample for factor output samples filters the
+upsampled signal with |sinc(f * factor)|, f in cycles per output sample.
+The equalizers here approximate the inverse of that response over the
+passband and reject the images above it with a linear phase FIR filter.
+"""
+
+from functools import lru_cache
+import numpy as np
+
+from .decimation import PolyphaseDecimator
+
+def zoh_response(f: np.ndarray, factor: int) -> np.ndarray:
+    """Magnitude response of a zero-order hold of factor samples.
+
+    Args:
+        f (np.ndarray): Frequency in cycles per held (output) sample
+        factor (int): Samples each input sample is held for
+
+    Returns:
+        np.ndarray: |sin(pi f factor) / (pi f factor)|
+    """
+    return np.abs(np.sinc(np.asarray(f) * factor))
+
+def _bands(factor: int, passband: float, grid_density: int, num_taps: int):
+    """Frequency grid and desired response of a design, and the number of passband points."""
+    if not 0 < passband < 0.5:
+        raise ValueError('passband must be between 0 and 0.5 of the input sample rate')
+    num_points = grid_density * num_taps
+    f_pass = np.linspace(0, passband / factor, num_points)
+    # the first image starts at the input sample rate minus the passband edge
+    f_stop = np.linspace((1 - passband) / factor, 0.5, num_points) if factor > 1 else np.empty(0)
+    f = np.concatenate([f_pass, f_stop])
+    desired = np.concatenate([1 / zoh_response(f_pass, factor), np.zeros(len(f_stop))])
+    return f, desired, len(f_pass)
+
+def _amplitude_basis(f: np.ndarray, num_taps: int) -> np.ndarray:
+    """Columns mapping the half of a symmetric (type I) filter to its amplitude response."""
+    k = np.arange(num_taps // 2 + 1)
+    basis = 2 * np.cos(2 * np.pi * np.outer(f, k))
+    basis[:, 0] = 1
+    return basis
+
+def _symmetric_taps(half: np.ndarray) -> np.ndarray:
+    """Full taps from the centre tap followed by one side."""
+    return np.concatenate([half[:0:-1], half])
+
+def _barycentric_weights(x: np.ndarray) -> np.ndarray:
+    """Barycentric interpolation weights of the nodes x, scaled to a largest of 1."""
+    d = np.subtract.outer(x, x)
+    np.fill_diagonal(d, 1)
+    # the products of a hundred or more differences overflow, so sum logs
+    log_w = -np.log(np.abs(d)).sum(axis=1)
+    return np.prod(np.sign(d), axis=1) * np.exp(log_w - log_w.max())
+
+def _interpolate(x: np.ndarray, nodes: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Polynomial through (nodes, values) evaluated at x, by the barycentric formula."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.subtract.outer(x, nodes)
+        np.divide(_barycentric_weights(nodes), t, out=t)
+        y = (t @ values) / t.sum(axis=1)
+    exact = ~np.isfinite(y) # x on a node
+    if exact.any():
+        y[exact] = values[np.argmin(np.abs(np.subtract.outer(x[exact], nodes)), axis=1)]
+    return y
+
+def _extremal_set(error: np.ndarray, bands, r: int, level: float):
+    """Indices of r alternating local extrema of error of at least level, or None."""
+    candidates = []
+    for start, stop in bands:
+        e = error[start:stop]
+        below = np.concatenate([[-np.inf], e, [-np.inf]])
+        above = np.concatenate([[np.inf], e, [np.inf]])
+        peak = (((e >= below[:-2]) & (e >= below[2:]) & (e > 0))
+                | ((e <= above[:-2]) & (e <= above[2:]) & (e < 0)))
+        candidates.extend(start + np.flatnonzero(peak & (np.abs(e) >= level)))
+    # the largest of each run of the same sign, then drop the smaller end until r are left
+    keep = []
+    for i in candidates:
+        if keep and (error[i] > 0) == (error[keep[-1]] > 0):
+            if abs(error[i]) > abs(error[keep[-1]]):
+                keep[-1] = i
+        else:
+            keep.append(i)
+    while len(keep) > r:
+        keep.pop(0 if abs(error[keep[0]]) < abs(error[keep[-1]]) else -1)
+    return np.array(keep) if len(keep) == r else None
+
+def _remez(f: np.ndarray, desired: np.ndarray, weight: np.ndarray, n_pass: int, num_taps: int,
+           max_iterations: int, tolerance: float) -> np.ndarray:
+    """Minimax type I design on a grid by the Remez exchange algorithm.
+
+    The amplitude is a polynomial in cos(2 pi f) of degree num_taps // 2,
+    so each iteration levels the error over r = num_taps // 2 + 2 extremal
+    frequencies in closed form and moves them to the peaks of the new
+    error, until the peak error is within tolerance of the levelled one.
+
+    Returns:
+        np.ndarray: Centre tap followed by one side of the taps
+    """
+    L = num_taps // 2
+    r = L + 2
+    x = np.cos(2 * np.pi * f)
+    bands = [(0, n_pass), (n_pass, len(f))]
+    sign = (-1.0)**np.arange(r)
+
+    # start from frequencies spread evenly over the bands, skipping the transition
+    step = np.concatenate([[0], np.diff(f)])
+    step[n_pass:n_pass + 1] = 0
+    position = np.cumsum(step)
+    ext = np.unique(np.searchsorted(position, np.linspace(0, position[-1], r)).clip(0, len(f) - 1))
+    if len(ext) < r:
+        ext = np.round(np.linspace(0, len(f) - 1, r)).astype(int)
+
+    for _ in range(max_iterations):
+        b = _barycentric_weights(x[ext])
+        delta = (b @ desired[ext]) / (b @ (sign / weight[ext])) # levelled error
+        nodes = x[ext[:-1]]
+        values = (desired[ext] - sign * delta / weight[ext])[:-1]
+        error = weight * (desired - _interpolate(x, nodes, values))
+        if np.max(np.abs(error)) - abs(delta) <= tolerance * abs(delta):
+            break
+        ext = _extremal_set(error, bands, r, abs(delta) * (1 - 1e-6)) # slack for rounding
+        if ext is None:
+            break
+
+    # taps from the amplitude at num_taps uniformly spaced frequencies
+    n = np.arange(num_taps)
+    amplitude = _interpolate(np.cos(2 * np.pi * n / num_taps), nodes, values)
+    return np.cos(2 * np.pi * np.outer(np.arange(L + 1), n) / num_taps) @ amplitude / num_taps
+
+@lru_cache(maxsize=32)
+def design_inverse_sinc(factor: int, passband: float = 0.4, num_taps: int = 127,
+                        method: str = 'ls', stop_weight: float = 1.0,
+                        grid_density: int = 16, max_iterations: int = 100,
+                        tolerance: float = 1e-4) -> np.ndarray:
+    """Design a linear phase FIR equalizer for a zero-order hold.
+
+    The filter runs at the held (output) sample rate. Its amplitude
+    approximates 1/zoh_response(f, factor) up to passband and zero from
+    1 - passband (the edge of the first image) to Nyquist, both in units
+    of the input sample rate. Designs are cached, and the returned taps are
+    shared between callers and read-only.
+
+    Args:
+        factor (int): Samples each input sample is held for
+        passband (float, optional): Passband edge as a fraction of the input
+            sample rate, below 0.5. Defaults to 0.4.
+        num_taps (int, optional): Filter length, odd. Defaults to 127.
+        method (str, optional): 'ls' for the weighted least squares fit, or
+            'equiripple' for the minimax fit, found by the Remez exchange
+            algorithm. Defaults to 'ls'.
+        stop_weight (float, optional): Weight of the stopband error relative
+            to the passband. Defaults to 1.
+        grid_density (int, optional): Frequency grid points per tap in each
+            band. Defaults to 16.
+        max_iterations (int, optional): Most exchange iterations for
+            'equiripple'. Defaults to 100.
+        tolerance (float, optional): 'equiripple' stops once the peak
+            weighted error is within this fraction of the levelled error.
+            Defaults to 1e-4.
+
+    Returns:
+        np.ndarray: Filter taps
+    """
+    if num_taps % 2 == 0:
+        raise ValueError('num_taps must be odd for a type I linear phase filter')
+    if method not in ('ls', 'equiripple'):
+        raise ValueError(f"method must be 'ls' or 'equiripple', not {method!r}")
+
+    f, desired, n_pass = _bands(factor, passband, grid_density, num_taps)
+    weight = np.ones(len(f))
+    weight[n_pass:] = stop_weight
+
+    if method == 'equiripple':
+        half = _remez(f, desired, weight, n_pass, num_taps, max_iterations, tolerance)
+    else:
+        w = np.sqrt(weight)
+        basis = _amplitude_basis(f, num_taps)
+        half = np.linalg.lstsq(basis * w[:, None], desired * w, rcond=None)[0]
+
+    taps = _symmetric_taps(half)
+    taps.flags.writeable = False
+    return taps
+
+def equalizer_response(taps: np.ndarray, f: np.ndarray) -> np.ndarray:
+    """Amplitude response of a symmetric FIR filter, removing its linear phase.
+
+    Args:
+        taps (np.ndarray): Odd length, symmetric taps
+        f (np.ndarray): Frequency in cycles per sample
+
+    Returns:
+        np.ndarray: Real amplitude response
+    """
+    return _amplitude_basis(np.asarray(f), len(taps)) @ taps[len(taps) // 2:]
+
+def passband_error(taps: np.ndarray, factor: int, passband: float,
+                   num_points: int = 1024) -> float:
+    """Largest deviation from the ideal inverse sinc over the passband, in dB.
+
+    Args:
+        taps (np.ndarray): Equalizer taps
+        factor (int): Samples each input sample is held for
+        passband (float): Passband edge as a fraction of the input sample rate
+        num_points (int, optional): Frequencies checked. Defaults to 1024.
+
+    Returns:
+        float: max |20 log10(|A(f)| * zoh_response(f, factor))| over the passband
+    """
+    f = np.linspace(0, passband / factor, num_points)
+    gain = np.abs(equalizer_response(taps, f)) * zoh_response(f, factor)
+    return float(np.max(np.abs(20 * np.log10(gain))))
+
+class InverseSincEqualizer:
+    """Streaming zero-order hold equalizer.
+
+    Filters the held signal block by block with a cached inverse sinc FIR
+    design. The output is aligned with the input: concatenating process over
+    all blocks followed by flush gives np.convolve(x, taps, mode='same') and
+    then the rest of the filter tail.
+
+    Args:
+        factor (int): Samples each input sample is held for
+        passband (float, optional): Passband edge as a fraction of the input
+            sample rate. Defaults to 0.4.
+        num_taps (int, optional): Odd filter length. Defaults to 127.
+        method (str, optional): 'ls' or 'equiripple'. Defaults to 'ls'.
+    """
+
+    def __init__(self, factor: int, passband: float = 0.4, num_taps: int = 127,
+                 method: str = 'ls'):
+        self.factor = factor
+        self.passband = passband
+        self.taps = design_inverse_sinc(factor, passband, num_taps, method)
+        self._filter = PolyphaseDecimator(self.taps, 1, phase=(num_taps - 1) // 2)
+
+    def reset(self):
+        """Clear the filter state so the next block starts a new signal."""
+        self._filter.reset()
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        """Equalize the next block, returning the outputs it completes."""
+        return self._filter.process(x)
+
+    def flush(self) -> np.ndarray:
+        """Return the filter tail and reset the state."""
+        return self._filter.flush()
+
+    def response(self, f: np.ndarray) -> np.ndarray:
+        """Amplitude response at f, in cycles per held sample."""
+        return equalizer_response(self.taps, f)
+
+    def passband_error(self, num_points: int = 1024) -> float:
+        """Largest deviation from the ideal inverse sinc over the passband, in dB."""
+        return passband_error(self.taps, self.factor, self.passband, num_points)
@@ -0,0 +1,166 @@
+"""Headless, parallel figure rendering from recorded plot commands.
+
+A FigureSpec stands in for a matplotlib figure: its axes record the calls
+made on them (plot, set_title, legend, ...) along with the arrays passed
+in. FigureRenderer then either replays the calls onto real figures on the
+Agg backend in a process pool, or saves the recorded arrays to .npz files
+without touching matplotlib at all.
+"""
+
+import numbers
+from pathlib import Path
+from typing import List, Optional, Union
+import numpy as np
+
+class RecordingAxes:
+    """Stand-in for matplotlib Axes that records every method call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name: str):
+        if name.startswith('_') or name.startswith('get_'):
+            # getters would need the real, drawn axes
+            raise AttributeError(name)
+
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+
+        return record
+
+class FigureSpec:
+    """Everything needed to draw and save one figure.
+
+    Args:
+        path (str or Path): Where the figure is saved
+        nrows (int, optional): Rows of subplots. Defaults to 1.
+        ncols (int, optional): Columns of subplots. Defaults to 1.
+        **kwargs: Passed to matplotlib.figure.Figure, e.g. figsize
+    """
+
+    def __init__(self, path: Union[str, Path], nrows: int = 1, ncols: int = 1, **kwargs):
+        self.path = Path(path)
+        self.nrows = nrows
+        self.ncols = ncols
+        self.kwargs = kwargs
+        self.axes = [[RecordingAxes() for _ in range(ncols)] for _ in range(nrows)]
+        self.tight = False
+        self.ylim_links = [] # (source, destination) axes pairs
+
+    def subplots(self):
+        """Recording axes shaped like the return value of plt.subplots."""
+        if self.nrows == 1 and self.ncols == 1:
+            return self.axes[0][0]
+        if self.nrows == 1 or self.ncols == 1:
+            return [ax for row in self.axes for ax in row]
+        return self.axes
+
+    def tight_layout(self):
+        self.tight = True
+
+    def link_ylim(self, source: RecordingAxes, destination: RecordingAxes):
+        """Give destination the y limits source ends up with once drawn."""
+        self.ylim_links.append((source, destination))
+
+def figure(path: Union[str, Path], nrows: int = 1, ncols: int = 1, **kwargs):
+    """Create a FigureSpec and its axes, like plt.subplots.
+
+    Returns:
+        (FigureSpec, RecordingAxes or list): The spec and its axes
+    """
+    spec = FigureSpec(path, nrows, ncols, **kwargs)
+    return spec, spec.subplots()
+
+def render_figure(spec: FigureSpec) -> Path:
+    """Replay a spec onto an Agg figure and save it. Safe to run in a worker process."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(**spec.kwargs)
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(spec.nrows, spec.ncols, squeeze=False)
+    real = {}
+    for row, real_row in zip(spec.axes, axes):
+        for rec, ax in zip(row, real_row):
+            real[id(rec)] = ax
+            for name, args, kwargs in rec.calls:
+                getattr(ax, name)(*args, **kwargs)
+    for source, destination in spec.ylim_links:
+        real[id(destination)].set_ylim(real[id(source)].get_ylim())
+    if spec.tight:
+        fig.tight_layout()
+    fig.savefig(spec.path)
+    return spec.path
+
+def _is_numeric_sequence(value) -> bool:
+    return isinstance(value, (list, tuple)) and len(value) > 0 and \
+        all(isinstance(v, numbers.Number) for v in value)
+
+def save_figure_data(spec: FigureSpec) -> Path:
+    """Save every array recorded in a spec to an .npz file next to its image path.
+
+    Arrays are named axes<row><col>_<call number>_<method>_<argument>.
+    """
+    arrays = {}
+    for r, row in enumerate(spec.axes):
+        for c, rec in enumerate(row):
+            for i, (name, args, kwargs) in enumerate(rec.calls):
+                items = list(enumerate(args)) + list(kwargs.items())
+                for arg, value in items:
+                    if isinstance(value, np.ndarray) or _is_numeric_sequence(value):
+                        arrays[f'axes{r}{c}_{i}_{name}_{arg}'] = np.asarray(value)
+    path = spec.path.with_suffix('.npz')
+    np.savez(path, **arrays)
+    return path
+
+class FigureRenderer:
+    """Render figure specs in a pool of worker processes as they are submitted.
+
+    Figures are drawn while the caller carries on computing. Leaving the
+    with block, or calling close, waits for them all. With plots=False
+    nothing is drawn and each spec's arrays are written to .npz instead.
+
+    Args:
+        plots (bool, optional): Draw figures rather than saving their data. Defaults to True.
+        processes (int, optional): Worker processes. Defaults to os.cpu_count().
+            Use 1 to draw in the calling process.
+    """
+
+    def __init__(self, plots: bool = True, processes: Optional[int] = None):
+        self.plots = plots
+        self.processes = processes
+        self._pool = None
+        self._futures = []
+
+    def __enter__(self) -> 'FigureRenderer':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, spec: FigureSpec):
+        """Draw (or save the data of) a figure."""
+        if not self.plots:
+            save_figure_data(spec)
+        elif self.processes == 1:
+            render_figure(spec)
+        else:
+            if self._pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self._pool = ProcessPoolExecutor(self.processes)
+            self._futures.append(self._pool.submit(render_figure, spec))
+
+    def wait(self) -> List[Path]:
+        """Wait for every submitted figure, raising the first rendering error."""
+        paths = [future.result() for future in self._futures]
+        self._futures = []
+        return paths
+
+    def close(self):
+        """Wait for every submitted figure and stop the worker processes."""
+        try:
+            self.wait()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -0,0 +1,244 @@
+"""FFT overlap-save matched filtering against one or more reference pulses."""
+
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+import numpy as np
+
+from .convolution import choose_method, correlate
+from .precision import complex_dtype
+from .transforms import fft, ifft
+from .waveforms import chirp
+
+def reference_spectrum(reference: np.ndarray, nfft: int) -> np.ndarray:
+    """Conjugate nfft-point FFT of a reference pulse.
+
+    Multiplying an input spectrum by this and inverse transforming gives the
+    circular cross-correlation of the input with the reference.
+    """
+    if len(reference) > nfft:
+        raise ValueError(f'reference of length {len(reference)} does not fit in nfft={nfft}')
+    return np.conj(fft(reference, nfft))
+
+@lru_cache(maxsize=64)
+def lfm_spectrum(fs: float, pw: float, bw: float, nfft: int) -> Tuple[int, np.ndarray]:
+    """Length and cached conjugate spectrum of chirp(fs, pw, bw).
+
+    The spectrum is computed in double precision whatever the policy, and
+    the returned array is shared between callers and is read-only.
+
+    Args:
+        fs (float): Sample rate in Sps
+        pw (float): Pulse width in seconds
+        bw (float): Bandwidth in Hz
+        nfft (int): FFT length
+
+    Returns:
+        (int, np.ndarray): Pulse length in samples and its conjugate spectrum
+    """
+    ref = chirp(fs=fs, pw=pw, bw=bw, dtype=np.complex128)
+    spectrum = reference_spectrum(ref, nfft)
+    spectrum.flags.writeable = False
+    return len(ref), spectrum
+
+class MatchedFilterBank:
+    """Correlate a stream against several reference pulses with overlap-save.
+
+    Every block of nfft input samples is transformed once and the spectrum
+    is shared by all references. When the cost models of choose_method
+    favour it, for short blocks, the block is correlated directly in the
+    time domain instead. Outputs are aligned so that, over a whole signal
+    at least as long as each reference, the outputs of process followed by
+    flush equal np.correlate(x, reference, mode='same') for each reference.
+
+    Blocks may hold several channels, with samples along axis. All channels
+    share the reference spectra and are transformed together. The output
+    gains a references axis just before the sample axis, so a (channels, n)
+    block gives (channels, num_references, n).
+
+    The reference spectra are cast once to the precision policy in effect
+    when the bank is built, and its outputs have the policy's complex type
+    for input of that precision.
+
+    Args:
+        references (sequence of np.ndarray): Reference pulses
+        nfft (int, optional): FFT length. Defaults to the power of two at
+            least 4 times the longest reference.
+        axis (int, optional): Sample axis of multi-channel blocks. Defaults to -1.
+    """
+
+    def __init__(self, references: Sequence[np.ndarray], nfft: Optional[int] = None,
+                 axis: int = -1):
+        nfft = nfft or _default_nfft(max(len(ref) for ref in references))
+        self.axis = axis
+        self._build(references, [reference_spectrum(ref, nfft) for ref in references], nfft)
+
+    @classmethod
+    def lfm(cls, fs: float, pulses: Sequence[Tuple[float, float]],
+            nfft: Optional[int] = None, axis: int = -1) -> 'MatchedFilterBank':
+        """Bank of LFM references, reusing cached reference spectra.
+
+        Args:
+            fs (float): Sample rate in Sps
+            pulses (sequence of (float, float)): Pulse width in seconds and
+                bandwidth in Hz of each reference chirp
+            nfft (int, optional): FFT length. Defaults as in the constructor.
+            axis (int, optional): Sample axis of multi-channel blocks. Defaults to -1.
+
+        Returns:
+            MatchedFilterBank: Bank with one reference per pulse
+        """
+        if nfft is None:
+            nfft = _default_nfft(max(len(np.arange(-pw/2, pw/2, 1/fs)) for pw, _ in pulses))
+        references = [chirp(fs=fs, pw=pw, bw=bw) for pw, bw in pulses]
+        spectra = [lfm_spectrum(fs, pw, bw, nfft)[1] for pw, bw in pulses]
+        bank = cls.__new__(cls)
+        bank.axis = axis
+        bank._build(references, spectra, nfft)
+        return bank
+
+    def _build(self, references: Sequence[np.ndarray], spectra: Sequence[np.ndarray], nfft: int):
+        # np.correlate 'same' output k is the window starting at k - M//2, so
+        # shift shorter references to line every window up with the longest lead
+        lengths = [len(ref) for ref in references]
+        self.lead = max(m // 2 for m in lengths)
+        shifts = [self.lead - m // 2 for m in lengths]
+        self.overlap = max(m + s for m, s in zip(lengths, shifts)) - 1
+        if self.overlap >= nfft:
+            raise ValueError(f'nfft={nfft} is too short for the references')
+
+        k = np.arange(nfft)
+        self.nfft = nfft
+        self.dtype = complex_dtype()
+        spectra = np.stack([spec * np.exp(2j * np.pi * k * s / nfft) if s else spec
+                            for spec, s in zip(spectra, shifts)])
+        self.spectra = spectra.astype(self.dtype, copy=False)
+        # the same shifted references in the time domain, for direct correlation
+        self.kernels = np.zeros((len(references), self.overlap + 1), dtype=self.dtype)
+        for kernel, ref, s in zip(self.kernels, references, shifts):
+            kernel[s : s + len(ref)] = ref
+        self.reset()
+
+    @property
+    def num_references(self) -> int:
+        return len(self.spectra)
+
+    def reset(self):
+        """Clear the stream state so the next block starts a new signal."""
+        self._pending = None # unprocessed samples of each channel, sized by the first block
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        """Correlate the next block of samples against every reference.
+
+        Outputs are produced nfft - overlap at a time, so a call can return
+        fewer (or more) samples than it was given.
+
+        Args:
+            x (np.ndarray): Next block of input samples
+
+        Returns:
+            np.ndarray: (num_references, n) array of correlation outputs, with
+                any channel axes of x around it
+        """
+        x = np.moveaxis(np.asarray(x), self.axis, -1)
+        if self._pending is None:
+            self._pending = np.zeros(x.shape[:-1] + (self.lead,), dtype=self.dtype)
+        buf = np.concatenate([self._pending, x], axis=-1)
+        n_out = max(0, buf.shape[-1] - self.overlap) # windows that are complete
+        if self._direct(buf.shape[-1]):
+            y = self._correlate_direct(buf, n_out)
+        else:
+            step = self.nfft - self.overlap # valid outputs per transform
+            n_out -= n_out % step
+            y = self._correlate(buf, n_out // step)
+        self._pending = buf[..., n_out:]
+        return self._output(y, x.ndim)
+
+    def flush(self) -> np.ndarray:
+        """Return the outputs still held back and reset the state.
+
+        Returns:
+            np.ndarray: (num_references, n) array of the remaining outputs,
+                with any channel axes of the input around it
+        """
+        pending = self._pending if self._pending is not None else np.zeros(self.lead, dtype=self.dtype)
+        buf = np.concatenate([pending, np.zeros(pending.shape[:-1] + (self.overlap - self.lead,),
+                                                dtype=pending.dtype)], axis=-1)
+        n_out = buf.shape[-1] - self.overlap
+        if self._direct(buf.shape[-1]):
+            y = self._correlate_direct(buf, n_out)
+        else:
+            step = self.nfft - self.overlap
+            y = self._correlate(buf, -(-n_out // step))[..., :n_out]
+        self.reset()
+        return self._output(y, buf.ndim)
+
+    def _output(self, y: np.ndarray, ndim: int) -> np.ndarray:
+        """Move the (references, samples) axes of y to where the sample axis was."""
+        axis = self.axis % ndim
+        if axis == ndim - 1:
+            return y
+        return np.moveaxis(y, (-2, -1), (axis, axis + 1))
+
+    def _direct(self, n: int) -> bool:
+        """Whether n buffered samples are faster to correlate in the time domain."""
+        single = self.dtype == np.complex64
+        return n > self.overlap and choose_method(n, self.overlap + 1, single=single) == 'direct'
+
+    def _correlate_direct(self, buf: np.ndarray, n_out: int) -> np.ndarray:
+        """Time domain correlation over the first n_out windows of buf."""
+        y = np.empty(buf.shape[:-1] + (self.num_references, n_out),
+                     dtype=np.result_type(buf, self.kernels))
+        for k, kernel in enumerate(self.kernels):
+            y[..., k, :] = correlate(buf[..., : n_out + self.overlap], kernel, mode='valid',
+                                     method='direct')
+        return y
+
+    def _correlate(self, buf: np.ndarray, n_fft: int) -> np.ndarray:
+        """Overlap-save over n_fft windows of buf, zero padding the last one."""
+        step = self.nfft - self.overlap
+        y = np.empty(buf.shape[:-1] + (self.num_references, n_fft * step),
+                     dtype=np.result_type(buf, self.spectra))
+        for i in range(n_fft):
+            # one FFT per channel, shared by all references
+            X = fft(buf[..., i * step : i * step + self.nfft], self.nfft)
+            y[..., i * step : (i + 1) * step] = ifft(X[..., None, :] * self.spectra)[..., :step]
+        return y
+
+def matched_filter(x: np.ndarray, references: Sequence[np.ndarray],
+                   nfft: Optional[int] = None, axis: int = -1) -> np.ndarray:
+    """Correlate a whole signal against each reference.
+
+    Like np.correlate, the output is as long as the longer of x and each
+    reference, so an x shorter than a reference needs references of equal
+    lengths.
+
+    Args:
+        x (np.ndarray): Input signal, 1-D or with channels on the other axes
+        references (sequence of np.ndarray): Reference pulses
+        nfft (int, optional): FFT length. Defaults as in MatchedFilterBank.
+        axis (int, optional): Sample axis of a multi-channel x. Defaults to -1.
+
+    Returns:
+        np.ndarray: (len(references), max(len(x), len(references[i]))) array,
+            row i matching np.correlate(x, references[i], mode='same'), with
+            any channel axes of x around it
+    """
+    bank = MatchedFilterBank(references, nfft, axis)
+    axis = axis % np.ndim(x)
+    n = np.shape(x)[axis]
+    lengths = {len(ref) for ref in references}
+    if n < max(lengths):
+        if len(lengths) > 1:
+            raise ValueError(f'x of length {n} is shorter than some of the references, '
+                             'which must then all have the same length')
+        # np.correlate centres 'same' output on the longer input, the
+        # reference, which zero padding x out to its length gives
+        m = lengths.pop()
+        before = (m - 1) // 2 - n // 2
+        pad = [(0, 0)] * np.ndim(x)
+        pad[axis] = (before, m - n - before)
+        x = np.pad(x, pad)
+    return np.concatenate([bank.process(x), bank.flush()], axis=axis + 1)
+
+def _default_nfft(length: int) -> int:
+    return 1 << int(np.ceil(np.log2(4 * length)))
@@ -0,0 +1,152 @@
+"""Single-pass signal metrics accumulated one block at a time.
+
+Each block is reduced on its real and imaginary parts separately, which are
+views of a complex array, so no complex temporaries are made. Block means
+and variances are merged with the parallel form of Welford's algorithm, so
+the variance stays accurate for signals with a large mean.
+"""
+
+import numpy as np
+
+def _sum_squares(v: np.ndarray) -> float:
+    """sum(v**2) of a real array, accumulated in double precision."""
+    if v.dtype == np.float64:
+        return float(np.dot(v, v))
+    return float(np.einsum('i,i->', v, v, dtype=np.float64))
+
+def _components(x: np.ndarray):
+    """Real views making up x: (x,) for real input, (x.real, x.imag) for complex."""
+    x = np.asarray(x).reshape(-1)
+    if np.iscomplexobj(x):
+        return x.real, x.imag
+    return (x,)
+
+class SignalMetrics:
+    """Running power, mean, variance and peak of a signal.
+
+    update returns its block unchanged, so the accumulator can sit as a tap
+    in a streaming chain, e.g. y = metrics.update(dec.process(y)). Over a
+    whole signal x the results equal
+
+        energy: np.sum(np.abs(x)**2)
+        power:  np.mean(np.abs(x)**2)
+        mean:   np.mean(x)
+        var:    np.var(x)
+        std:    np.std(x)
+        peak:   np.max(np.abs(x)), at peak_index
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.energy = 0.0
+        self.peak = 0.0
+        self.peak_index = None
+        self._mean = None # one running mean per real component
+        self._m2 = 0.0 # sum of squared deviations from the mean
+
+    def update(self, x: np.ndarray) -> np.ndarray:
+        """Add the next block of samples.
+
+        Args:
+            x (np.ndarray): Next block, real or complex
+
+        Returns:
+            np.ndarray: x, unchanged
+        """
+        components = _components(x)
+        n = len(components[0])
+        if n == 0:
+            return x
+
+        means = [float(v.sum(dtype=np.float64)) / n for v in components]
+        m2 = sum(_sum_squares(v - m) for v, m in zip(components, means))
+        self.energy += sum(_sum_squares(v) for v in components)
+
+        if self._mean is None:
+            self._mean, self._m2 = means, m2
+        else:
+            # Chan et al.'s merge of two (count, mean, M2) summaries
+            total = self.count + n
+            deltas = [m - mu for m, mu in zip(means, self._mean)]
+            self._m2 += m2 + sum(d * d for d in deltas) * self.count * n / total
+            self._mean = [mu + d * n / total for mu, d in zip(self._mean, deltas)]
+
+        mag = np.abs(x).reshape(-1)
+        i = int(np.argmax(mag))
+        if self.peak_index is None or mag[i] > self.peak:
+            self.peak, self.peak_index = float(mag[i]), self.count + i
+
+        self.count += n
+        return x
+
+    @property
+    def power(self) -> float:
+        """Mean power, np.mean(np.abs(x)**2)."""
+        return self.energy / self.count
+
+    @property
+    def mean(self):
+        """Mean of the samples, complex if the signal is."""
+        if len(self._mean) == 2:
+            return complex(*self._mean)
+        return self._mean[0]
+
+    @property
+    def var(self) -> float:
+        """Variance about the mean, np.var(x)."""
+        return self._m2 / self.count
+
+    @property
+    def std(self) -> float:
+        return np.sqrt(self.var)
+
+    def power_db(self, reference: float = 1.0) -> float:
+        """Mean power in dB relative to reference."""
+        return 10 * np.log10(self.power / reference)
+
+class SNRMetrics:
+    """Running signal to noise (or quantization noise) ratio.
+
+    Each update takes a block of the clean reference signal and the same
+    block after noise, quantization or any other impairment. The noise is
+    their difference. Over a whole signal,
+
+        snr = 10*log10(np.sum(np.abs(reference)**2) / np.sum(np.abs(reference - impaired)**2))
+
+    which is the SQNR of hw1 when impaired is the quantized signal.
+    """
+
+    def __init__(self):
+        self.signal = SignalMetrics()
+        self.reset()
+
+    def reset(self):
+        self.signal.reset()
+        self.noise_energy = 0.0
+
+    def update(self, reference: np.ndarray, impaired: np.ndarray) -> np.ndarray:
+        """Add the next block of reference and impaired samples.
+
+        Returns:
+            np.ndarray: impaired, unchanged
+        """
+        self.signal.update(reference)
+        ref, imp = _components(reference), _components(impaired)
+        for r, y in zip(ref, imp):
+            self.noise_energy += _sum_squares(r - y)
+        # an imaginary part only one of the two has is all noise
+        for v in ref[len(imp):] + imp[len(ref):]:
+            self.noise_energy += _sum_squares(v)
+        return impaired
+
+    @property
+    def noise_power(self) -> float:
+        return self.noise_energy / self.signal.count
+
+    @property
+    def snr(self) -> float:
+        """Signal to noise ratio in dB."""
+        return 10 * np.log10(self.signal.energy / self.noise_energy)
@@ -0,0 +1,341 @@
+"""Multistage decimation planning.
+
+A large decimation is cheapest as a cascade of smaller ones: the early
+stages run at a high rate but can afford wide transition bands, and only
+the last, slowest stage has to be sharp. plan_decimation enumerates the
+ways of splitting a rate change into stages, designs a linear phase
+low-pass for each, and keeps the chain with the fewest multiplies per
+input sample.
+
+Every stage keeps the band below the passband edge free of aliases: a
+stage decimating to rate fo has its stopband from fo - passband, so what
+folds back lands in the transition band above the passband, which the
+later stages remove. A decimate by 2 stage with this specification is a
+half-band filter, every other tap of which is exactly zero.
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+from .convolution import next_pow2
+from .decimation import FS4Downconverter, PolyphaseDecimator
+from .transforms import rfft
+
+STAGE_KINDS = ('fs4', 'halfband', 'lowpass')
+DESIGN_METHODS = ('kaiser', 'remez')
+MAX_REDESIGNS = 20 # length increases tried before a stage is given up on
+
+class DecimationStage:
+    """One filter and downsample step of a decimation chain.
+
+    Attributes:
+        kind (str): 'fs4' for the multiplier-free fs/4 downconverter,
+            'halfband' or 'lowpass'
+        factor (int): Decimation factor
+        input_rate (float): Sample rate into the stage in Hz
+        taps (np.ndarray): Real low-pass taps
+    """
+
+    def __init__(self, kind: str, factor: int, input_rate: float, taps: np.ndarray):
+        if kind not in STAGE_KINDS:
+            raise ValueError(f'kind must be one of {STAGE_KINDS}, not {kind!r}')
+        if kind == 'fs4' and factor != 4:
+            raise ValueError('an fs4 stage decimates by 4')
+        self.kind = kind
+        self.factor = int(factor)
+        self.input_rate = float(input_rate)
+        self.taps = np.asarray(taps)
+
+    @property
+    def output_rate(self) -> float:
+        return self.input_rate / self.factor
+
+    @property
+    def num_multiplies(self) -> int:
+        """Nonzero taps, the multiplies per output sample."""
+        return int(np.count_nonzero(self.taps))
+
+    @property
+    def macs(self) -> float:
+        """Multiply-accumulates per input sample of the stage."""
+        return self.num_multiplies / self.factor
+
+    def decimator(self, phase: int = 0) -> PolyphaseDecimator:
+        """A new streaming decimator running this stage."""
+        if self.kind == 'fs4':
+            return FS4Downconverter(self.taps, phase)
+        return PolyphaseDecimator(self.taps, self.factor, phase)
+
+    def response(self, f: np.ndarray) -> np.ndarray:
+        """Magnitude response at baseband frequencies f in Hz."""
+        f = np.asarray(f, dtype=float) / self.input_rate
+        phase = np.exp(-2j * np.pi * np.multiply.outer(f, np.arange(len(self.taps))))
+        return np.abs(phase @ self.taps)
+
+class DecimationPlan:
+    """A chain of decimation stages and what it costs.
+
+    Args:
+        input_rate (float): Sample rate into the chain in Hz
+        stages (sequence of DecimationStage): In processing order. Only the
+            first may be an fs4 stage.
+        passband (float, optional): Highest baseband frequency kept, in Hz.
+            Only used by report. Defaults to None.
+
+    Attributes:
+        input_rate (float): Sample rate into the chain in Hz
+        output_rate (float): Sample rate out of the chain in Hz
+        stages (list of DecimationStage): In processing order
+        passband (float): Highest baseband frequency kept, in Hz, or None
+    """
+
+    def __init__(self, input_rate: float, stages: Sequence[DecimationStage],
+                 passband: Optional[float] = None):
+        self.input_rate = float(input_rate)
+        self.stages = list(stages)
+        self.passband = passband
+        rate = self.input_rate
+        for i, stage in enumerate(self.stages):
+            if not np.isclose(stage.input_rate, rate):
+                raise ValueError(f'stage {i} expects {stage.input_rate:g} Sps, not {rate:g} Sps')
+            if stage.kind == 'fs4' and i > 0:
+                raise ValueError('only the first stage can be an fs4 downconverter')
+            rate = stage.output_rate
+        self.output_rate = rate
+
+    @property
+    def factors(self) -> Tuple[int, ...]:
+        return tuple(stage.factor for stage in self.stages)
+
+    @property
+    def macs_per_sample(self) -> float:
+        """Multiply-accumulates per input sample of the chain."""
+        return sum(stage.macs * stage.input_rate / self.input_rate for stage in self.stages)
+
+    @property
+    def delay(self) -> float:
+        """Group delay of the decimators() chain, in output samples.
+
+        The fs4 stage is centred by decimators() and adds none.
+        """
+        return sum((len(stage.taps) - 1) / 2 * self.output_rate / stage.input_rate
+                   for stage in self.stages if stage.kind != 'fs4')
+
+    def decimators(self) -> List[PolyphaseDecimator]:
+        """New streaming decimators for every stage, e.g. for receive.
+
+        An fs4 stage is centred like np.convolve(..., mode='same'), as the
+        fs/4 stage of receive is; the others start at the first output of
+        the full convolution.
+        """
+        return [stage.decimator((len(stage.taps) - 1) // 2 if stage.kind == 'fs4' else 0)
+                for stage in self.stages]
+
+    def response(self, f: np.ndarray) -> np.ndarray:
+        """Combined magnitude response at baseband frequencies f in Hz.
+
+        Each stage's response repeats at its own input rate, so this is the
+        gain of a tone at f, measured relative to the fs/4 carrier for a
+        chain that starts with the downconverter, before the final
+        decimation folds it into the output band.
+        """
+        gain = np.ones(np.shape(f))
+        for stage in self.stages:
+            gain = gain * stage.response(f)
+        return gain
+
+    def report(self) -> str:
+        """Table of the stages, their rates, lengths and costs."""
+        lines = [f"{'stage':>5} {'kind':>8} {'factor':>6} {'in (Sps)':>10} {'out (Sps)':>10} "
+                 f"{'taps':>5} {'nonzero':>7} {'MACs/in':>8} {'MACs/chain in':>13}"]
+        for i, stage in enumerate(self.stages):
+            share = stage.macs * stage.input_rate / self.input_rate
+            lines.append(f'{i:>5} {stage.kind:>8} {stage.factor:>6} {stage.input_rate:>10.4g} '
+                         f'{stage.output_rate:>10.4g} {len(stage.taps):>5} {stage.num_multiplies:>7} '
+                         f'{stage.macs:>8.2f} {share:>13.3f}')
+        total = f'total {self.macs_per_sample:.3f} MACs per input sample'
+        if self.passband is not None:
+            f = np.linspace(0, self.passband, 256)
+            ripple = 20 * np.log10(self.response(f))
+            total += f', passband {ripple.min():+.3f}/{ripple.max():+.3f} dB'
+        lines.append(total)
+        return '\n'.join(lines)
+
+def _factorizations(n: int, max_parts: int):
+    """Ordered factorizations of n into at most max_parts factors of 2 or more."""
+    if n == 1:
+        yield ()
+        return
+    if max_parts == 0:
+        return
+    for first in range(2, n + 1):
+        if n % first == 0:
+            for rest in _factorizations(n // first, max_parts - 1):
+                yield (first,) + rest
+
+def _num_taps(length: float, halfband: bool) -> int:
+    """Smallest odd length, 3 mod 4 for a half-band filter, of at least length."""
+    n = max(3, int(np.ceil(length)))
+    step = 4 if halfband else 2
+    while n % step != step - 1:
+        n += 1
+    return n
+
+def _estimate_taps(width: float, pass_ripple: float, stop_ripple: float, method: str) -> float:
+    """Kaiser's length estimates for a transition band width in cycles per sample."""
+    if method == 'kaiser':
+        atten = -20 * np.log10(min(pass_ripple, stop_ripple))
+        return (atten - 7.95) / (14.36 * width) + 1
+    return (-20 * np.log10(np.sqrt(pass_ripple * stop_ripple)) - 13) / (14.6 * width) + 1
+
+def _meets(taps: np.ndarray, f_pass: float, f_stop: float, pass_ripple: float,
+           stop_ripple: float) -> bool:
+    # magnitude on a grid 16 times denser than the taps' own resolution
+    nfft = next_pow2(32 * len(taps))
+    mag = np.abs(rfft(taps, nfft))
+    f = np.arange(len(mag)) / nfft
+    return bool(np.max(np.abs(mag[f <= f_pass] - 1)) <= pass_ripple
+                and np.max(mag[f >= f_stop]) <= stop_ripple)
+
+@lru_cache(maxsize=128)
+def design_stage(factor: int, passband: float, pass_ripple: float, stop_ripple: float,
+                 method: str = 'kaiser') -> np.ndarray:
+    """Design the low-pass filter of one decimation stage.
+
+    The passband runs to passband and the stopband from 1/factor - passband,
+    both in cycles per input sample, so nothing aliases into the passband.
+    Factor 2 stages are half-band filters with exact zeros. The length
+    starts at Kaiser's estimate and grows until the response meets both
+    ripples. Designs are cached, and the returned taps are shared between
+    callers and read-only.
+
+    Args:
+        factor (int): Decimation factor of the stage
+        passband (float): Passband edge in cycles per input sample, below 1/(2 factor)
+        pass_ripple (float): Largest passband deviation from unity gain
+        stop_ripple (float): Largest stopband gain
+        method (str, optional): 'kaiser' for a Kaiser windowed design with
+            scipy.signal.firwin, or 'remez' for an equiripple one. Defaults to 'kaiser'.
+
+    Returns:
+        np.ndarray: Odd length, symmetric taps
+
+    Raises:
+        ValueError: If no design meets the ripples within MAX_REDESIGNS lengths
+    """
+    from scipy import signal
+
+    if method not in DESIGN_METHODS:
+        raise ValueError(f'method must be one of {DESIGN_METHODS}, not {method!r}')
+    f_stop = 1 / factor - passband
+    if not 0 < passband < f_stop:
+        raise ValueError(f'passband {passband:g} leaves no transition band when decimating by {factor}')
+    halfband = factor == 2
+    if halfband:
+        # the bands are symmetric about 1/4, equal ripples keep the response so
+        pass_ripple = stop_ripple = min(pass_ripple, stop_ripple)
+
+    num_taps = _num_taps(_estimate_taps(f_stop - passband, pass_ripple, stop_ripple, method), halfband)
+    for _ in range(MAX_REDESIGNS):
+        if method == 'kaiser':
+            beta = signal.kaiser_beta(-20 * np.log10(min(pass_ripple, stop_ripple)))
+            taps = signal.firwin(num_taps, (passband + f_stop) / 2, window=('kaiser', beta), fs=1)
+        else:
+            taps = signal.remez(num_taps, [0, passband, f_stop, 0.5], [1, 0],
+                                weight=[1, pass_ripple / stop_ripple], fs=1)
+        if halfband:
+            centre = num_taps // 2
+            taps[1::2] = 0 # every other tap from the centre, which is odd
+            taps[centre] = 0.5
+        if _meets(taps, passband, f_stop, pass_ripple, stop_ripple):
+            taps.flags.writeable = False
+            return taps
+        num_taps = _num_taps(num_taps * 1.05 + 1, halfband)
+    raise ValueError(f'no decimate by {factor} design meets the ripples with up to {num_taps} taps')
+
+def _stage_specs(input_rate: float, factors: Sequence[int], passband: float, fs4: bool):
+    """(kind, factor, input rate, passband in cycles per input sample) of each stage."""
+    specs, rate = [], input_rate
+    for i, factor in enumerate(factors):
+        kind = 'fs4' if fs4 and i == 0 else 'halfband' if factor == 2 else 'lowpass'
+        specs.append((kind, factor, rate, passband / rate))
+        rate /= factor
+    return specs
+
+def plan_decimation(input_rate: float, output_rate: float, passband: float,
+                    stopband_atten: float = 60.0, ripple: float = 0.1, fs4: bool = False,
+                    method: str = 'kaiser', max_stages: int = 4,
+                    num_candidates: int = 4) -> DecimationPlan:
+    """Find the cheapest chain of decimation stages for a rate change.
+
+    Every ordered factorization of input_rate / output_rate into at most
+    max_stages factors is costed with estimated filter lengths, and the
+    num_candidates cheapest are designed. Of those, the one with the fewest
+    multiply-accumulates per input sample wins, the one with fewer stages
+    on a tie.
+
+    Each stage is designed for the full stopband attenuation, since the
+    aliases of every stage land in the passband independently, and for an
+    equal share of the passband ripple.
+
+    Args:
+        input_rate (float): Sample rate in Hz
+        output_rate (float): Sample rate wanted, input_rate divided by an integer
+        passband (float): Highest baseband frequency to keep in Hz, below output_rate / 2
+        stopband_atten (float, optional): Attenuation of everything that
+            aliases into the passband, in dB. Defaults to 60.
+        ripple (float, optional): Largest passband deviation of the whole
+            chain in dB. Defaults to 0.1.
+        fs4 (bool, optional): Whether the signal is on an fs/4 carrier. The
+            chain then starts with the multiplier-free fs/4 downconverter
+            and passband is measured from the carrier. Defaults to False.
+        method (str, optional): 'kaiser' or 'remez', see design_stage.
+            Defaults to 'kaiser'.
+        max_stages (int, optional): Most stages in the chain. Defaults to 4.
+        num_candidates (int, optional): Chains designed after the estimate.
+            Defaults to 4.
+
+    Returns:
+        DecimationPlan: The cheapest chain found
+    """
+    ratio = input_rate / output_rate
+    total = int(round(ratio))
+    if total < 1 or not np.isclose(ratio, total, rtol=1e-9, atol=0):
+        raise ValueError(f'input_rate / output_rate must be an integer, not {ratio:g}')
+    if not 0 < passband < output_rate / 2:
+        raise ValueError(f'passband must be between 0 and {output_rate / 2:g} Hz')
+    if fs4 and total % 4:
+        raise ValueError('an fs/4 chain needs a rate change divisible by 4')
+    if method not in DESIGN_METHODS:
+        raise ValueError(f'method must be one of {DESIGN_METHODS}, not {method!r}')
+
+    stop_ripple = 10**(-stopband_atten / 20)
+    head = (4,) if fs4 else ()
+    candidates = []
+    for rest in _factorizations(total // 4 if fs4 else total, max_stages - len(head)):
+        factors = head + rest
+        pass_ripple = (10**(ripple / 20) - 1) / max(len(factors), 1)
+        specs = _stage_specs(input_rate, factors, passband, fs4)
+        cost = 0.0
+        for kind, factor, rate, fp in specs:
+            n = _estimate_taps(1 / factor - 2 * fp, pass_ripple, stop_ripple, method)
+            n = n / 2 + 1 if kind == 'halfband' else n # the zeros are free
+            cost += n / factor * rate / input_rate
+        candidates.append((cost, len(factors), factors, specs, pass_ripple))
+    candidates.sort(key=lambda c: c[:2])
+
+    best = None
+    for _, _, factors, specs, pass_ripple in candidates[:num_candidates]:
+        try:
+            stages = [DecimationStage(kind, factor, rate,
+                                      design_stage(factor, fp, pass_ripple, stop_ripple, method))
+                      for kind, factor, rate, fp in specs]
+        except ValueError:
+            continue # this factorization cannot meet the specification
+        plan = DecimationPlan(input_rate, stages, passband)
+        if best is None or (plan.macs_per_sample, len(stages)) < (best.macs_per_sample, len(best.stages)):
+            best = plan
+    if best is None:
+        raise ValueError('no decimation chain meets the specification')
+    return best
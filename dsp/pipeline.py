@@ -0,0 +1,252 @@
+"""Streaming stages run on worker threads, joined by bounded ring buffers.
+
+Each stage of a Pipeline is a processor with the reset/process/flush
+interface of the decimators and the matched filter bank. It runs on its
+own thread, reading blocks from a preallocated ring buffer and writing its
+outputs to the next one. NumPy releases the GIL inside convolutions and
+FFTs, so the stages overlap on several cores. A full buffer blocks its
+writer, so a fast stage waits for a slow one instead of queueing data.
+
+The buffers keep the boundaries of the blocks written to them, so every
+stage sees exactly the blocks a sequential loop would give it, process
+for each input block followed by flush, and the outputs are identical to
+that loop's bit for bit. Only a block longer than a buffer is split.
+"""
+
+import threading
+from collections import deque
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+PIPELINE_CAPACITY = 2**21 # samples in the buffer feeding the first stage
+
+class PipelineAborted(RuntimeError):
+    """Raised in threads waiting on a RingBuffer when it is aborted."""
+
+class RingBuffer:
+    """Bounded first in, first out queue of sample blocks.
+
+    Blocks are copied along their last axis into one array, allocated on the
+    first put with that block's dtype and leading (channel) shape, and read
+    back one block at a time. put waits while the buffer is full and get
+    while it is empty, until close marks the end of the stream.
+
+    Args:
+        capacity (int): Samples the buffer holds
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError('capacity must be a positive integer')
+        self.capacity = int(capacity)
+        self._data = None
+        self._blocks = deque() # (start, length) of each unread block
+        self._head = 0 # index the next sample is written to
+        self._used = 0 # samples held
+        self._closed = False
+        self._aborted = False
+        self._cond = threading.Condition()
+
+    def put(self, x: np.ndarray):
+        """Copy a block in, waiting for room. Longer blocks are split to fit."""
+        x = np.asarray(x)
+        n = x.shape[-1]
+        for start in range(0, max(n, 1), self.capacity): # an empty block is kept too
+            self._put(x[..., start : start + self.capacity])
+
+    def get(self) -> Optional[np.ndarray]:
+        """Take the oldest block, waiting for one.
+
+        Returns:
+            np.ndarray: The block, or None once the buffer is closed and empty
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._aborted or self._blocks or self._closed)
+            self._check()
+            if not self._blocks:
+                return None
+            start, n = self._blocks.popleft()
+            first = min(n, self.capacity - start) # samples before wrapping around
+            x = np.concatenate([self._data[..., start : start + first],
+                                self._data[..., : n - first]], axis=-1)
+            self._used -= n
+            self._cond.notify_all()
+        return x
+
+    def close(self):
+        """Mark the end of the stream."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def abort(self):
+        """Wake every thread waiting on the buffer with PipelineAborted."""
+        with self._cond:
+            self._aborted = True
+            self._cond.notify_all()
+
+    def _put(self, x: np.ndarray):
+        n = x.shape[-1]
+        with self._cond:
+            if self._closed:
+                raise ValueError('put on a closed RingBuffer')
+            if self._data is None:
+                self._data = np.empty(x.shape[:-1] + (self.capacity,), dtype=x.dtype)
+            self._cond.wait_for(lambda: self._aborted or self._used + n <= self.capacity)
+            self._check()
+            start = self._head
+            first = min(n, self.capacity - start)
+            self._data[..., start : start + first] = x[..., :first]
+            self._data[..., : n - first] = x[..., first:]
+            self._head = (start + n) % self.capacity
+            self._used += n
+            self._blocks.append((start, n))
+            self._cond.notify_all()
+
+    def _check(self):
+        if self._aborted:
+            raise PipelineAborted('the pipeline was stopped')
+
+class Pipeline:
+    """A chain of streaming processors, each running on its own thread.
+
+    A processor has reset(), process(x), returning the outputs a block
+    completes, and flush(), returning what is left at the end of the stream,
+    with samples on the last axis of both. Processors are reset at the start
+    of every run. An exception in any stage stops the others and is raised
+    to the caller.
+
+    Args:
+        stages (sequence of (str, processor)): Named processors in order
+        capacity (int, optional): Samples held by the buffer feeding the first
+            stage. The buffer after a processor with a factor attribute, such
+            as a decimator, holds factor times fewer. Defaults to
+            PIPELINE_CAPACITY.
+    """
+
+    def __init__(self, stages: Sequence[Tuple[str, object]], capacity: int = PIPELINE_CAPACITY):
+        self.stages = list(stages)
+        if not self.stages:
+            raise ValueError('a pipeline needs at least one stage')
+        self.capacity = int(capacity)
+
+    @property
+    def names(self) -> List[str]:
+        return [name for name, _ in self.stages]
+
+    def run(self, blocks, outputs: Optional[Sequence[Union[str, int]]] = None) -> List[np.ndarray]:
+        """Stream blocks through every stage and collect the outputs.
+
+        Args:
+            blocks (iterable of np.ndarray): Input blocks. Each is copied into
+                the first buffer, so a generator may reuse one array.
+            outputs (sequence of str or int, optional): Stages, by name or
+                index, whose outputs are kept. Defaults to the last stage.
+
+        Returns:
+            list of np.ndarray: Concatenated output of each stage in outputs
+        """
+        index = [self._index(stage) for stage in (outputs or [-1])]
+        sinks = {i: [] for i in index}
+        rings, threads = self._start(blocks, sinks, stream=False)
+        self._join(rings, threads)
+        return [np.concatenate(sinks[i], axis=-1) for i in index]
+
+    def stream(self, blocks) -> Iterator[np.ndarray]:
+        """Stream blocks through every stage, yielding the last one's outputs.
+
+        Closing the generator early stops the pipeline.
+
+        Args:
+            blocks (iterable of np.ndarray): Input blocks
+
+        Yields:
+            np.ndarray: Output of the last stage, one block at a time
+        """
+        rings, threads = self._start(blocks, {}, stream=True)
+        try:
+            while True:
+                y = rings[-1].get()
+                if y is None:
+                    break
+                yield y
+        except PipelineAborted:
+            pass # a stage failed, _join raises its error
+        finally:
+            self._abort(rings) # a no-op unless the caller stopped early
+            self._join(rings, threads)
+
+    def _index(self, stage: Union[str, int]) -> int:
+        if isinstance(stage, str):
+            return self.names.index(stage)
+        return range(len(self.stages))[stage]
+
+    def _start(self, blocks, sinks: dict, stream: bool):
+        """Build the buffers and start the source and stage threads.
+
+        rings[i] feeds stage i. Only stream reads the last stage through a
+        buffer, run collects it into its sink instead.
+        """
+        self._errors = []
+        rings = [RingBuffer(self.capacity)]
+        for _, processor in self.stages[: None if stream else -1]:
+            factor = getattr(processor, 'factor', 1)
+            rings.append(RingBuffer(max(1, -(-rings[-1].capacity // factor))))
+        if not stream:
+            rings.append(None)
+
+        threads = [threading.Thread(target=self._source, args=(blocks, rings),
+                                    name='pipeline-source', daemon=True)]
+        for i, (name, processor) in enumerate(self.stages):
+            processor.reset()
+            threads.append(threading.Thread(target=self._stage, args=(i, processor, rings, sinks.get(i)),
+                                            name=f'pipeline-{name}', daemon=True))
+        for thread in threads:
+            thread.start()
+        return rings, threads
+
+    def _join(self, rings, threads):
+        """Wait for every thread and raise the first stage error."""
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def _abort(self, rings):
+        for ring in rings:
+            if ring is not None:
+                ring.abort()
+
+    def _fail(self, error: BaseException, rings):
+        if not isinstance(error, PipelineAborted): # the others were woken by the failure
+            self._errors.append(error)
+        self._abort(rings)
+
+    def _source(self, blocks, rings):
+        try:
+            for block in blocks:
+                rings[0].put(block)
+            rings[0].close()
+        except BaseException as error:
+            self._fail(error, rings)
+
+    def _stage(self, i: int, processor, rings, sink: Optional[list]):
+        src, dst = rings[i], rings[i + 1]
+
+        def emit(y):
+            if sink is not None:
+                sink.append(y)
+            if dst is not None:
+                dst.put(y)
+
+        try:
+            while True:
+                x = src.get()
+                if x is None:
+                    break
+                emit(processor.process(x))
+            emit(processor.flush())
+            if dst is not None:
+                dst.close()
+        except BaseException as error:
+            self._fail(error, rings)
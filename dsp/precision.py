@@ -0,0 +1,88 @@
+"""Floating point precision policy shared by the dsp package.
+
+The policy is 'double' (float64/complex128) or 'single' (float32/complex64).
+Generators and noise default to its complex type, and filters cast their
+taps to it once when they are built, so a chain fed with policy-typed
+samples stays in that precision from end to end. Single precision halves
+the memory traffic of every stage.
+
+The policy starts from $APPLIED_DSP_PRECISION, 'double' if unset, and is
+changed with set_precision or, for a block of code, the use_precision context
+manager. Objects keep the precision they were built with.
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Optional
+import numpy as np
+
+PRECISION_ENV = 'APPLIED_DSP_PRECISION'
+
+PRECISIONS = {
+    'double': (np.dtype(np.float64), np.dtype(np.complex128)),
+    'single': (np.dtype(np.float32), np.dtype(np.complex64)),
+}
+
+def _check(name: str) -> str:
+    if name not in PRECISIONS:
+        raise ValueError(f"precision must be one of {sorted(PRECISIONS)}, not {name!r}")
+    return name
+
+_precision = _check(os.environ.get(PRECISION_ENV) or 'double')
+
+def get_precision() -> str:
+    """The current policy, 'double' or 'single'."""
+    return _precision
+
+def set_precision(name: str):
+    """Set the policy used by everything built from now on.
+
+    Args:
+        name (str): 'double' or 'single'
+    """
+    global _precision
+    _precision = _check(name)
+
+@contextmanager
+def use_precision(name: str):
+    """Use a precision policy inside a with block, restoring the old one after."""
+    previous = get_precision()
+    set_precision(name)
+    try:
+        yield
+    finally:
+        set_precision(previous)
+
+def real_dtype() -> np.dtype:
+    """Real floating point type of the policy."""
+    return PRECISIONS[_precision][0]
+
+def complex_dtype(dtype=None) -> np.dtype:
+    """Complex type of the policy, or np.dtype(dtype) if one is given."""
+    if dtype is not None:
+        return np.dtype(dtype)
+    return PRECISIONS[_precision][1]
+
+def as_precision(a: np.ndarray, dtype: Optional[np.dtype] = None) -> np.ndarray:
+    """Cast floating point data to a precision, keeping it real or complex.
+
+    Integer and boolean arrays are returned unchanged.
+
+    Args:
+        a (np.ndarray): Array to cast
+        dtype (optional): Any floating point type of the target precision,
+            e.g. the type of the samples a filter will see. Defaults to the
+            policy, as does a non-floating point dtype.
+
+    Returns:
+        np.ndarray: a, without a copy when it already has that precision
+    """
+    a = np.asarray(a)
+    if not np.issubdtype(a.dtype, np.inexact):
+        return a
+    if dtype is not None and np.issubdtype(dtype, np.inexact):
+        real = np.finfo(dtype).dtype
+    else:
+        real = real_dtype()
+    target = np.result_type(real, np.complex64) if np.iscomplexobj(a) else real
+    return a.astype(target, copy=False)
@@ -0,0 +1,277 @@
+"""Per-stage wall time, throughput and memory of a processing chain.
+
+A Profiler times named stages, either code run inside its stage context
+manager or the process and flush calls of a streaming processor wrapped
+with wrap. Every call is recorded with the samples it took in and gave
+out, and optionally the peak memory it allocated, traced by tracemalloc.
+The calls add up to a per-stage summary, written as JSON or CSV, and can
+be written as a trace of events for chrome://tracing, Perfetto or
+speedscope.
+
+A disabled Profiler hands out a shared no-op context manager and returns
+processors unwrapped, so instrumented code costs nothing extra when it is
+not being profiled.
+
+Example:
+    profiler = Profiler()
+    with profiler.stage('noise') as span:
+        x = NoiseSource(seed).generate(N)
+        span.samples_out = x.size
+    r = receive(blocks, lpf, lpf_dec5, bank, profiler=profiler)
+    print(profiler.report())
+    profiler.write('profile.json')
+"""
+
+import csv
+import json
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Union
+import numpy as np
+
+SUMMARY_FIELDS = ('stage', 'calls', 'seconds', 'samples_in', 'samples_out', 'msps_in', 'msps_out',
+                  'peak_bytes')
+
+class Span:
+    """One timed call of a stage, as handed out by Profiler.stage.
+
+    Attributes:
+        name (str): Stage name
+        samples_in (int): Samples the call consumed, summed over channels
+        samples_out (int): Samples the call produced, summed over channels
+        start (float): time.perf_counter() at the start of the call
+        seconds (float): Wall time of the call
+        peak_bytes (int): Peak memory allocated during the call above what
+            was allocated at its start, or None without memory tracing
+        thread (int): Identifier of the thread the call ran on
+    """
+
+    def __init__(self, profiler: 'Profiler', name: str, samples_in: int = 0):
+        self.name = name
+        self.samples_in = samples_in
+        self.samples_out = 0
+        self.start = self.seconds = 0.0
+        self.peak_bytes = None
+        self.thread = threading.get_ident()
+        self._profiler = profiler
+        self._base = self._peak = 0 # traced bytes at the start, highest traced so far
+
+    def __enter__(self) -> 'Span':
+        if self._profiler.memory:
+            self._profiler._push(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        if self._profiler.memory:
+            self._profiler._pop(self)
+        self._profiler._record(self)
+        return False
+
+class _NullSpan:
+    """Span of a disabled Profiler, which records nothing."""
+
+    name, samples_in, samples_out = None, 0, 0
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass # span.samples_out = ... is allowed and ignored
+
+_NULL_SPAN = _NullSpan()
+
+class _Profiled:
+    """Streaming processor whose process and flush calls are recorded as a stage."""
+
+    def __init__(self, profiler: 'Profiler', name: str, processor):
+        self._profiler = profiler
+        self._name = name
+        self._processor = processor
+
+    def __getattr__(self, name):
+        return getattr(self._processor, name) # factor, taps, ... of the wrapped processor
+
+    def reset(self):
+        self._processor.reset()
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        with self._profiler.stage(self._name, np.size(x)) as span:
+            y = self._processor.process(x)
+            span.samples_out = np.size(y)
+        return y
+
+    def flush(self) -> np.ndarray:
+        with self._profiler.stage(self._name) as span:
+            y = self._processor.flush()
+            span.samples_out = np.size(y)
+        return y
+
+class Profiler:
+    """Records the calls of named processing stages.
+
+    Memory is traced with tracemalloc, started by the first stage if it is
+    not already running. Each call reports its peak above the memory
+    allocated when it started, including any nested stages. tracemalloc
+    slows allocation down, so time and memory are best profiled in separate
+    runs, and it traces the whole process, so stages running at the same
+    time on different threads see each other's allocations.
+
+    Args:
+        enabled (bool, optional): Whether to record anything. Defaults to True.
+        memory (bool, optional): Whether to trace the peak memory of each
+            call. Defaults to False.
+    """
+
+    def __init__(self, enabled: bool = True, memory: bool = False):
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.spans = [] # every recorded call, in the order they finished
+        self._lock = threading.Lock()
+        self._stack = [] # open spans tracing memory, outermost first
+        self._origin = time.perf_counter() # time zero of the trace
+
+    def clear(self):
+        """Forget every recorded call."""
+        with self._lock:
+            self.spans = []
+            self._origin = time.perf_counter()
+
+    def stage(self, name: str, samples_in: int = 0):
+        """Context manager timing one call of a stage.
+
+        Args:
+            name (str): Stage name, calls with the same name are summed
+            samples_in (int, optional): Samples the call consumes. Defaults to 0.
+
+        Returns:
+            Span: Set its samples_out before the block ends to record the
+                samples produced
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, samples_in)
+
+    def wrap(self, name: str, processor):
+        """Record every process and flush call of a streaming processor.
+
+        Args:
+            name (str): Stage name
+            processor: Object with reset, process and flush methods, such as
+                a PolyphaseDecimator or MatchedFilterBank
+
+        Returns:
+            The processor itself if the profiler is disabled, otherwise a
+                proxy with the same methods and attributes
+        """
+        if not self.enabled:
+            return processor
+        return _Profiled(self, name, processor)
+
+    def summary(self) -> List[dict]:
+        """Totals of each stage, in the order the stages first finished a call.
+
+        Returns:
+            list of dict: One row per stage with the keys in SUMMARY_FIELDS.
+                Throughputs are in millions of samples per second of the
+                stage's own wall time, and peak_bytes is the largest peak of
+                any call, or None without memory tracing.
+        """
+        rows = OrderedDict()
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            row = rows.setdefault(span.name, dict(stage=span.name, calls=0, seconds=0.0, samples_in=0,
+                                                  samples_out=0, peak_bytes=None))
+            row['calls'] += 1
+            row['seconds'] += span.seconds
+            row['samples_in'] += int(span.samples_in)
+            row['samples_out'] += int(span.samples_out)
+            if span.peak_bytes is not None:
+                row['peak_bytes'] = max(row['peak_bytes'] or 0, span.peak_bytes)
+        for row in rows.values():
+            seconds = row['seconds'] or float('nan')
+            row['msps_in'] = row['samples_in'] / seconds / 1e6
+            row['msps_out'] = row['samples_out'] / seconds / 1e6
+        return [{field: row[field] for field in SUMMARY_FIELDS} for row in rows.values()]
+
+    def report(self) -> str:
+        """Table of the stage totals."""
+        lines = [f"{'stage':>12} {'calls':>6} {'seconds':>9} {'samples in':>12} {'samples out':>12} "
+                 f"{'Msps in':>9} {'Msps out':>9} {'peak MB':>8}"]
+        for row in self.summary():
+            peak = '' if row['peak_bytes'] is None else f"{row['peak_bytes'] / 2**20:.1f}"
+            lines.append(f"{row['stage']:>12} {row['calls']:>6} {row['seconds']:>9.4f} "
+                         f"{row['samples_in']:>12} {row['samples_out']:>12} {row['msps_in']:>9.1f} "
+                         f"{row['msps_out']:>9.1f} {peak:>8}")
+        return '\n'.join(lines)
+
+    def write(self, path: Union[str, Path]):
+        """Write the stage totals to a .csv file, or JSON for any other suffix."""
+        path = Path(path)
+        rows = self.summary()
+        if path.suffix.lower() == '.csv':
+            with path.open('w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            path.write_text(json.dumps(dict(stages=rows), indent=2))
+
+    def write_trace(self, path: Union[str, Path]):
+        """Write every call as a complete event in the Chrome trace event format.
+
+        Each thread becomes a track, so the stages of a Pipeline are shown
+        side by side and the stage calls nested in a larger one as a flame.
+        """
+        with self._lock:
+            spans, origin = list(self.spans), self._origin
+        events = []
+        for span in sorted(spans, key=lambda span: span.start):
+            args = dict(samples_in=int(span.samples_in), samples_out=int(span.samples_out))
+            if span.peak_bytes is not None:
+                args['peak_bytes'] = span.peak_bytes
+            events.append(dict(name=span.name, ph='X', pid=0, tid=span.thread,
+                               ts=(span.start - origin) * 1e6, dur=span.seconds * 1e6, args=args))
+        Path(path).write_text(json.dumps(dict(traceEvents=events, displayTimeUnit='ms')))
+
+    def _record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def _push(self, span: Span):
+        """Start tracing the peak memory of span."""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            for outer in self._stack:
+                outer._peak = max(outer._peak, peak) # kept before the peak is reset below
+            span._base = span._peak = current
+            self._stack.append(span)
+            _reset_peak()
+
+    def _pop(self, span: Span):
+        """Stop tracing span and record its peak."""
+        with self._lock:
+            peak = tracemalloc.get_traced_memory()[1]
+            for open_span in self._stack:
+                open_span._peak = max(open_span._peak, peak)
+            self._stack.remove(span)
+            span.peak_bytes = span._peak - span._base
+
+def _reset_peak():
+    """Restart tracemalloc's peak from the memory allocated now.
+
+    Before Python 3.9 the peak cannot be reset, and a call's peak is the
+    highest since tracing started, an upper bound.
+    """
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
@@ -0,0 +1,143 @@
+"""Uniform and table-driven quantizers."""
+
+import numpy as np
+
+from .metrics import SNRMetrics
+from .precision import real_dtype
+
+def get_quantization_levels(amplitude: float, num_bits: int, dtype=None) -> np.ndarray:
+    """Return quantization levels for a given amplitude and number of bits.
+
+    Uses Mid-Rise algorithm: -A + delta/2 + delta*(0, 1, 2, ..., 2**num_bits - 1)
+    The levels are computed in double precision and rounded to dtype, the
+    precision policy's real type by default.
+    """
+    num_levels = 2**num_bits # number of quantization levels
+    delta = 2*float(amplitude) / num_levels # distance between levels
+    levels = (-float(amplitude) + delta/2) + (np.arange(num_levels) * delta)
+    return levels.astype(real_dtype() if dtype is None else dtype, copy=False)
+
+def _is_uniform(levels: np.ndarray) -> bool:
+    """True if levels are strictly increasing with a constant step."""
+    if len(levels) < 2:
+        return False
+    step = np.diff(levels.astype(np.float64))
+    atol = 0.0
+    if np.issubdtype(levels.dtype, np.inexact):
+        # single precision levels are rounded, allow for that in the spacing
+        atol = 4 * np.finfo(levels.dtype).eps * float(np.max(np.abs(levels)))
+    return bool(step[0] > 0 and np.allclose(step, step[0], rtol=1e-9, atol=atol))
+
+def quantize(signal: np.ndarray, levels: np.ndarray, chunk_size: int = 2**16) -> np.ndarray:
+    """Map each sample of signal to its nearest quantization level.
+
+    The index of the level below each sample is computed in closed form for
+    uniformly spaced levels (e.g. from get_quantization_levels) and with
+    np.searchsorted for any other level table. Only that level and the one
+    above it are compared, so the cost is O(N) instead of O(N * len(levels)).
+    Ties go to the lower level, the same as an argmin over all distances.
+
+    Complex signals quantize I and Q together with the same levels. Samples
+    are processed chunk_size at a time to keep temporaries bounded.
+
+    Args:
+        signal (np.ndarray): Real or complex samples
+        levels (np.ndarray): Quantization levels
+        chunk_size (int, optional): Samples per chunk. Defaults to 2**16.
+
+    Returns:
+        np.ndarray: Quantized signal with the same shape as signal
+    """
+    levels = np.asarray(levels).ravel()
+    signal = np.asarray(signal)
+
+    if np.iscomplexobj(signal):
+        # interleaved I/Q view, so both rails go through a single real pass,
+        # with float levels so the result can be viewed as complex again
+        levels = levels.astype(np.result_type(levels, signal.real.dtype), copy=False)
+        iq = np.ascontiguousarray(signal).view(signal.real.dtype)
+        q = quantize(iq, levels, chunk_size)
+        return q.view(np.result_type(q.dtype, np.complex64)).reshape(signal.shape)
+
+    order = None
+    if _is_uniform(levels):
+        table = levels
+        # mean spacing in double precision, accurate however the levels were rounded
+        base = float(levels[0])
+        delta = (float(levels[-1]) - base) / (len(levels) - 1)
+    else:
+        order = np.argsort(levels, kind='stable')
+        table = levels[order]
+        delta = None
+
+    x = signal.ravel()
+    out = np.empty(len(x), dtype=levels.dtype)
+    if len(table) == 1:
+        out[:] = table[0]
+        return out.reshape(signal.shape)
+
+    top = len(table) - 2 # highest valid index of the lower neighbour
+    for start in range(0, len(x), chunk_size):
+        xc = x[start : start + chunk_size]
+        if delta is not None:
+            idx = np.floor((xc - base) / delta)
+            np.clip(idx, 0, top, out=idx)
+            idx = idx.astype(np.intp)
+        else:
+            idx = np.searchsorted(table, xc) - 1
+            np.clip(idx, 0, top, out=idx)
+        # nearest of the two neighbours, lower one on a tie
+        idx += np.abs(xc - table[idx]) > np.abs(xc - table[idx + 1])
+        if order is not None:
+            idx = order[idx]
+        out[start : start + len(xc)] = levels[idx]
+
+    return out.reshape(signal.shape)
+
+def quantization_sqnr(x: np.ndarray, amplitude: float, num_bits) -> np.ndarray:
+    """SQNR of x quantized to the levels of each number of bits, in dB.
+
+    Equal to quantizing with get_quantization_levels(amplitude, num_bits)
+    and measuring with SNRMetrics, but quantizes for every number of bits in
+    one vectorized pass, e.g. over a batched axis of a sweep.
+
+    Args:
+        x (np.ndarray): Real or complex samples
+        amplitude (float): Amplitude of the levels
+        num_bits (int or np.ndarray): Numbers of bits, of any shape
+
+    Returns:
+        np.ndarray: SQNR for each number of bits, with the shape of num_bits
+    """
+    signal = np.asarray(x)
+    x = signal.ravel()
+    num_bits = np.asarray(num_bits)
+    # the levels as get_quantization_levels computes them, one row per number of bits
+    num_levels = 2.0**num_bits[..., None]
+    delta = 2*float(amplitude) / num_levels
+    first = -float(amplitude) + delta/2
+
+    rails = (x.real, x.imag) if np.iscomplexobj(x) else (x,)
+    xq = np.empty(num_bits.shape + x.shape, dtype=np.result_type(x, real_dtype()))
+    for rail, out in zip(rails, (xq.real, xq.imag) if np.iscomplexobj(xq) else (xq,)):
+        # the uniform path of quantize, with its levels and step rounded the same way
+        dtype = np.result_type(real_dtype(), rail)
+
+        def level(i):
+            return (first + i*delta).astype(real_dtype()).astype(dtype)
+
+        base = level(0).astype(np.float64)
+        step = (level(num_levels - 1) - base) / (num_levels - 1)
+        idx = np.floor((rail - base.astype(rail.dtype)) / step.astype(rail.dtype))
+        np.clip(idx, 0, num_levels - 2, out=idx)
+        lower, upper = level(idx), level(idx + 1)
+        # nearest of the two neighbours, lower one on a tie
+        out[...] = np.where(np.abs(rail - lower) > np.abs(rail - upper), upper, lower)
+
+    sqnr = np.empty(num_bits.shape)
+    metrics = SNRMetrics()
+    for i in np.ndindex(num_bits.shape):
+        metrics.reset()
+        metrics.update(signal, xq[i])
+        sqnr[i] = metrics.snr
+    return sqnr
@@ -0,0 +1,146 @@
+"""The hw4 radar receiver chain, run one block at a time."""
+
+from typing import Optional
+import numpy as np
+
+from .decimation import FS4Downconverter, PolyphaseDecimator
+from .matched_filter import MatchedFilterBank
+from .pipeline import PIPELINE_CAPACITY, Pipeline
+from .profiling import Profiler
+
+class _SameLength:
+    """Centred fs/4 stage whose flush stops at 'same' length, ceil(n_in / factor) outputs."""
+
+    def __init__(self, ddc: FS4Downconverter):
+        self.ddc = ddc
+        self.factor = ddc.factor
+        self.reset()
+
+    def reset(self):
+        self.ddc.reset()
+        self._n_in = self._n_out = 0
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        self._n_in += np.shape(x)[-1]
+        y = self.ddc.process(x)
+        self._n_out += y.shape[-1]
+        return y
+
+    def flush(self) -> np.ndarray:
+        y = self.ddc.flush()[..., : -(-self._n_in // self.factor) - self._n_out]
+        self.reset()
+        return y
+
+class _Magnitude:
+    """Matched filter bank returning the magnitude of its outputs."""
+
+    def __init__(self, bank: MatchedFilterBank):
+        self.bank = bank
+
+    def reset(self):
+        self.bank.reset()
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        return np.abs(self.bank.process(x))
+
+    def flush(self) -> np.ndarray:
+        return np.abs(self.bank.flush())
+
+def _receiver_stages(lpf, lpf_dec5, bank, num_dec5, stages, profiler) -> list:
+    """Named stages of the receiver chain, as taken by receive."""
+    if stages is None:
+        stages = [FS4Downconverter(lpf, phase=(len(lpf) - 1) // 2)]
+        stages += [PolyphaseDecimator(lpf_dec5, 5) for _ in range(num_dec5)]
+    elif not isinstance(stages[0], FS4Downconverter):
+        raise ValueError('the first stage must be an FS4Downconverter')
+    named = ([('fs4', _SameLength(stages[0]))]
+             + [(f'dec{k}', dec) for k, dec in enumerate(stages[1:], 1)]
+             + [('bank', _Magnitude(bank))])
+    if profiler is not None:
+        named = [(name, profiler.wrap(name, processor)) for name, processor in named]
+    return named
+
+def receive(blocks, lpf: Optional[np.ndarray], lpf_dec5: Optional[np.ndarray],
+            bank: MatchedFilterBank, num_dec5: int = 3, stages: Optional[list] = None,
+            profiler: Optional[Profiler] = None):
+    """Demodulate, decimate and pulse compress a stream of blocks.
+
+    Runs the fs/4 downconverter, num_dec5 decimate by 5 stages, and the
+    matched filter bank, carrying filter state from block to block so only
+    one block of the capture needs to be in memory at a time. The
+    concatenated outputs match filtering the whole signal at once with
+    np.convolve(..., mode='same') for the fs/4 stage and
+    np.correlate(..., mode='same') for pulse compression.
+
+    Blocks may be (channels, n) arrays from several receivers, which every
+    stage processes together. bank must then use the default axis=-1.
+
+    The hand-picked fs/4 and decimate by 5 stages can be replaced by a
+    planned chain, passing stages=plan.decimators() for a DecimationPlan
+    from plan_decimation(..., fs4=True).
+
+    Args:
+        blocks (iterable of np.ndarray): Received signal at the full sample rate
+        lpf (np.ndarray): Real low-pass taps of the fs/4 stage
+        lpf_dec5 (np.ndarray): Taps of each decimate by 5 stage
+        bank (MatchedFilterBank): Reference pulses at the decimated sample rate
+        num_dec5 (int, optional): Number of decimate by 5 stages. Defaults to 3.
+        stages (list, optional): Decimators to run instead, starting with a
+            centred FS4Downconverter. lpf, lpf_dec5 and num_dec5 are then
+            unused. Defaults to None.
+        profiler (Profiler, optional): Records the calls of each stage, named
+            as in receiver_pipeline. Defaults to None.
+
+    Yields:
+        (np.ndarray, np.ndarray): Decimated signal and the pulse compression
+            magnitude for each reference, shape (bank.num_references, n), or
+            (channels, bank.num_references, n) for multi-channel blocks
+    """
+    named = _receiver_stages(lpf, lpf_dec5, bank, num_dec5, stages, profiler)
+    chain = [processor for _, processor in named]
+    decimators, compress = chain[:-1], chain[-1]
+    for processor in chain:
+        processor.reset()
+
+    for block in blocks:
+        y = block
+        for dec in decimators:
+            y = dec.process(y)
+        yield y, compress.process(y)
+
+    # flush the filter tails, passing each stage's tail on as a block of its
+    # own so the outputs match receiver_pipeline exactly
+    ys = []
+    for dec in decimators:
+        ys = [dec.process(y) for y in ys] + [dec.flush()]
+    rs = [compress.process(y) for y in ys] + [compress.flush()]
+    yield np.concatenate(ys, axis=-1), np.concatenate(rs, axis=-1)
+
+def receiver_pipeline(lpf: Optional[np.ndarray], lpf_dec5: Optional[np.ndarray],
+                      bank: MatchedFilterBank, num_dec5: int = 3, stages: Optional[list] = None,
+                      capacity: int = PIPELINE_CAPACITY,
+                      profiler: Optional[Profiler] = None) -> Pipeline:
+    """The receive chain as a Pipeline, each stage on its own thread.
+
+    The stages are named 'fs4', 'dec1', 'dec2', ... and 'bank', which
+    outputs the pulse compression magnitude. Running the pipeline gives
+    exactly the concatenated outputs of receive with the same arguments:
+
+        xf, r = receiver_pipeline(lpf, lpf_dec5, bank).run(blocks, outputs=[-2, -1])
+
+    Args:
+        lpf (np.ndarray): Real low-pass taps of the fs/4 stage
+        lpf_dec5 (np.ndarray): Taps of each decimate by 5 stage
+        bank (MatchedFilterBank): Reference pulses at the decimated sample rate
+        num_dec5 (int, optional): Number of decimate by 5 stages. Defaults to 3.
+        stages (list, optional): Decimators to run instead, as in receive.
+            Defaults to None.
+        capacity (int, optional): Samples buffered ahead of the fs/4 stage.
+            Defaults to PIPELINE_CAPACITY.
+        profiler (Profiler, optional): Records the calls of each stage.
+            Defaults to None.
+
+    Returns:
+        Pipeline: The receiver stages
+    """
+    return Pipeline(_receiver_stages(lpf, lpf_dec5, bank, num_dec5, stages, profiler), capacity)
@@ -0,0 +1,274 @@
+"""Synthetic pulse scenarios: pulses added into complex Gaussian noise."""
+
+import os
+from typing import Iterator, Optional
+import numpy as np
+
+from .precision import complex_dtype
+
+def add_pulses(x: np.ndarray, pulse: np.ndarray, starts, amplitudes=1.0,
+               dopplers=0.0, offset: int = 0) -> np.ndarray:
+    """Add scaled, delayed and Doppler shifted copies of pulse into x in place.
+
+    Each pulse is only added to the slice of x it overlaps, so the cost is
+    proportional to the pulse samples that land in x rather than to len(x).
+    x may be one block of a longer signal that starts at sample offset;
+    pulses that fall partly or wholly outside the block are clipped.
+
+    Args:
+        x (np.ndarray): Complex buffer to add the pulses into
+        pulse (np.ndarray): Pulse waveform
+        starts (array_like): Start sample of each pulse
+        amplitudes (array_like, optional): Complex gain of each pulse. Defaults to 1.0.
+        dopplers (array_like, optional): Doppler shift of each pulse in cycles
+            per sample, with zero phase at the pulse start. Defaults to 0.0.
+        offset (int, optional): Sample index of x[0] in the full signal. Defaults to 0.
+
+    Returns:
+        np.ndarray: x
+    """
+    starts = np.asarray(starts, dtype=np.int64).ravel()
+    amplitudes = np.broadcast_to(amplitudes, starts.shape)
+    dopplers = np.broadcast_to(dopplers, starts.shape)
+    n = len(pulse)
+
+    for start, amp, doppler in zip(starts - offset, amplitudes, dopplers):
+        lo, hi = max(start, 0), min(start + n, len(x)) # overlap within x
+        if lo >= hi:
+            continue
+        seg = pulse[lo - start : hi - start]
+        if doppler:
+            shift = np.exp(2j * np.pi * doppler * np.arange(lo - start, hi - start))
+            seg = seg * shift.astype(x.dtype, copy=False)
+            seg *= amp
+            x[lo:hi] += seg
+        elif amp == 1:
+            x[lo:hi] += seg
+        else:
+            x[lo:hi] += amp * seg
+    return x
+
+def complex_noise(size: int, power: float = 1.0, rng=None, dtype=None,
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Complex white Gaussian noise with total power `power`.
+
+    The I and Q samples are drawn interleaved straight into the output buffer.
+
+    Args:
+        size (int): Number of samples
+        power (float, optional): Noise power (variance). Defaults to 1.0.
+        rng (np.random.Generator, optional): Random number generator.
+            Defaults to a new unseeded generator.
+        dtype (optional): np.complex64 or np.complex128. Defaults to the
+            precision policy.
+        out (np.ndarray, optional): Buffer to fill instead of allocating one.
+
+    Returns:
+        np.ndarray: Noise samples
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if out is None:
+        out = np.empty(size, dtype=complex_dtype(dtype))
+    iq = out.view(out.real.dtype)
+    rng.standard_normal(dtype=iq.dtype, out=iq)
+    iq *= np.sqrt(power / 2)
+    return out
+
+NOISE_BLOCK_SIZE = 2**16 # samples drawn from each child generator
+
+class NoiseSource:
+    """Complex white Gaussian noise that can be drawn in parallel, block by block.
+
+    The noise is cut into blocks of block_size samples, and block k is
+    drawn from its own generator, seeded by child k of SeedSequence(seed),
+    the same child SeedSequence.spawn would return. Any sample range can
+    therefore be produced on its own from (seed, offset), and blocks can be
+    filled on a thread pool in any order: the output is identical whatever
+    the number of workers or the order the blocks are drawn in.
+
+    The noise depends on block_size, so keep it fixed for a given seed.
+    The thread pool is started by the first fill that needs it and kept
+    until close, or the end of a with block.
+
+    Args:
+        seed (int, optional): Seed of the root SeedSequence. Defaults to
+            None, fresh entropy that this source then keeps.
+        power (float, optional): Noise power (variance). Defaults to 1.0.
+        dtype (optional): np.complex64 or np.complex128. Defaults to the
+            precision policy.
+        block_size (int, optional): Samples per child generator. Defaults
+            to NOISE_BLOCK_SIZE.
+        workers (int, optional): Threads filling blocks, 1 to draw them in
+            the calling thread. Defaults to the number of CPUs.
+    """
+
+    def __init__(self, seed: Optional[int] = None, power: float = 1.0, dtype=None,
+                 block_size: int = NOISE_BLOCK_SIZE, workers: Optional[int] = None):
+        if block_size < 1:
+            raise ValueError('block_size must be a positive integer')
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.power = power
+        self.dtype = complex_dtype(dtype)
+        self.block_size = int(block_size)
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+
+    def __enter__(self) -> 'NoiseSource':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stop the worker threads. A later fill starts them again."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def rng(self, index: int) -> np.random.Generator:
+        """Fresh generator of block index."""
+        # what seed_sequence.spawn(index + 1)[index] returns, without spawning the others
+        ss = self.seed_sequence
+        child = np.random.SeedSequence(ss.entropy, spawn_key=ss.spawn_key + (index,),
+                                       pool_size=ss.pool_size)
+        return np.random.default_rng(child)
+
+    def block(self, index: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Block index of the noise, samples index*block_size onwards.
+
+        Args:
+            index (int): Block number
+            out (np.ndarray, optional): Buffer to fill, at most block_size
+                long, with the first len(out) samples of the block.
+
+        Returns:
+            np.ndarray: The block
+        """
+        if out is None:
+            out = np.empty(self.block_size, dtype=self.dtype)
+        # normals are drawn in sequence, so a shorter buffer gets a prefix of the block
+        return complex_noise(len(out), self.power, self.rng(index), out=out)
+
+    def fill(self, out: np.ndarray, offset: int = 0) -> np.ndarray:
+        """Fill out with noise samples offset to offset + len(out).
+
+        Args:
+            out (np.ndarray): Buffer of this source's dtype
+            offset (int, optional): Sample index of out[0]. Defaults to 0.
+
+        Returns:
+            np.ndarray: out
+        """
+        if out.dtype != self.dtype:
+            raise TypeError(f'out must be {self.dtype}, not {out.dtype}')
+        B = self.block_size
+        first, last = offset // B, (offset + len(out) - 1) // B
+        jobs = [(k, max(k * B, offset), min((k + 1) * B, offset + len(out)))
+                for k in range(first, last + 1)]
+
+        def draw(job):
+            k, lo, hi = job
+            if lo == k * B: # block starts in out, draw straight into it
+                self.block(k, out[lo - offset : hi - offset])
+            else: # draw up to hi and keep the tail
+                part = self.block(k, np.empty(hi - k * B, dtype=self.dtype))
+                out[lo - offset : hi - offset] = part[lo - k * B :]
+
+        if self.workers > 1 and len(jobs) > 1:
+            if self._pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._pool = ThreadPoolExecutor(self.workers)
+            list(self._pool.map(draw, jobs)) # the generators release the GIL while filling
+        else:
+            for job in jobs:
+                draw(job)
+        return out
+
+    def generate(self, num_samples: int, offset: int = 0) -> np.ndarray:
+        """num_samples of noise starting at sample offset, in a new array."""
+        return self.fill(np.empty(num_samples, dtype=self.dtype), offset)
+
+class PulseScenario:
+    """Pulses in complex white Gaussian noise, generated from a seed.
+
+    The same seed always produces the same signal, whether it is generated
+    whole or block by block with any block size. The noise comes from a
+    NoiseSource, so it is drawn on workers threads, kept until close or
+    the end of a with block.
+
+    Args:
+        num_samples (int): Length of the scenario in samples
+        pulse (np.ndarray): Pulse waveform
+        starts (array_like): Start sample of each pulse
+        amplitudes (array_like, optional): Complex gain of each pulse. Defaults to 1.0.
+        dopplers (array_like, optional): Doppler shift of each pulse in cycles
+            per sample. Defaults to 0.0.
+        noise_power (float, optional): Noise power. Defaults to 1.0.
+        seed (int, optional): Seed of the noise generator. Defaults to None.
+        dtype (optional): np.complex64 or np.complex128. Defaults to the
+            precision policy.
+        workers (int, optional): Threads drawing the noise. Defaults to the
+            number of CPUs.
+    """
+
+    def __init__(self, num_samples: int, pulse: np.ndarray, starts, amplitudes=1.0,
+                 dopplers=0.0, noise_power: float = 1.0, seed: Optional[int] = None,
+                 dtype=None, workers: Optional[int] = None):
+        self.num_samples = int(num_samples)
+        self.pulse = np.asarray(pulse)
+        self.starts = np.asarray(starts, dtype=np.int64).ravel()
+        self.amplitudes = np.broadcast_to(amplitudes, self.starts.shape)
+        self.dopplers = np.broadcast_to(dopplers, self.starts.shape)
+        self.noise_power = noise_power
+        self.seed = seed
+        self.dtype = complex_dtype(dtype)
+        self.noise = NoiseSource(seed, noise_power, self.dtype, workers=workers)
+
+        order = np.argsort(self.starts, kind='stable') # pulses sorted by time
+        self.starts = self.starts[order]
+        self.amplitudes = self.amplitudes[order]
+        self.dopplers = self.dopplers[order]
+
+    def __enter__(self) -> 'PulseScenario':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stop the threads drawing the noise."""
+        self.noise.close()
+
+    def generate(self) -> np.ndarray:
+        """Return the whole scenario as one array."""
+        return self._add(self.noise.generate(self.num_samples), 0)
+
+    def block(self, offset: int, num_samples: int) -> np.ndarray:
+        """num_samples of the scenario from sample offset, generated on their own."""
+        num_samples = max(0, min(num_samples, self.num_samples - offset))
+        return self._add(self.noise.generate(num_samples, offset), offset)
+
+    def blocks(self, block_size: int) -> Iterator[np.ndarray]:
+        """Yield the scenario block_size samples at a time.
+
+        Every block is written into the same preallocated buffer, so each
+        block must be consumed before asking for the next.
+
+        Args:
+            block_size (int): Samples per block; the last block may be shorter
+
+        Yields:
+            np.ndarray: Next block of the scenario
+        """
+        buffer = np.empty(min(block_size, self.num_samples), dtype=self.dtype)
+        for offset in range(0, self.num_samples, block_size):
+            x = buffer[: min(block_size, self.num_samples - offset)]
+            yield self._add(self.noise.fill(x, offset), offset)
+
+    def _add(self, x: np.ndarray, offset: int) -> np.ndarray:
+        """Add the pulses that overlap x, which starts at sample offset."""
+        lo = np.searchsorted(self.starts, offset - len(self.pulse), side='right')
+        hi = np.searchsorted(self.starts, offset + len(x), side='left')
+        return add_pulses(x, self.pulse, self.starts[lo:hi], self.amplitudes[lo:hi],
+                          self.dopplers[lo:hi], offset)
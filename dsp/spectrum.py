@@ -0,0 +1,168 @@
+"""Averaged (Welch) power spectrum estimation over streamed blocks."""
+
+from typing import Tuple, Union
+import numpy as np
+
+from .precision import as_precision, complex_dtype
+from .transforms import fft, fftfreq, fftshift, rfft, rfftfreq
+
+def get_window(window: Union[str, np.ndarray], n: int) -> np.ndarray:
+    """Spectral analysis window of length n.
+
+    Args:
+        window (str or np.ndarray): 'boxcar' or any name scipy.signal.get_window
+            accepts, or the window samples themselves
+        n (int): Window length
+
+    Returns:
+        np.ndarray: Window samples
+    """
+    if not isinstance(window, str):
+        window = np.asarray(window, dtype=float)
+        if len(window) != n:
+            raise ValueError(f'window has length {len(window)}, expected {n}')
+        return window
+    if window in ('boxcar', 'rect', 'rectangular'):
+        return np.ones(n)
+    from scipy.signal import get_window as scipy_window
+    return scipy_window(window, n)
+
+class SpectrumEstimator:
+    """Average windowed periodograms of a signal fed in one block at a time.
+
+    Blocks of any size are cut into segments of nfft samples that overlap by
+    `overlap` samples. Each segment is windowed into a preallocated buffer,
+    transformed (with rfft for real signals) and its power added to a
+    running sum, so memory is O(nfft) however long the signal is.
+
+    Power is normalized by the square of the window sum, so a complex tone of
+    amplitude A that sits on a bin reads 20*log10(A) dB, the same as
+    20*log10(abs(fft(x)/len(x))) for a rectangular window. Real signals give
+    the non-negative half of that two-sided spectrum.
+
+    Segments are windowed and transformed in the precision of dtype; the
+    periodograms are summed in double precision.
+
+    Args:
+        nfft (int): Segment and FFT length
+        sample_rate (float, optional): Sample rate in Sps. Defaults to 1.
+        window (str or np.ndarray, optional): Window, see get_window. Defaults to 'hann'.
+        overlap (int, optional): Samples shared by consecutive segments.
+            Defaults to nfft // 2.
+        dtype (optional): Type of the input samples. Defaults to the
+            precision policy's complex type.
+    """
+
+    def __init__(self, nfft: int, sample_rate: float = 1, window: Union[str, np.ndarray] = 'hann',
+                 overlap: int = None, dtype=None):
+        self.nfft = int(nfft)
+        self.sample_rate = sample_rate
+        self.overlap = self.nfft // 2 if overlap is None else int(overlap)
+        if not 0 <= self.overlap < self.nfft:
+            raise ValueError('overlap must be in [0, nfft)')
+        dtype = complex_dtype(dtype)
+        self.real = not np.issubdtype(dtype, np.complexfloating)
+
+        self.window = as_precision(get_window(window, self.nfft), dtype)
+        self._scale = 1 / np.sum(self.window)**2
+        n_bins = self.nfft // 2 + 1 if self.real else self.nfft
+        self._segment = np.zeros(self.nfft, dtype=dtype) # samples of the segment being filled
+        self._work = np.empty(self.nfft, dtype=np.result_type(dtype, self.window))
+        self._power = np.empty(n_bins) # scratch for one periodogram
+        self._sum = np.zeros(n_bins) # running sum of periodograms
+        self.reset()
+
+    def reset(self):
+        """Discard everything accumulated so far."""
+        self._sum[:] = 0
+        self._fill = 0 # samples in self._segment
+        self.num_segments = 0
+
+    def update(self, x: np.ndarray):
+        """Add a block of samples to the estimate.
+
+        Args:
+            x (np.ndarray): Next block of the signal
+        """
+        hop = self.nfft - self.overlap
+        pos = 0
+        while pos < len(x):
+            take = min(self.nfft - self._fill, len(x) - pos)
+            self._segment[self._fill : self._fill + take] = x[pos : pos + take]
+            self._fill += take
+            pos += take
+            if self._fill == self.nfft:
+                self._accumulate(self._segment)
+                self._segment[: self.overlap] = self._segment[hop:]
+                self._fill = self.overlap
+
+    def frequencies(self) -> np.ndarray:
+        """Frequency of each bin in Hz, in the order estimate() returns them."""
+        if self.real:
+            return rfftfreq(self.nfft, d=1/self.sample_rate)
+        return fftshift(fftfreq(self.nfft, d=1/self.sample_rate))
+
+    def power(self) -> np.ndarray:
+        """Average periodogram, in the same bin order as frequencies().
+
+        If the signal so far is shorter than one segment, its zero padded
+        periodogram is returned instead.
+        """
+        if self.num_segments:
+            average = self._sum * (self._scale / self.num_segments)
+        else:
+            padded = np.zeros_like(self._segment)
+            padded[: self._fill] = self._segment[: self._fill]
+            average = self._periodogram(padded) * self._scale
+        return average if self.real else fftshift(average)
+
+    def estimate(self, normalize: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Frequency axis and average power in dB.
+
+        Args:
+            normalize (bool, optional): Scale the peak to 0 dB. Defaults to False.
+
+        Returns:
+            (np.ndarray, np.ndarray): Frequencies in Hz and power in dB
+        """
+        eps = np.finfo(float).eps
+        X = 10 * np.log10(self.power() + eps**2)
+        if normalize:
+            X -= X.max()
+        return self.frequencies(), X
+
+    def _periodogram(self, segment: np.ndarray) -> np.ndarray:
+        """Unscaled periodogram of one segment, written to self._power."""
+        np.multiply(segment, self.window, out=self._work)
+        X = rfft(self._work) if self.real else fft(self._work)
+        np.square(X.real, out=self._power)
+        self._power += np.square(X.imag)
+        return self._power
+
+    def _accumulate(self, segment: np.ndarray):
+        self._sum += self._periodogram(segment)
+        self.num_segments += 1
+
+def spectrum(x: np.ndarray, sample_rate: float = 1, nfft: int = None,
+             window: Union[str, np.ndarray] = 'boxcar', overlap: int = None,
+             normalize: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Power spectrum of a whole signal in dB.
+
+    With the defaults this is one rectangular window over the whole signal,
+    i.e. 20*log10(abs(fftshift(fft(x)/len(x)))). Pass nfft to average
+    shorter segments instead.
+
+    Args:
+        x (np.ndarray): Signal
+        sample_rate (float, optional): Sample rate in Sps. Defaults to 1.
+        nfft (int, optional): Segment length. Defaults to len(x).
+        window (str or np.ndarray, optional): Window, see get_window. Defaults to 'boxcar'.
+        overlap (int, optional): Segment overlap in samples. Defaults to nfft // 2.
+        normalize (bool, optional): Scale the peak to 0 dB. Defaults to False.
+
+    Returns:
+        (np.ndarray, np.ndarray): Frequencies in Hz and power in dB
+    """
+    estimator = SpectrumEstimator(nfft or len(x), sample_rate, window, overlap, x.dtype)
+    estimator.update(x)
+    return estimator.estimate(normalize)
@@ -0,0 +1,247 @@
+"""Parameter sweeps over a grid, batched along array axes and cached on disk.
+
+A sweep evaluates func at every point of the cartesian product of its
+parameter grid. Axes named in batch are handed to func as broadcastable
+arrays, so one call covers a whole sub-grid in vectorized NumPy. The
+remaining axes are looped over and spread across a process pool. Every
+grid point is stored on disk under a hash of its parameters and of func's
+code, so running a sweep again only computes the points that are new, and
+editing func never reads results of the old code.
+
+Example:
+    def sqnr(num_bits, fs, tones):
+        # num_bits arrives with shape (len(bits),), add an axis for the samples
+        delta = 2 / 2.0**num_bits[:, None]
+        ...
+
+    result = sweep(sqnr, dict(num_bits=range(2, 17), fs=[600, 3000], tones=[(100, 200)]),
+                   batch=['num_bits'])
+    result.data # shape (15, 2, 1), one call per sample rate
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+import types
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+
+CACHE_ENV = 'APPLIED_DSP_SWEEP_CACHE'
+
+def sweep_cache_dir() -> Path:
+    """Directory sweep results are stored in, $APPLIED_DSP_SWEEP_CACHE if set."""
+    if os.environ.get(CACHE_ENV):
+        return Path(os.environ[CACHE_ENV])
+    return Path.home() / '.cache' / 'applied-dsp' / 'sweeps'
+
+def _canonical(value):
+    """JSON serializable form of a parameter value, for hashing."""
+    if isinstance(value, np.ndarray):
+        data = np.ascontiguousarray(value).tobytes()
+        return dict(dtype=value.dtype.str, shape=list(value.shape),
+                    sha256=hashlib.sha256(data).hexdigest())
+    if isinstance(value, np.generic):
+        return _canonical(value.item())
+    if isinstance(value, (list, tuple, range)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, Mapping):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (float, complex)):
+        return repr(value) # exact, unlike a JSON float
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    raise TypeError(f'cannot hash a sweep parameter of type {type(value).__name__}')
+
+def point_key(name: str, params: Mapping) -> str:
+    """Hash identifying the result of function name at params."""
+    text = json.dumps([name, _canonical(dict(params))], sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class SweepResult:
+    """Results of a sweep laid out on its grid.
+
+    Attributes:
+        axes (dict): Parameter name to its values, in grid order
+        data (np.ndarray): Result at every grid point, with shape
+            (len(values) of each axis) + the shape of one result. An object
+            array when results differ in shape.
+        computed (int): Grid points evaluated in this run rather than
+            read from the cache
+    """
+
+    def __init__(self, axes: Dict[str, list], data: np.ndarray, computed: int):
+        self.axes = axes
+        self.data = data
+        self.computed = computed
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return tuple(len(values) for values in self.axes.values())
+
+    def point(self, **params):
+        """Result at the grid point with these parameter values."""
+        idx = tuple(_index(values, params[name]) for name, values in self.axes.items())
+        return self.data[idx]
+
+def _index(values: list, value) -> int:
+    for i, v in enumerate(values):
+        if np.array_equal(v, value):
+            return i
+    raise KeyError(f'{value!r} is not on the sweep grid')
+
+def code_hash(func: Callable) -> str:
+    """Hash of the bytecode, constants and names func is made of.
+
+    Part of every cache key of sweep, so results go stale when func is
+    edited. Functions func calls are not included; pass their code_hash
+    as the version of a sweep whose results depend on them.
+    """
+    code = getattr(inspect.unwrap(func), '__code__', None)
+    return hashlib.sha256(_code_bytes(code) if code is not None else b'').hexdigest()
+
+def _code_bytes(code: types.CodeType) -> bytes:
+    consts = []
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            consts.append(_code_bytes(const).hex()) # nested functions and comprehensions
+        elif isinstance(const, frozenset):
+            consts.append(repr(sorted(map(repr, const)))) # set order changes from run to run
+        else:
+            consts.append(repr(const))
+    return json.dumps([code.co_code.hex(), consts, code.co_names]).encode()
+
+def _func_name(func: Callable) -> str:
+    """Qualified name of func, with a script run as __main__ named by its file."""
+    module = func.__module__
+    if module == '__main__':
+        module = Path(getattr(sys.modules[module], '__file__', module)).stem
+    return f'{module}.{func.__qualname__}'
+
+def _evaluate(func: Callable, kwargs: dict, batch: Dict[str, np.ndarray]) -> np.ndarray:
+    """Call func once over a sub-grid, shaping each batch axis to broadcast."""
+    k = len(batch)
+    arrays = {}
+    for i, (name, values) in enumerate(batch.items()):
+        arrays[name] = np.asarray(values).reshape([-1 if j == i else 1 for j in range(k)])
+    out = np.asarray(func(**kwargs, **arrays))
+    batch_shape = tuple(len(values) for values in batch.values())
+    if out.ndim < k:
+        return np.broadcast_to(out, batch_shape)
+    return np.broadcast_to(out, batch_shape + out.shape[k:])
+
+def _evaluate_task(task) -> np.ndarray:
+    return _evaluate(*task)
+
+def _save(path: Path, value: np.ndarray):
+    # write then rename, so concurrent sweeps never read half a file
+    tmp = path.with_name(f'{path.stem}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        np.save(f, value, allow_pickle=False)
+    os.replace(tmp, path)
+
+def sweep(func: Callable, grid: Mapping[str, Sequence], batch: Sequence[str] = (),
+          fixed: Optional[Mapping] = None, cache: bool = True, cache_dir: Optional[Path] = None,
+          processes: Optional[int] = None, version=None) -> SweepResult:
+    """Evaluate func over the cartesian product of a parameter grid.
+
+    For each combination of the looped (not batched) parameters, func is
+    called once with the batched parameters as arrays shaped to broadcast
+    against each other: the i-th of k batch axes has shape 1 everywhere but
+    dimension i. The leading k dimensions of its return value are the batch
+    axes, and any trailing dimensions are the shape of one result. Calls
+    are spread over a process pool, so func must then be picklable, i.e.
+    defined at the top level of a module.
+
+    Args:
+        func (callable): Called with keyword arguments from grid and fixed
+        grid (mapping): Parameter name to the sequence of values to sweep
+        batch (sequence of str, optional): Parameters func accepts as
+            broadcastable arrays. Defaults to none.
+        fixed (mapping, optional): Keyword arguments passed to every call.
+            Part of the cache key. Defaults to None.
+        cache (bool, optional): Read and write results on disk. Defaults to True.
+        cache_dir (Path, optional): Defaults to sweep_cache_dir().
+        processes (int, optional): Worker processes. Defaults to os.cpu_count().
+            Use 1 to evaluate in the calling process.
+        version (optional): Change to invalidate cached results that
+            func's own code_hash does not cover, e.g. of the functions it
+            calls. Defaults to None.
+
+    Returns:
+        SweepResult: Results on the grid
+    """
+    axes = {name: list(values) for name, values in grid.items()}
+    unknown = set(batch) - set(axes)
+    if unknown:
+        raise ValueError(f'batch names parameters not in the grid: {sorted(unknown)}')
+    names = list(axes)
+    batch_names = [name for name in names if name in batch]
+    loop_names = [name for name in names if name not in batch]
+    shape = tuple(len(axes[name]) for name in names)
+    fixed = dict(fixed or {})
+
+    func_name = _func_name(func)
+    directory = Path(cache_dir or sweep_cache_dir()) / func_name
+    if cache:
+        directory.mkdir(parents=True, exist_ok=True)
+    key_name = f'{func_name}:{code_hash(func)}'
+
+    def path(idx) -> Path:
+        params = {name: axes[name][i] for name, i in zip(names, idx)}
+        return directory / f'{point_key(key_name, dict(fixed, version=version, **params))}.npy'
+
+    results = {}
+    missing = []
+    for idx in np.ndindex(*shape):
+        if cache and path(idx).exists():
+            results[idx] = np.load(path(idx), allow_pickle=False)
+        else:
+            missing.append(idx)
+
+    # group the missing points by looped parameters, each group one batched call
+    # over the smallest sub-grid holding all its points
+    groups = {}
+    for idx in missing:
+        loop_idx = tuple(i for name, i in zip(names, idx) if name not in batch)
+        batch_idx = tuple(i for name, i in zip(names, idx) if name in batch)
+        groups.setdefault(loop_idx, []).append(batch_idx)
+
+    tasks, subgrids = [], []
+    for loop_idx, batch_points in groups.items():
+        subgrid = [sorted(set(axis)) for axis in zip(*batch_points)] if batch_names else []
+        kwargs = dict(fixed, **{name: axes[name][i] for name, i in zip(loop_names, loop_idx)})
+        batch_values = {name: [axes[name][i] for i in sub] for name, sub in zip(batch_names, subgrid)}
+        tasks.append((func, kwargs, batch_values))
+        subgrids.append((loop_idx, subgrid))
+
+    for (loop_idx, subgrid), out in zip(subgrids, _run(tasks, processes)):
+        for sub_idx in np.ndindex(*out.shape[: len(batch_names)]):
+            loop_it = iter(loop_idx)
+            batch_it = iter(sub[i] for sub, i in zip(subgrid, sub_idx))
+            idx = tuple(next(batch_it) if name in batch else next(loop_it) for name in names)
+            results[idx] = np.array(out[sub_idx])
+            if cache:
+                _save(path(idx), results[idx])
+
+    computed = sum(int(np.prod([len(sub) for sub in subgrid])) for _, subgrid in subgrids)
+    return SweepResult(axes, _assemble(results, shape), computed)
+
+def _run(tasks: List[tuple], processes: Optional[int]) -> List[np.ndarray]:
+    if processes == 1 or len(tasks) <= 1:
+        return [_evaluate_task(task) for task in tasks]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(processes) as pool:
+        return list(pool.map(_evaluate_task, tasks))
+
+def _assemble(results: dict, shape: Tuple[int, ...]) -> np.ndarray:
+    """Lay the per-point results out on the grid."""
+    values = [results[idx] for idx in np.ndindex(*shape)]
+    if values and all(v.shape == values[0].shape for v in values):
+        return np.stack(values).reshape(shape + values[0].shape)
+    data = np.empty(shape, dtype=object)
+    for idx, value in zip(np.ndindex(*shape), values):
+        data[idx] = value
+    return data
@@ -0,0 +1,184 @@
+"""FFTs through one configurable backend.
+
+Every transform in the package goes through this module, so one setting
+switches them all:
+
+- 'scipy': scipy.fft, spreading the transforms of a batch (e.g. the
+  blocks of overlap-save) over `workers` threads. The default when scipy
+  is installed. Nothing is cached here: pocketfft already keeps the plans
+  (twiddle factors) of recently used lengths, so a repeated shape skips
+  planning, and each call allocates its own output, which the caller
+  keeps, so a shared output buffer could not be reused anyway.
+- 'pyfftw': FFTW plans built with pyFFTW and cached, with their aligned
+  input and output buffers, by transform, shape and dtype. The output is
+  copied out of the plan's buffer, which the next call overwrites.
+- 'numpy': numpy.fft, single threaded.
+
+The backend starts from $APPLIED_DSP_FFT and the worker count from
+$APPLIED_DSP_FFT_WORKERS (all CPUs if unset), and both are changed with
+set_fft_backend or, for a block of code, use_fft_backend. Nothing is
+imported until the first transform.
+
+Whatever the backend, float32 and complex64 input gives a single precision
+result; numpy.fft computes in double precision before numpy 2.0, so its
+results are cast back.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+import numpy as np
+# frequency axes and shifts don't depend on the backend, re-exported so
+# callers get everything FFT related from here
+from numpy.fft import fftfreq, fftshift, ifftshift, rfftfreq
+
+FFT_BACKEND_ENV = 'APPLIED_DSP_FFT'
+FFT_WORKERS_ENV = 'APPLIED_DSP_FFT_WORKERS'
+FFT_BACKENDS = ('scipy', 'pyfftw', 'numpy')
+PLAN_CACHE_SIZE = 32 # pyFFTW plans kept per thread
+
+_SINGLE = (np.float32, np.complex64)
+
+class _NumpyBackend:
+    name = 'numpy'
+
+    def __init__(self, workers: int):
+        self.workers = workers # numpy.fft is single threaded
+
+    def __call__(self, func: str, a: np.ndarray, n, axis: int) -> np.ndarray:
+        y = getattr(np.fft, func)(a, n, axis)
+        if a.dtype in _SINGLE and y.dtype not in _SINGLE:
+            y = y.astype(np.float32 if func == 'irfft' else np.complex64)
+        return y
+
+class _ScipyBackend:
+    name = 'scipy'
+
+    def __init__(self, workers: int):
+        import scipy.fft # plans are cached by pocketfft itself, see the module docstring
+        self.module = scipy.fft
+        self.workers = workers
+
+    def __call__(self, func: str, a: np.ndarray, n, axis: int) -> np.ndarray:
+        return getattr(self.module, func)(a, n, axis, workers=self.workers)
+
+class _FFTWBackend:
+    """Cached pyFFTW plans, one cache per thread since a plan owns its buffers."""
+    name = 'pyfftw'
+
+    def __init__(self, workers: int):
+        import pyfftw.builders
+        self.builders = pyfftw.builders
+        self.workers = workers
+        self.threads = workers if workers > 0 else os.cpu_count() or 1
+        self._local = threading.local()
+
+    def plan(self, func: str, a: np.ndarray, n, axis: int):
+        """Plan for transforms like this one, built with aligned buffers on first use."""
+        plans = getattr(self._local, 'plans', None)
+        if plans is None:
+            plans = self._local.plans = OrderedDict()
+        key = (func, a.shape, a.dtype, n, axis)
+        plan = plans.pop(key, None)
+        if plan is None:
+            plan = getattr(self.builders, func)(np.empty(a.shape, a.dtype), n=n, axis=axis,
+                                                threads=self.threads,
+                                                planner_effort='FFTW_MEASURE')
+        plans[key] = plan # most recently used last
+        if len(plans) > PLAN_CACHE_SIZE:
+            plans.popitem(last=False)
+        return plan
+
+    def __call__(self, func: str, a: np.ndarray, n, axis: int) -> np.ndarray:
+        # the plan writes every call into the same output buffer
+        return self.plan(func, a, n, axis)(a).copy()
+
+_BACKEND_TYPES = {backend.name: backend for backend in (_ScipyBackend, _FFTWBackend, _NumpyBackend)}
+
+def _check(name: Optional[str]) -> Optional[str]:
+    if name is not None and name not in FFT_BACKENDS:
+        raise ValueError(f"FFT backend must be one of {list(FFT_BACKENDS)}, not {name!r}")
+    return name
+
+_name = _check(os.environ.get(FFT_BACKEND_ENV) or None) # None: scipy if installed, else numpy
+_workers = int(os.environ.get(FFT_WORKERS_ENV) or -1)
+_backend = None # built on the first transform
+_lock = threading.Lock()
+
+def _build(name: Optional[str], workers: int):
+    if name is not None:
+        return _BACKEND_TYPES[name](workers)
+    try:
+        return _ScipyBackend(workers)
+    except ImportError:
+        return _NumpyBackend(workers)
+
+def _current():
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = _build(_name, _workers)
+    return _backend
+
+def get_fft_backend() -> str:
+    """Name of the backend in use: 'scipy', 'pyfftw' or 'numpy'."""
+    return _current().name
+
+def get_fft_workers() -> int:
+    """Threads the backend may use per call, -1 for all CPUs."""
+    return _workers
+
+def set_fft_backend(name: Optional[str] = None, workers: Optional[int] = None):
+    """Route every transform from now on through a backend.
+
+    Args:
+        name (str, optional): 'scipy', 'pyfftw' or 'numpy'. Defaults to
+            scipy if it is installed, else numpy.
+        workers (int, optional): Threads per call, -1 for all CPUs.
+            Defaults to the current setting.
+
+    Raises:
+        ImportError: If the backend's module is not installed
+    """
+    global _name, _workers, _backend
+    workers = _workers if workers is None else int(workers)
+    backend = _build(_check(name), workers) # fails here, not at the next transform
+    with _lock:
+        _name, _workers, _backend = name, workers, backend
+
+@contextmanager
+def use_fft_backend(name: Optional[str] = None, workers: Optional[int] = None):
+    """Use an FFT backend inside a with block, restoring the old one after."""
+    previous = (_name, _workers, _backend)
+    set_fft_backend(name, workers)
+    try:
+        yield
+    finally:
+        _restore(previous)
+
+def _restore(state):
+    global _name, _workers, _backend
+    with _lock:
+        _name, _workers, _backend = state
+
+def _transform(func: str, a, n, axis: int) -> np.ndarray:
+    return _current()(func, np.asarray(a), n, axis)
+
+def fft(a, n=None, axis: int = -1) -> np.ndarray:
+    """np.fft.fft through the current backend."""
+    return _transform('fft', a, n, axis)
+
+def ifft(a, n=None, axis: int = -1) -> np.ndarray:
+    """np.fft.ifft through the current backend."""
+    return _transform('ifft', a, n, axis)
+
+def rfft(a, n=None, axis: int = -1) -> np.ndarray:
+    """np.fft.rfft through the current backend."""
+    return _transform('rfft', a, n, axis)
+
+def irfft(a, n=None, axis: int = -1) -> np.ndarray:
+    """np.fft.irfft through the current backend."""
+    return _transform('irfft', a, n, axis)
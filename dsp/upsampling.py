@@ -0,0 +1,80 @@
+"""Zero-order hold upsampling without materializing the held signal."""
+
+from typing import Iterator
+import numpy as np
+
+from .transforms import fft
+
+class ZeroOrderHold:
+    """A signal with every sample held for factor samples, as a DAC would.
+
+    The held signal np.repeat(x, factor) is never built in full. It can be
+    read as a broadcast view, pulled out block by block, or transformed
+    with spectrum, which builds its FFT from the FFT of x alone.
+
+    Args:
+        x (np.ndarray): Samples at the input rate
+        factor (int): Samples each input sample is held for
+    """
+
+    def __init__(self, x: np.ndarray, factor: int):
+        if factor < 1:
+            raise ValueError('factor must be a positive integer')
+        self.x = np.asarray(x)
+        self.factor = int(factor)
+
+    def __len__(self) -> int:
+        return len(self.x) * self.factor
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.x.dtype
+
+    def view(self) -> np.ndarray:
+        """Read-only (len(x), factor) view whose rows hold each input sample."""
+        return np.broadcast_to(self.x[:, None], (len(self.x), self.factor))
+
+    def materialize(self) -> np.ndarray:
+        """The whole held signal, np.repeat(x, factor)."""
+        return np.repeat(self.x, self.factor)
+
+    def blocks(self, block_size: int) -> Iterator[np.ndarray]:
+        """Yield the held signal block_size samples at a time.
+
+        Only the input samples a block covers are repeated, so memory use
+        is bounded by the block size. The last block may be shorter.
+        """
+        L = self.factor
+        for start in range(0, len(self), block_size):
+            stop = min(start + block_size, len(self))
+            # input samples overlapping [start, stop), then trim the partial holds
+            held = np.repeat(self.x[start // L : -(-stop // L)], L)
+            offset = start - (start // L) * L
+            yield held[offset : offset + stop - start]
+
+    def spectrum(self) -> np.ndarray:
+        """FFT of the held signal, equal to fft(np.repeat(x, factor)).
+
+        Holding is a convolution with factor ones after zero-stuffing, so the
+        spectrum is the N-point FFT of x repeated factor times across the
+        N*factor bins, weighted by the Dirichlet kernel of the hold,
+
+            D(k) = exp(-j pi k (L-1) / (N L)) sin(pi k / N) / sin(pi k / (N L))
+
+        which is the periodic form of the sinc roll-off. The cost is
+        O(N log N + N L) instead of O(N L log(N L)). The kernel is computed
+        in double precision and rounded to the precision of x.
+
+        Returns:
+            np.ndarray: Spectrum in FFT order, unnormalized like np.fft.fft
+        """
+        N, L = len(self.x), self.factor
+        k = np.arange(N * L)
+        den = np.sin(np.pi * k / (N * L))
+        kernel = np.full(N * L, L, dtype=float) # the limit at k = 0
+        nonzero = den != 0
+        kernel[nonzero] = np.sin(np.pi * k[nonzero] / N) / den[nonzero]
+        kernel[nonzero & (k % N == 0)] = 0 # exact nulls between the images
+        kernel = kernel * np.exp(-1j * np.pi * k * (L - 1) / (N * L))
+        X = fft(self.x)
+        return np.tile(X, L) * kernel.astype(X.dtype, copy=False)
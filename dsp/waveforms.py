@@ -0,0 +1,327 @@
+"""Waveform generators with a shared, size-bounded result cache.
+
+Generated waveforms are memoized in waveform_cache, so repeated calls with
+the same parameters return the same read-only array. Copy the result before
+modifying it in place. NCO streams long tones and chirps block by block.
+
+Tone and chirp parameters may be arrays, one value per channel, giving a
+multi-channel array with the samples along axis. Complex outputs default
+to the precision policy's type; phases are always computed in double
+precision and rounded once.
+"""
+
+import functools
+import inspect
+import threading
+from collections import OrderedDict
+from typing import Iterator, Optional, Sequence
+import numpy as np
+
+from .precision import complex_dtype, real_dtype
+
+class WaveformCache:
+    """Least recently used cache of arrays, bounded by their total size.
+
+    Args:
+        max_bytes (int): Total array bytes to keep before evicting the least
+            recently used entries
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[np.ndarray]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: np.ndarray):
+        if value.nbytes > self.max_bytes:
+            return # never evict everything for one oversized array
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = value
+            self.nbytes += value.nbytes
+            while self.nbytes > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self.nbytes -= old.nbytes
+
+    def resize(self, max_bytes: int):
+        """Change the byte budget, evicting entries if it shrank."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self.nbytes > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self.nbytes -= old.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def info(self) -> dict:
+        """Hits, misses, entry count and bytes in use."""
+        return dict(hits=self.hits, misses=self.misses, entries=len(self._entries),
+                    nbytes=self.nbytes, max_bytes=self.max_bytes)
+
+waveform_cache = WaveformCache(max_bytes=64 * 2**20)
+
+def _freeze(name: str, value):
+    """Hashable cache key component for one argument."""
+    if name == 'dtype':
+        return np.dtype(value).str
+    if isinstance(value, (list, tuple, np.ndarray)):
+        value = np.asarray(value)
+        return value.shape, tuple(value.ravel().tolist())
+    return value
+
+def _memoize(func=None, default_dtype=complex_dtype):
+    """Cache a generator's output in waveform_cache, keyed by its arguments.
+
+    A dtype of None is replaced by default_dtype(), the policy's type when
+    the generator is called.
+    """
+    if func is None:
+        return functools.partial(_memoize, default_dtype=default_dtype)
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        if 'dtype' in bound.arguments and bound.arguments['dtype'] is None:
+            bound.arguments['dtype'] = default_dtype() # key on the policy in effect
+        key = (func.__name__,) + tuple(_freeze(k, v) for k, v in bound.arguments.items())
+        value = waveform_cache.get(key)
+        if value is None:
+            value = func(*bound.args, **bound.kwargs)
+            value.flags.writeable = False
+            waveform_cache.put(key, value)
+        return value
+
+    return wrapper
+
+@_memoize
+def sinusoid(sample_rate: float, frequency: float, duration: float, phase: float = 0,
+             dtype=None, axis: int = -1) -> np.ndarray:
+    """Create a sinusoid with some sample rate, center frequency, duration, and initial phase.
+
+    Arrays of frequencies and phases broadcast against each other, giving
+    one tone per channel in a single vectorized call.
+
+    Args:
+        sample_rate (float): Sample rate in Sps
+        frequency (float or array): Frequency in Hz
+        duration (float): Duration in seconds
+        phase (float or array, optional): Initial phase in radians. Defaults to 0.
+        dtype (optional): Complex output type. Defaults to the precision policy.
+        axis (int, optional): Sample axis of a multi-channel output. Defaults to -1.
+
+    Returns:
+        np.ndarray: Complex tone, shape broadcast(frequency, phase) with the
+            samples inserted at axis
+    """
+    t = np.arange(np.round(sample_rate * duration)) / sample_rate # time vector
+    frequency, phase = np.asarray(frequency)[..., None], np.asarray(phase)[..., None]
+    x = np.exp(1j * (2 * np.pi * frequency * t + phase)).astype(dtype, copy=False)
+    return np.moveaxis(x, -1, axis)
+
+@_memoize
+def multitone(sample_rate: float, frequencies: Sequence[float], duration: float,
+              amplitudes: Optional[Sequence[float]] = None, dtype=None,
+              axis: int = -1) -> np.ndarray:
+    """Sum of complex tones.
+
+    Args:
+        sample_rate (float): Sample rate in Sps
+        frequencies (sequence of float): Tone frequencies in Hz. A (channels, tones)
+            array gives every channel its own set of tones.
+        duration (float): Duration in seconds
+        amplitudes (sequence of float, optional): Amplitude of each tone,
+            broadcast against frequencies. Defaults to 1 each.
+        dtype (optional): Complex output type. Defaults to the precision policy.
+        axis (int, optional): Sample axis of a multi-channel output. Defaults to -1.
+
+    Returns:
+        np.ndarray: Sum of the tones
+    """
+    frequencies = np.asarray(frequencies)
+    if amplitudes is None:
+        amplitudes = np.ones(frequencies.shape)
+    amplitudes = np.broadcast_to(amplitudes, frequencies.shape)
+    x = np.zeros(frequencies.shape[:-1] + (int(np.round(sample_rate * duration)),), dtype=dtype)
+    for i in range(frequencies.shape[-1]):
+        # the i-th tone of every channel
+        tone = sinusoid(sample_rate, frequencies[..., i], duration, dtype=dtype)
+        amp = amplitudes[..., i, None]
+        if np.all(amp == 1):
+            x += tone
+        else:
+            x += amp * tone
+    return np.moveaxis(x, -1, axis)
+
+@_memoize
+def chirp(fs: float, pw: float, bw: float, dtype=None, axis: int = -1) -> np.ndarray:
+    """Generate a complex linearly frequency modulated signal at baseband.
+
+    Args:
+        fs (float): Sample rate in Sps
+        pw (float): Pulse width in seconds
+        bw (float or array): Bandwidth in Hz, an array for one chirp per channel
+        dtype (optional): Complex output type. Defaults to the precision policy.
+        axis (int, optional): Sample axis of a multi-channel output. Defaults to -1.
+
+    Returns:
+        np.ndarray: LFM as a complex signal at baseband.
+    """
+    t = np.arange(start=-pw/2, stop=pw/2, step=1/fs)
+    bw = np.asarray(bw)[..., None]
+    x = np.exp((1j * np.pi * bw / pw) *  np.power(t, 2)).astype(dtype, copy=False)
+    return np.moveaxis(x, -1, axis)
+
+@_memoize(default_dtype=real_dtype)
+def kronecker_delta(n: int, m: int = 0, dtype=None) -> np.ndarray:
+    """Generate a Kronecker delta function of length n and time shift t
+
+    Args:
+        n (int): Signal length in samples
+        m (int, optional): Time shift in samples. Defaults to 0.
+        dtype (optional): Output type. Defaults to the precision policy's real type.
+
+    Returns:
+        [np.ndarray]: Kronecker delta function
+    """
+    z = np.zeros(n, dtype=dtype)
+    z[m] = 1
+    return z
+
+@_memoize(default_dtype=real_dtype)
+def rect(n: int, pw: int, dtype=None) -> np.ndarray:
+    """Returns a rectangle pulse of width pw and amplitude 1
+
+    Args:
+        n (int): Number of total samples to return
+        pw (int): Length of rectangle in samples
+        dtype (optional): Output type. Defaults to the precision policy's real type.
+
+    Returns:
+        np.ndarray: Rectangle waveform
+    """
+    z = np.zeros(n, dtype=dtype)
+    z[:pw] = 1
+    return z
+
+@_memoize(default_dtype=real_dtype)
+def dirac_comb(n: int, k: int, dtype=None) -> np.ndarray:
+    """Return a dirac comb of length n with comb spacing k
+
+    Args:
+        n (int): Total number of samples to return
+        k (int): Spacing of each Kronecker delta in samples
+        dtype (optional): Output type. Defaults to the precision policy's real type.
+
+    Returns:
+        np.ndarray: Dirac comb
+    """
+    z = np.zeros(n, dtype=dtype)
+    z[::k] = 1
+    return z
+
+class NCO:
+    """Numerically controlled oscillator producing a tone or chirp in blocks.
+
+    Instead of evaluating np.exp over a time vector for the whole signal,
+    the oscillator keeps a phase and frequency accumulator and advances them
+    block by block. Within a block the output is a fixed quadratic phase
+    term times a linear phase ramp; the ramp is updated from one block to
+    the next by multiplying with a constant step, and recomputed directly
+    every `renormalize` blocks to stop rounding errors from building up.
+
+    Args:
+        sample_rate (float): Sample rate in Sps
+        frequency (float): Starting frequency in Hz
+        phase (float, optional): Starting phase in radians. Defaults to 0.
+        chirp_rate (float, optional): Frequency sweep rate in Hz/s. Defaults to 0.
+        dtype (optional): Complex output type. Defaults to the precision policy.
+        renormalize (int, optional): Blocks between exact ramp updates. Defaults to 256.
+    """
+
+    def __init__(self, sample_rate: float, frequency: float, phase: float = 0,
+                 chirp_rate: float = 0, dtype=None, renormalize: int = 256):
+        self.dtype = complex_dtype(dtype)
+        self.renormalize = renormalize
+        self._f0 = frequency / sample_rate # cycles per sample
+        self._c = chirp_rate / sample_rate**2 # cycles per sample**2
+        self._phi0 = phase / (2 * np.pi) # cycles
+        self.reset()
+
+    @classmethod
+    def for_chirp(cls, fs: float, pw: float, bw: float, dtype=None) -> 'NCO':
+        """NCO that reproduces chirp(fs, pw, bw) and keeps sweeping past it."""
+        return cls(fs, -bw/2, phase=np.pi * bw * pw / 4, chirp_rate=bw/pw, dtype=dtype)
+
+    def reset(self):
+        """Restart the oscillator from its initial phase and frequency."""
+        self._phase = self._phi0 # phase accumulator, cycles
+        self._freq = self._f0 # frequency accumulator, cycles per sample
+        self._size = None # block size the cached terms were built for
+        self._count = 0 # blocks generated since the ramp was last recomputed
+
+    def generate(self, n: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the next n samples.
+
+        Args:
+            n (int): Number of samples
+            out (np.ndarray, optional): Buffer of length n to write into.
+
+        Returns:
+            np.ndarray: Next n samples of the oscillator
+        """
+        if out is None:
+            out = np.empty(n, dtype=self.dtype)
+        if n == 0:
+            return out
+        if n != self._size or self._count >= self.renormalize:
+            self._prepare(n)
+
+        np.multiply(self._quad, self._ramp, out=self._work)
+        np.multiply(self._work, np.exp(2j * np.pi * self._phase), out=out)
+
+        # advance the accumulators and the ramp to the start of the next block
+        self._phase = (self._phase + self._freq * n + 0.5 * self._c * n**2) % 1
+        self._freq += self._c * n
+        if self._c:
+            self._ramp *= self._step
+        self._count += 1
+        return out
+
+    def blocks(self, num_samples: int, block_size: int) -> Iterator[np.ndarray]:
+        """Yield the next num_samples samples block_size at a time.
+
+        All blocks are written into one preallocated buffer, so each block
+        must be consumed before asking for the next.
+        """
+        buffer = np.empty(min(block_size, num_samples), dtype=self.dtype)
+        for start in range(0, num_samples, block_size):
+            yield self.generate(min(block_size, num_samples - start), buffer[: num_samples - start])
+
+    def _prepare(self, n: int):
+        """Build the per-block terms for blocks of n samples."""
+        m = np.arange(n)
+        self._quad = np.exp(1j * np.pi * self._c * m**2.0)
+        self._ramp = np.exp(2j * np.pi * (self._freq % 1) * m)
+        self._step = np.exp(2j * np.pi * ((self._c * n) % 1) * m)
+        self._work = np.empty(n, dtype=complex) # terms stay double, rounded once on output
+        self._size = n
+        self._count = 0
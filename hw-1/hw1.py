@@ -1,33 +1,18 @@
 #!/usr/bin/env python
 
+import argparse
+import sys
 from pathlib import Path
 import numpy as np
-from numpy.fft import fft, fftshift, fftfreq
-from matplotlib import pyplot as plt
-
-def sinusoid(sample_rate: float, frequency: float, duration: float, phase: float = 0) -> np.ndarray:
-    """Create a sinusoid with some sample rate, center frequency, duration, and initial phase."""
-    t = np.arange(np.round(sample_rate * duration)) / sample_rate # time vector
-    return np.exp((2j * np.pi * frequency * t) + phase)
-
-def get_quantization_levels(amplitude: float, num_bits: int):
-    """Return quantization levels for a given amplitude and number of bits.
-
-    Uses Mid-Rise algorithm: -A + delta/2 + delta*(0, 1, 2, ..., 2**num_bits - 1)
-    """
-    num_levels = 2**num_bits # number of quantization levels
-    delta = 2*amplitude / num_levels # distance between levels
-    return (-amplitude + delta/2) + (np.arange(num_levels) * delta)
-
-def quantize(signal: np.ndarray, levels: np.ndarray) -> np.ndarray:
-    X = signal.reshape((-1,1)) # column vector
-    L = levels.reshape((1,-1)) # row vector
-    distances = abs(X-L) # distances between each sample and each quantization level
-    nearestIndex = distances.argmin(axis=1) # find closest quantization level for each sample
-    return L.flat[nearestIndex].reshape(signal.shape) # quantized signal
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1])) # repo root, for the dsp package
+from dsp import (FigureRenderer, code_hash, figure, get_precision, get_quantization_levels,
+                 multitone, quantization_sqnr, quantize, set_precision, spectrum, sweep,
+                 use_precision)
 
 def time_domain_plot(signal: np.ndarray, sample_rate: float, axis=None):
     if axis is None:
+        from matplotlib import pyplot as plt
         axis = plt.gca()
 
     t = np.arange(len(signal)) / sample_rate
@@ -40,15 +25,13 @@ def time_domain_plot(signal: np.ndarray, sample_rate: float, axis=None):
     axis.legend(['real', 'imag'])
 
 def frequency_domain_plot(signal: np.ndarray, sample_rate: float,
-                          axis=None, normalize: bool = False):
+                          axis=None, normalize: bool = False, nfft: int = None):
     if axis is None:
+        from matplotlib import pyplot as plt
         axis = plt.gca()
 
-    f = fftshift(fftfreq(len(signal), d=1/sample_rate))
-    eps = np.finfo(np.complex).eps
-    X = 20 * np.log10(np.abs(fftshift(fft(signal)/len(signal))) + eps)
-    if normalize:
-        X -= max(X)
+    # one window over the whole signal, or averaged nfft point segments
+    f, X = spectrum(signal, sample_rate, nfft=nfft, normalize=normalize)
     axis.plot(f, X)
     axis.set_title('Frequency Domain')
     axis.set_xlabel('Frequency (Hz)')
@@ -57,84 +40,97 @@ def frequency_domain_plot(signal: np.ndarray, sample_rate: float,
 
     return X, f
 
+def multitone_sqnr(num_bits: np.ndarray, fs: float, freq_list: list, T: float,
+                   precision: str) -> np.ndarray:
+    """SQNR of the multitone sampled at fs, quantized to each of num_bits."""
+    with use_precision(precision):
+        x = multitone(fs, freq_list, T) / len(freq_list) # bound amplitude to [-1, +1]
+        x_max = max(max(x.real), max(x.imag))
+        return quantization_sqnr(x, x_max, num_bits)
+
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-plots', action='store_true',
+                        help='save the plotted arrays to .npz instead of drawing figures')
+    parser.add_argument('--jobs', type=int, help='processes used to draw figures')
+    parser.add_argument('--precision', choices=['double', 'single'], default=get_precision(),
+                        help='floating point precision of the processing chain')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='recompute the SQNR sweep instead of using hw-1/.sweep-cache')
+    args = parser.parse_args()
+    set_precision(args.precision)
+
     freq_list = [100, 200, 300] # Signal frequenies in Hz
     T = 300e-3 # signal duration in seconds
     fs_list = [450, 600, 610, 3000] # sample rates in Sps
 
-    # Part 1 - Sampling
-
-    for fs in fs_list:
-        # create a signal composed of multiple sinusoids sampled at fs
-        x = np.zeros(round(T * fs)).astype(complex)
-        for freq in freq_list:
-            x += sinusoid(fs, freq, T)
-        x /= len(freq_list) # bount amplitude to [-1, +1]
-
-        # plot time domain and frequency domain
-        time_axis = plt.subplot(2, 1, 1)
-        time_domain_plot(signal=x, sample_rate=fs, axis=time_axis)
-        freq_axis = plt.subplot(2, 1, 2)
-        frequency_domain_plot(signal=x, sample_rate=fs, axis=freq_axis)
-
-        # save the figure
-        plt.tight_layout()
-        fig_name = Path('./hw-1/plots/comparing_sample_rates_{}_Sps.png'.format(fs)).resolve()
-        plt.savefig(fig_name) # TODO: change figure size
-        plt.close()
-
-    # Part 2 - Quantization
-    bits_list = [2, 4, 6, 8, 10, 12, 14, 16]
-
-    # generate the signal
-    x = np.zeros(round(T * fs_list[-1])).astype(complex)
-    for freq in freq_list:
-        x += sinusoid(fs_list[-1], freq, T)
-    x = x / len(freq_list) # bound amplitude to [-1, +1]
-    x_max = max(max(x.real), max(x.imag))
-
-    Ps = np.sum(np.power(abs(x), 2)) # power of the pure signal
-
-    sqnr_list = [] # list to store SNR results
-
-    f = fftshift(fftfreq(len(x), d=1/fs_list[-1])) # frequency vector
-
-    for num_bits in bits_list:
-        quantization_levels = get_quantization_levels(x_max, num_bits)
-        xq_I = quantize(x.real, quantization_levels) # quantized signal
-        xq_Q = quantize(x.imag, quantization_levels)
-        xq = xq_I + 1j*xq_Q
-        nq = x - xq # quantization noise = pure signal - quantized signal
-        Pn = np.sum(np.power(abs(nq), 2))
-        sqnr_list.append(10 * np.log10(Ps/Pn))
-
-        Xq = 20 * np.log10(abs(fftshift(fft(xq) / len(xq))))
-        plt.plot(f, Xq)
-        plt.title('Power Specturm ({} bits)'.format(num_bits))
-        plt.xlabel('Frequency (Hz)')
-        plt.ylabel('Log Mag (dB)')
-        plt.ylim([-150, 0])
-        plt.grid()
-        fig_name = './hw-1/plots/spectrum_{}_bits.png'.format(num_bits)
-        plt.savefig(fig_name)
-        plt.close()
-
-    snr_theory = [1.76 + 6.02*b for b in bits_list]
-    db_per_bit = round(np.mean(np.diff(sqnr_list)/np.diff(bits_list)), 2)
-
-    plt.plot(bits_list, sqnr_list, '--o')
-    plt.plot(bits_list, snr_theory, '--o')
-    plt.title('SQNR vs Number of Bits')
-    plt.xlabel('Number of Bits')
-    plt.ylabel('SQNR (dB)')
-    plt.legend(['Measured SQNR', '1.76 + 6.02*b'])
-
-    annotation_idx = round(len(bits_list)/2)
-    plt.annotate('slope = {} dB/bit'.format(db_per_bit),
-                 xy=(bits_list[annotation_idx], sqnr_list[annotation_idx]),
-                 xytext=(bits_list[annotation_idx], sqnr_list[annotation_idx]-10),
-                 arrowprops=dict(arrowstyle='simple', facecolor='black'))
-
-    plt.savefig('./hw-1/plots/sqnr_vs_num_bits.png')
-    plt.close()
+    with FigureRenderer(plots=not args.no_plots, processes=args.jobs) as renderer:
+
+        # Part 1 - Sampling
+
+        for fs in fs_list:
+            # create a signal composed of multiple sinusoids sampled at fs
+            x = multitone(fs, freq_list, T) / len(freq_list) # bound amplitude to [-1, +1]
+
+            # plot time domain and frequency domain
+            fig_name = Path('./hw-1/plots/comparing_sample_rates_{}_Sps.png'.format(fs)).resolve()
+            fig, (time_axis, freq_axis) = figure(fig_name, 2, 1) # TODO: change figure size
+            time_domain_plot(signal=x, sample_rate=fs, axis=time_axis)
+            frequency_domain_plot(signal=x, sample_rate=fs, axis=freq_axis)
+
+            # save the figure
+            fig.tight_layout()
+            renderer.submit(fig)
+
+        # Part 2 - Quantization
+        bits_list = [2, 4, 6, 8, 10, 12, 14, 16]
+
+        # SQNR at every sample rate, all bit depths in one pass per rate,
+        # cached next to this script so a rerun only computes new points
+        sqnr = sweep(multitone_sqnr, dict(num_bits=bits_list, fs=fs_list), batch=['num_bits'],
+                     fixed=dict(freq_list=freq_list, T=T, precision=get_precision()),
+                     version=code_hash(quantization_sqnr), cache=not args.no_cache,
+                     cache_dir=Path(__file__).resolve().parent / '.sweep-cache')
+        print('SQNR (dB) at each sample rate:')
+        print(f"{'bits':>6}" + ''.join(f'{fs:>9} Sps' for fs in fs_list))
+        for num_bits, row in zip(bits_list, sqnr.data):
+            print(f'{num_bits:>6}' + ''.join(f'{value:>13.2f}' for value in row))
+        sqnr_list = list(sqnr.data[:, -1]) # SNR results at the last rate, plotted below
+
+        # generate the signal
+        x = multitone(fs_list[-1], freq_list, T) / len(freq_list) # bound amplitude to [-1, +1]
+        x_max = max(max(x.real), max(x.imag))
+
+        for num_bits in bits_list:
+            quantization_levels = get_quantization_levels(x_max, num_bits)
+            xq = quantize(x, quantization_levels) # quantized signal (I and Q)
+
+            f, Xq = spectrum(xq, fs_list[-1])
+            fig, ax = figure('./hw-1/plots/spectrum_{}_bits.png'.format(num_bits))
+            ax.plot(f, Xq)
+            ax.set_title('Power Specturm ({} bits)'.format(num_bits))
+            ax.set_xlabel('Frequency (Hz)')
+            ax.set_ylabel('Log Mag (dB)')
+            ax.set_ylim([-150, 0])
+            ax.grid()
+            renderer.submit(fig)
+
+        snr_theory = [1.76 + 6.02*b for b in bits_list]
+        db_per_bit = round(np.mean(np.diff(sqnr_list)/np.diff(bits_list)), 2)
+
+        fig, ax = figure('./hw-1/plots/sqnr_vs_num_bits.png')
+        ax.plot(bits_list, sqnr_list, '--o')
+        ax.plot(bits_list, snr_theory, '--o')
+        ax.set_title('SQNR vs Number of Bits')
+        ax.set_xlabel('Number of Bits')
+        ax.set_ylabel('SQNR (dB)')
+        ax.legend(['Measured SQNR', '1.76 + 6.02*b'])
+
+        annotation_idx = round(len(bits_list)/2)
+        ax.annotate('slope = {} dB/bit'.format(db_per_bit),
+                    xy=(bits_list[annotation_idx], sqnr_list[annotation_idx]),
+                    xytext=(bits_list[annotation_idx], sqnr_list[annotation_idx]-10),
+                    arrowprops=dict(arrowstyle='simple', facecolor='black'))
+
+        renderer.submit(fig)
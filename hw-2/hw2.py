@@ -1,15 +1,26 @@
 #!/usr/bin/env python
 
+import argparse
+import sys
+from pathlib import Path
 import numpy as np
-from numpy.fft import fft, fftshift, fftfreq
-from matplotlib import pyplot as plt
 
-def sinusoid(frequency: float, fs: float, duration: float, phase: float = 0) -> np.array:
-    t = np.arange(round(fs * duration)) / fs
-    return np.exp((2j * np.pi * frequency * t) + phase)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1])) # repo root, for the dsp package
+from dsp import (FigureRenderer, InverseSincEqualizer, ZeroOrderHold, figure, get_precision,
+                 multitone, set_precision, spectrum)
+from dsp.transforms import fft, fftfreq, fftshift
 
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-plots', action='store_true',
+                        help='save the plotted arrays to .npz instead of drawing figures')
+    parser.add_argument('--jobs', type=int, help='processes used to draw figures')
+    parser.add_argument('--precision', choices=['double', 'single'], default=get_precision(),
+                        help='floating point precision of the processing chain')
+    args = parser.parse_args()
+    set_precision(args.precision)
+
     # user setup
     fs = 50e3 # original signal sample rate in Hz
     T = 16/fs # signal duration in seconds
@@ -21,21 +32,19 @@ if __name__ == '__main__':
     fs_adc = fs * upsample_rate # sample rate of the interpolating ADC
 
     # create the DAC output
-    x = np.zeros(N, dtype=np.dtype(complex))
-    for f in freqs:
-        x += sinusoid(f, fs, T)
-    # apply zero-order hold
-    x_zoh = np.repeat(x, upsample_rate)
+    x = multitone(fs, freqs, T)
+    # apply zero-order hold, without building the held signal
+    zoh = ZeroOrderHold(x, upsample_rate)
 
-    eps = np.finfo(x_zoh.dtype).eps # machine epsilon
+    eps = np.finfo(zoh.dtype).eps # machine epsilon
     # add eps before log to avoid infinity (log(0) = -inf)
 
     # compute the power spectrum of x
-    X = 20 * np.log10(np.abs(fftshift(fft(x)/len(x))) + eps) # pure spectrum
-    fx = fftshift(fftfreq(len(X), d=1/fs)) # frequency vector with original sample rate fs in Hz
+    fx, X = spectrum(x, fs) # pure spectrum, frequency vector with original sample rate fs in Hz
 
     # compute the power spectrum of x after the DAC
-    X_zoh = fftshift(fft(x_zoh)/len(x_zoh)) + eps
+    # from the N point FFT of x and the sinc response of the hold
+    X_zoh = fftshift(zoh.spectrum()/len(zoh)) + eps
     X_zoh_mag = 20 * np.log10(np.abs(X_zoh)) # power spectrum in dBm
     f = fftshift(fftfreq(len(X_zoh_mag), d=1/fs_adc)) # frequency vector for ADC sample rate in Hz
 
@@ -55,70 +64,80 @@ if __name__ == '__main__':
     G[Ndc + Nbw_half:] = 0
     G_mag = 20 * np.log10(np.abs(G) + eps)
 
-    # apply the pre-equalizing filter in the frequency domain
-    Xr = X_zoh * G
-    Xr_mag = 20 * np.log10(np.abs(Xr) + eps)
+    # a realizable FIR approximation to G, covering the 7fs/16 tone
+    eq = InverseSincEqualizer(upsample_rate, passband=0.45, num_taps=255, method='equiripple')
+    G_fir_mag = 20 * np.log10(np.abs(eq.response(f / fs_adc)) + eps)
+    print(f'equalizer passband error: {eq.passband_error():.3f} dB')
+
+    # apply the pre-equalizing filter, streaming enough periods of the
+    # periodic test signal through it to keep one past the filter transient
+    pad = -(-(len(eq.taps) // 2) // len(zoh)) # periods either side
+    held = ZeroOrderHold(np.tile(x, 2*pad + 1), upsample_rate)
+    xr = np.concatenate([eq.process(block) for block in held.blocks(len(zoh))])
+    xr = xr[pad*len(zoh) : (pad + 1)*len(zoh)]
+    Xr = fftshift(fft(xr)/len(xr)) + eps
+    Xr_mag = 20 * np.log10(np.abs(Xr))
 
     ### PLOTS ###
 
-    # plot the pure spectrum
-    plt.figure()
-    plt.plot(fx/1000, X)
-    plt.title('Pure Power Spectrum')
-    plt.xlabel('Frequency (kHz)')
-    plt.ylabel('Power (dBm)')
-    plt.xlim([-fs_adc/2000, fs_adc/2000])
-    plt.ylim([-50, 10])
-    plt.grid()
-
-    plt.savefig('./hw-2/plots/pure_spectrum.png')
-    plt.close()
-
-    # plot the spectrum after the DAC/ADC
-    plt.figure()
-    plt.plot(f/1000, X_zoh_mag, label='ADC Output')
-    plt.plot(f[tone_samples]/1000, X_zoh_mag[tone_samples], 'bv', label='Markers')
-    plt.plot(f/1000, H_mag, '--', label=r'sinc($\frac{\pi f}{fs}$)')
-    plt.title('Power Spectrum After ZOH DAC and Interpolating ADC')
-    plt.xlabel('Frequency (kHz)')
-    plt.ylabel('Power (dBm)')
-    plt.ylim([-50, 10])
-    plt.grid()
-    plt.legend(loc='upper right', fancybox=True)
-
-    annotation_x_offsets = [-60, 10, 10]
-    annotation_y_offsets = [1, 0, -1]
-    for samp, xoffset, yoffset in zip(tone_samples,
-                                      annotation_x_offsets,
-                                      annotation_y_offsets):
-        plt.annotate('{} dBm'.format(round(X_zoh_mag[samp], 2)),
-                     xy=(f[samp]/1000 + xoffset, X_zoh_mag[samp] + yoffset))
-
-    plt.savefig('./hw-2/plots/adc_spectrum.png')
-    plt.close()
-
-    # plot the spectrum of the pre-equalizing filter
-    plt.figure()
-    plt.plot(f/1000, G_mag)
-    plt.title('Ideal Inverse Sinc LPF')
-    plt.xlabel('Frequency (kHz)')
-    plt.ylabel('Gain (dB)')
-    plt.grid()
-    plt.xlim([-fs_adc/2000, fs_adc/2000])
-    plt.ylim([-100, 10])
-
-    plt.savefig('./hw-2/plots/pre_equalization_filter.png')
-    plt.close()
-
-    # plot the spectrum of the equalized signal
-    plt.figure()
-    plt.plot(f/1000, Xr_mag)
-    plt.title('Equalized Signal')
-    plt.xlabel('Frequency (kHz)')
-    plt.ylabel('Power (dBm)')
-    plt.xlim([-fs_adc/2000, fs_adc/2000])
-    plt.ylim([-50, 10])
-    plt.grid()
-
-    plt.savefig('./hw-2/plots/equalized signal')
-    plt.close()
+    with FigureRenderer(plots=not args.no_plots, processes=args.jobs) as renderer:
+
+        # plot the pure spectrum
+        fig, ax = figure('./hw-2/plots/pure_spectrum.png')
+        ax.plot(fx/1000, X)
+        ax.set_title('Pure Power Spectrum')
+        ax.set_xlabel('Frequency (kHz)')
+        ax.set_ylabel('Power (dBm)')
+        ax.set_xlim([-fs_adc/2000, fs_adc/2000])
+        ax.set_ylim([-50, 10])
+        ax.grid()
+
+        renderer.submit(fig)
+
+        # plot the spectrum after the DAC/ADC
+        fig, ax = figure('./hw-2/plots/adc_spectrum.png')
+        ax.plot(f/1000, X_zoh_mag, label='ADC Output')
+        ax.plot(f[tone_samples]/1000, X_zoh_mag[tone_samples], 'bv', label='Markers')
+        ax.plot(f/1000, H_mag, '--', label=r'sinc($\frac{\pi f}{fs}$)')
+        ax.set_title('Power Spectrum After ZOH DAC and Interpolating ADC')
+        ax.set_xlabel('Frequency (kHz)')
+        ax.set_ylabel('Power (dBm)')
+        ax.set_ylim([-50, 10])
+        ax.grid()
+        ax.legend(loc='upper right', fancybox=True)
+
+        annotation_x_offsets = [-60, 10, 10]
+        annotation_y_offsets = [1, 0, -1]
+        for samp, xoffset, yoffset in zip(tone_samples,
+                                          annotation_x_offsets,
+                                          annotation_y_offsets):
+            ax.annotate('{} dBm'.format(round(X_zoh_mag[samp], 2)),
+                        xy=(f[samp]/1000 + xoffset, X_zoh_mag[samp] + yoffset))
+
+        renderer.submit(fig)
+
+        # plot the spectrum of the pre-equalizing filter
+        fig, ax = figure('./hw-2/plots/pre_equalization_filter.png')
+        ax.plot(f/1000, G_mag, label='Ideal')
+        ax.plot(f/1000, G_fir_mag, '--', label=f'{len(eq.taps)} tap FIR')
+        ax.set_title('Inverse Sinc LPF')
+        ax.set_xlabel('Frequency (kHz)')
+        ax.set_ylabel('Gain (dB)')
+        ax.grid()
+        ax.set_xlim([-fs_adc/2000, fs_adc/2000])
+        ax.set_ylim([-100, 10])
+        ax.legend(loc='upper right')
+
+        renderer.submit(fig)
+
+        # plot the spectrum of the equalized signal
+        fig, ax = figure('./hw-2/plots/equalized signal')
+        ax.plot(f/1000, Xr_mag)
+        ax.set_title('Equalized Signal')
+        ax.set_xlabel('Frequency (kHz)')
+        ax.set_ylabel('Power (dBm)')
+        ax.set_xlim([-fs_adc/2000, fs_adc/2000])
+        ax.set_ylim([-50, 10])
+        ax.grid()
+
+        renderer.submit(fig)
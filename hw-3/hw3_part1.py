@@ -1,49 +1,13 @@
 #!/usr/bin/env python
 
+import sys
+from pathlib import Path
 import numpy as np
-from numpy.fft import fft, fftshift, fftfreq
 from matplotlib import pyplot as plt
 
-
-def kronecker_delta(n: int, m: int = 0):
-    """Generate a Kronecker delta function of length n and time shift t
-
-    Args:
-        n (int): Signal length in samples
-        m (int, optional): Time shift in samples. Defaults to 0.
-
-    Returns:
-        [np.ndarray]: Kronecker delta function
-    """
-    z = np.zeros(n)
-    z[m] = 1
-    return z
-
-def rect(n: int, pw: int):
-    """Returns a rectangle pulse of width pw and amplitude 1
-
-    Args:
-        n (int): Number of total samples to return
-        pw (int): Length of rectangle in samples
-
-    Returns:
-        np.ndarray: Rectangle waveform
-    """
-    return np.concatenate([np.ones(pw), np.zeros(n - pw)])
-
-def dirac_comb(n: int, k: int):
-    """Return a dirac comb of length n with comb spacing k
-
-    Args:
-        n (int): Total number of samples to return
-        k (int): Spacing of each Kronecker delta in samples
-
-    Returns:
-        np.ndarray: Dirac comb
-    """
-    z = np.zeros(n)
-    z[::k] = 1
-    return z
+sys.path.insert(0, str(Path(__file__).resolve().parents[1])) # repo root, for the dsp package
+from dsp import dirac_comb, kronecker_delta, rect
+from dsp.transforms import fft, fftfreq, fftshift
 
 if __name__ == '__main__':
 
@@ -1,10 +1,14 @@
 #!/usr/bin/env python
 
+import sys
 import timeit
+from pathlib import Path
 import numpy as np
-from numpy.fft import fft, ifft
 from matplotlib import pyplot as plt
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1])) # repo root, for the dsp package
+from dsp.transforms import fft, ifft
+
 if __name__ == '__main__':
 
     N = 256
@@ -64,7 +68,7 @@ rf = ifft(fft(x1) * fft(x2))
         # Setup
         setup_str = f"""
 import numpy as np
-from numpy.fft import fft, ifft
+from dsp.transforms import fft, ifft
 N = {n}
 x1 = np.concatenate([np.zeros(int(N/4)), np.ones(int(N/2)), np.zeros(int(N/4))])
 x2 = np.zeros(N)
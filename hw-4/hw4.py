@@ -1,62 +1,249 @@
 #!/usr/bin/env python
 
+import argparse
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
 import numpy as np
 from numpy.random import default_rng
-from numpy.fft import fft, ifft, fftshift, fftfreq
 from scipy import signal
-from matplotlib import pyplot as plt
 
-def chirp(fs: float, pw: float, bw: float):
-    """Generate a complex linearly frequency modulated signal at baseband.
-
-    Args:
-        fs (float): Sample rate in Sps
-        pw (float): Pulse width in seconds
-        bw (float): Bandwidth in Hz
+sys.path.insert(0, str(Path(__file__).resolve().parents[1])) # repo root, for the dsp package
+from dsp import (DecimationPlan, DecimationStage, FigureRenderer, MatchedFilterBank, NoiseSource,
+                 Profiler, SignalMetrics, add_pulses, cfar, cfar_threshold, chirp, figure,
+                 get_precision, plan_decimation, receive, receiver_pipeline, score_detections,
+                 set_precision, sinusoid, spectrum, use_precision)
+from dsp.transforms import fft, fftfreq, fftshift
+
+### Setup ###
+
+# the hw4 scenario, also the defaults of each run_scenarios.py scenario
+DEFAULTS = dict(
+    rng_seed=123, # seed for random number generator
+    T=1e-3, # analysis time in seconds
+    fs=5e9, # sample rate in Sps
+    lfm_pw=10e-6, # pulse width in seconds
+    lfm_bw=8e6, # bandwidth in Hz
+    snr=-20, # dB
+    num_taps=64, # number of filter taps
+    pfa=1e-6, # CFAR false alarm probability
+)
+
+# CFAR training and guard cells, well inside the 100 sample pulse spacing
+NUM_TRAIN, NUM_GUARD = 16, 4
+
+BLOCK_SIZE = 2**20 # samples streamed through the receiver at a time
+
+### Processing ###
+
+def simulate(rng_seed: int, T: float, fs: float, lfm_pw: float, lfm_bw: float, snr: float,
+             profiler: Optional[Profiler] = None, noise_workers: Optional[int] = None):
+    """Randomly placed LFM pulses on an fs/4 carrier in unit power noise.
+
+    The pulse slots are drawn from default_rng(rng_seed) and the noise from
+    NoiseSource(rng_seed), whose blocks come from the spawned children of
+    SeedSequence(rng_seed), independent of that generator and of each
+    other. The first version of this script drew the noise and then the
+    slots from one generator, so a seed now gives a different scenario than
+    it did there, deliberately: the noise can be drawn in parallel blocks,
+    and the slots no longer depend on how many noise samples came first.
 
     Returns:
-        np.ndarray: LFM as a complex signal at baseband.
+        (np.ndarray, np.ndarray, np.ndarray, np.ndarray): Received signal,
+            start of each pulse, the LFM at baseband and on its carrier
     """
-    t = np.arange(start=-pw/2, stop=pw/2, step=1/fs)
-    return np.exp((1j * np.pi * bw / pw) *  np.power(t, 2))
+    profiler = profiler or Profiler(enabled=False)
 
-if __name__ == '__main__':
+    fc = fs/4 # carrier frequency (purposely chose fs/4)
 
-    ### Setup ###
+    rng = default_rng(rng_seed) # random number generator
 
-    rng_seed = 123 # seed for random number generator
+    N = round(fs*T) # number of samples to process
+    n_pw = round(fs * lfm_pw) # pulse width in samples
+    num_possible_pulses = round(T / lfm_pw)
 
-    T = 1e-3 # analysis time in seconds
-    fs = 5e9 # sample rate in Sps
+    # randomly choose which pulse slots are filled
+    pulse_starts = np.argwhere(rng.integers(low=0,
+                                            high=2,
+                                            size=num_possible_pulses))
+    pulse_starts = pulse_starts * n_pw
 
-    lfm_pw = 10e-6 # pulse width in seconds
-    lfm_bw = 8e6 # bandwidth in Hz
+    # generate unit power noise, drawn straight in the working precision in
+    # parallel blocks, each from its own child of the seed
+    with profiler.stage('noise') as span:
+        with NoiseSource(rng_seed, workers=noise_workers) as source:
+            x = source.generate(N)
+        span.samples_out = x.size
+    noise = SignalMetrics()
+    noise.update(x)
+    p_noise = noise.var
 
-    snr = -20 # dB
+    # generate LFM at required SNR
+    p_sig = (10**(snr/10)) * p_noise
+    lfm = chirp(fs=fs, pw=lfm_pw, bw=lfm_bw)
+    lfm = lfm * float(np.sqrt(p_sig) / np.std(lfm)) # a python float never promotes lfm
 
-    num_taps = 64 # number of filter taps
+    # modulate onto a carrier
+    pulse = lfm * sinusoid(fs, fc, n_pw / fs)
 
-    ### Processing ###
+    # place the pulses in time and add to noise vector
+    with profiler.stage('pulses', pulse.size * pulse_starts.size) as span:
+        add_pulses(x, pulse, pulse_starts)
+        span.samples_out = pulse.size * pulse_starts.size
+    return x, pulse_starts, lfm, pulse
 
-    fc = fs/4 # carrier frequency (purposely chose fs/4)
+@lru_cache(maxsize=None)
+def design_filters(fs: float, num_taps: int):
+    """Low-pass taps of the fs/4 stage and of each decimate by 5 stage."""
+    # The next step is digital demodulation
+    # Because fc = fs/4, we can apply a bandpass filter, then
+    # decimate by 4 to alias our carrier down to baseband
+    lpf = signal.firwin(num_taps,
+                        cutoff=fs/8,
+                        width=1e6,
+                        fs=fs)
 
-    rng = default_rng(rng_seed) # random number generator
+    # Create a filter with cutoff fs/5
+    lpf_dec5 = signal.firwin(num_taps, cutoff=1/10, width=1/20, fs=1)
+    return lpf, lpf_dec5
+
+@lru_cache(maxsize=None)
+def design_chain(fs: float, num_taps: int, lfm_bw: float, planned: bool = False) -> DecimationPlan:
+    """The decimation chain to 10MSps, the hand-picked stages or a planned chain.
+
+    The planned chain keeps the LFM band free of aliases down to -60dB.
+    """
+    # going from 1.25GSps to 10MSps
+    # which is a decimation factor of 125
+    # break this down into 3x decimate by 5 stages
+    fsd = fs / 4 / 5**3 # sample rate after decimation
+    if planned:
+        return plan_decimation(fs, fsd, passband=lfm_bw/2, stopband_atten=60, fs4=True)
+    lpf, lpf_dec5 = design_filters(fs, num_taps)
+    return DecimationPlan(fs, [DecimationStage('fs4', 4, fs, lpf)]
+                          + [DecimationStage('lowpass', 5, fs / 4 / 5**k, lpf_dec5) for k in range(3)],
+                          passband=lfm_bw/2)
+
+@lru_cache(maxsize=None)
+def design_bank(fsd: float, lfm_pw: float, lfm_bw: float, precision: str) -> MatchedFilterBank:
+    """Matched filter with the lfm at the sample rate after decimation."""
+    with use_precision(precision):
+        return MatchedFilterBank.lfm(fs=fsd, pulses=[(lfm_pw, lfm_bw)])
+
+def run(rng_seed: int, T: float, fs: float, lfm_pw: float, lfm_bw: float, snr: float,
+        num_taps: int, pfa: float, planned: bool = False, threads: bool = False,
+        profiler: Optional[Profiler] = None, noise_workers: Optional[int] = None) -> dict:
+    """Simulate, receive and detect one scenario, taking the keys of DEFAULTS.
+
+    Designs are cached, so runs with the same parameters share them.
+
+    Args:
+        planned (bool, optional): Decimate with the planned chain instead of
+            the 4, 5, 5, 5 stages. Defaults to False.
+        threads (bool, optional): Run each receiver stage on its own thread.
+            Defaults to False.
+        profiler (Profiler, optional): Records each stage. Defaults to None.
+        noise_workers (int, optional): Threads drawing the noise. Defaults to
+            all CPUs.
+
+    Returns:
+        dict: x, pulse_starts, lfm and pulse from simulate, the decimation
+            chain, its output rate fsd, the matched filter bank, the
+            decimated signal xf, the pulse compression magnitude r, the CFAR
+            detections, the true pulse positions in r and their score
+    """
+    profiler = profiler or Profiler(enabled=False)
+    x, pulse_starts, lfm, pulse = simulate(rng_seed, T, fs, lfm_pw, lfm_bw, snr,
+                                           profiler=profiler, noise_workers=noise_workers)
+
+    chain = design_chain(fs, num_taps, lfm_bw, planned)
+    fsd = chain.output_rate
+    bank = design_bank(fsd, lfm_pw, lfm_bw, get_precision())
+
+    # demodulate, decimate and perform pulse compression,
+    # streaming the received signal through the chain a block at a time
+    blocks = (x[i : i + BLOCK_SIZE] for i in range(0, len(x), BLOCK_SIZE))
+    if threads:
+        # the stages overlapped on worker threads
+        pipeline = receiver_pipeline(None, None, bank, stages=chain.decimators(), profiler=profiler)
+        xf, r = pipeline.run(blocks, outputs=[-2, -1])
+    else:
+        xf, r = (np.concatenate(out, axis=-1)
+                 for out in zip(*receive(blocks, None, None, bank, stages=chain.decimators(),
+                                         profiler=profiler)))
+    r = r[0]
+
+    # detect the pulses with a cell averaging CFAR on the pulse compression
+    with profiler.stage('cfar', r.size) as span:
+        detections = cfar(r, NUM_TRAIN, NUM_GUARD, pfa, sample_rate=fsd)
+        span.samples_out = len(detections)
+
+    # compression peaks at the pulse centres, delayed by the decimation filters
+    n_pw = round(fs * lfm_pw)
+    truth = (pulse_starts.ravel() + n_pw / 2) / (fs / fsd) + chain.delay
+    # count detections on the range sidelobes, 2 samples out, as duplicates
+    score = score_detections(detections, truth, tolerance=3)
+    return dict(x=x, pulse_starts=pulse_starts, lfm=lfm, pulse=pulse, chain=chain, fsd=fsd,
+                bank=bank, xf=xf, r=r, detections=detections, truth=truth, score=score)
 
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-plots', action='store_true',
+                        help='save the plotted arrays to .npz instead of drawing figures')
+    parser.add_argument('--jobs', type=int, help='processes used to draw figures')
+    parser.add_argument('--precision', choices=['double', 'single'], default=get_precision(),
+                        help='floating point precision of the processing chain')
+    parser.add_argument('--planned', action='store_true',
+                        help='decimate with the planned chain instead of the 4, 5, 5, 5 stages')
+    parser.add_argument('--threads', action='store_true',
+                        help='run each receiver stage on its own thread')
+    parser.add_argument('--profile', type=Path,
+                        help='write the time and throughput of each stage to this .json or .csv file')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='also trace the peak memory of each stage, slower')
+    parser.add_argument('--trace', type=Path,
+                        help='write a Chrome trace event file of every stage call')
+    args = parser.parse_args()
+    set_precision(args.precision)
+    profiler = Profiler(enabled=args.profile is not None or args.trace is not None,
+                        memory=args.profile_memory)
+
+    renderer = FigureRenderer(plots=not args.no_plots, processes=args.jobs)
+
+    fs, T, lfm_pw, lfm_bw = DEFAULTS['fs'], DEFAULTS['T'], DEFAULTS['lfm_pw'], DEFAULTS['lfm_bw']
+    snr, num_taps = DEFAULTS['snr'], DEFAULTS['num_taps']
     N = round(fs*T) # number of samples to process
     n_pw = round(fs * lfm_pw) # pulse width in samples
-    num_possible_pulses = round(T / lfm_pw)
 
-    # start by generating noise
-    x = (1/np.sqrt(2)) * (rng.normal(size=N) + 1j*rng.normal(size=N))
-    p_noise = np.var(x)
-
-    # generate LFM at required SNR
-    p_sig = (10**(snr/10)) * p_noise
-    lfm = chirp(fs=fs, pw=lfm_pw, bw=lfm_bw)
-    lfm *= np.sqrt(p_sig) / np.std(lfm)
+    # compare the hand-picked stages with a planned chain for the same rate change
+    hand = design_chain(fs, num_taps, lfm_bw, False)
+    plan = design_chain(fs, num_taps, lfm_bw, True)
+    print('hand-picked decimation chain:')
+    print(hand.report())
+    print('planned decimation chain:')
+    print(plan.report())
+
+    results = run(**DEFAULTS, planned=args.planned, threads=args.threads, profiler=profiler)
+    x, pulse_starts, lfm, pulse = (results[key] for key in ('x', 'pulse_starts', 'lfm', 'pulse'))
+    chain, fsd, bank = results['chain'], results['fsd'], results['bank']
+    xf, r, detections, truth = (results[key] for key in ('xf', 'r', 'detections', 'truth'))
+    if args.threads:
+        # the same chain run one stage after another
+        blocks = (x[i : i + BLOCK_SIZE] for i in range(0, N, BLOCK_SIZE))
+        outputs = receive(blocks, None, None, bank, stages=chain.decimators())
+        xf_seq, r_seq = (np.concatenate(out, axis=-1) for out in zip(*outputs))
+        print('np.array_equal(pipeline, receive):',
+              np.array_equal(xf_seq, xf) and np.array_equal(r_seq[0], r))
+    score = results['score']
+    print(f"CFAR: {score['hits']}/{len(truth)} pulses detected, "
+          f"{score['duplicates']} sidelobe duplicates, {score['false_alarms']} false alarms, "
+          f"mean error {score['mean_error']:.2f} samples")
+    threshold = np.sqrt(cfar_threshold(r, NUM_TRAIN, NUM_GUARD, DEFAULTS['pfa'])) # as a magnitude
 
     # plot the lfm
-    fig, ax = plt.subplots(2, 1)
+    fig, ax = figure('./hw-4/plots/lfm_no_carrier.png', 2, 1)
 
     t = np.arange(n_pw) / fs
     ax[0].plot(t*1e6, lfm.real)
@@ -67,8 +254,7 @@ if __name__ == '__main__':
     ax[0].set_ylabel('Amplitude')
     ax[0].legend(['Real', 'Imag'], loc='upper right')
 
-    f = fftshift(fftfreq(n_pw, d=1/fs))
-    L = 20 * np.log10(np.abs(fftshift(fft(lfm)/n_pw)))
+    f, L = spectrum(lfm, fs)
     ax[1].plot(f/1e6, L)
     ax[1].set_xlim([-lfm_bw*1e-6, lfm_bw*1e-6])
     ax[1].set_ylim([-50, max(L) + 5])
@@ -77,61 +263,40 @@ if __name__ == '__main__':
     ax[1].set_xlabel('Frequency (MHz)')
     ax[1].set_ylabel('Power (dBFS)')
 
-    plt.tight_layout()
-    plt.savefig('./hw-4/plots/lfm_no_carrier.png')
-    plt.close()
-
-    # modulate onto a carrier
-    lfm *= np.exp(2j * np.pi * fc * np.arange(n_pw) / fs)
+    fig.tight_layout()
+    renderer.submit(fig)
 
     # plot the modulated LFM
 
-    fig, ax = plt.subplots(2, 1)
+    fig, ax = figure('./hw-4/plots/lfm_with_carrier.png', 2, 1)
 
     t = np.arange(n_pw) / fs
-    ax[0].plot(t*1e6, lfm.real)
-    ax[0].plot(t*1e6, lfm.imag)
+    ax[0].plot(t*1e6, pulse.real)
+    ax[0].plot(t*1e6, pulse.imag)
     ax[0].grid()
     ax[0].set_title('LFM with Carrier Time Domain')
     ax[0].set_xlabel('Time (us)')
     ax[0].set_ylabel('Amplitude')
     ax[0].legend(['Real', 'Imag'], loc='upper right')
 
-    f = fftshift(fftfreq(n_pw, d=1/fs))
-    L = 20 * np.log10(np.abs(fftshift(fft(lfm)/n_pw)))
+    f, L = spectrum(pulse, fs)
     ax[1].plot(f/1e6, L)
     ax[1].grid()
     ax[1].set_title('LFM with Carrier Power Spectrum')
     ax[1].set_xlabel('Frequency (MHz)')
     ax[1].set_ylabel('Power (dBFS)')
 
-    plt.tight_layout()
-    plt.savefig('./hw-4/plots/lfm_with_carrier.png')
-    plt.close()
-
-    # randomly place the pulses in time and add to noise vector
-    pulse_starts = np.argwhere(rng.integers(low=0,
-                                            high=2,
-                                            size=num_possible_pulses))
-    pulse_starts = pulse_starts * n_pw
-
-    for ps in pulse_starts:
-        sig = np.zeros(N).astype(complex)
-        sig[ps[0] : ps[0]+n_pw] = lfm
-        x += sig
+    fig.tight_layout()
+    renderer.submit(fig)
 
     # plot the received signal
     t = np.arange(N) / fs
-    plt.plot(t * 1e6, 20 * np.log10(np.abs(x)))
-    plt.title(f'Randomly Placed LFM Pulses; SNR={snr}dB')
-    plt.xlabel('Time (us)')
-    plt.ylabel('Power (dBFS)')
-    plt.savefig('./hw-4/plots/received_signal.png')
-    plt.close()
-
-    # The next step is digital demodulation
-    # Because fc = fs/4, we can apply a bandpass filter, then
-    # decimate by 4 to alias our carrier down to baseband
+    fig, ax = figure('./hw-4/plots/received_signal.png')
+    ax.plot(t * 1e6, 20 * np.log10(np.abs(x)))
+    ax.set_title(f'Randomly Placed LFM Pulses; SNR={snr}dB')
+    ax.set_xlabel('Time (us)')
+    ax.set_ylabel('Power (dBFS)')
+    renderer.submit(fig)
 
     # because the oscillator frequency is fs/4, its output will
     # repeat the sequence 1, 1j, -1, -1j
@@ -139,61 +304,46 @@ if __name__ == '__main__':
     osc = np.array([1, 1j, -1, -1j])
     # repeat the oscillator for the length of the filter
     osc = np.tile(osc, np.ceil(num_taps/4).astype(int))[:num_taps]
-    lpf = signal.firwin(num_taps,
-                        cutoff=fs/8,
-                        width=1e6,
-                        fs=fs)
+    lpf, lpf_dec5 = design_filters(fs, num_taps)
     bpf = lpf * osc # combine lpf with osc to get bpf
 
-    eps = np.finfo(bpf.dtype).eps
-
     BPF = 10 * np.log10(fftshift(np.abs(fft(bpf))))
     f = fftshift(fftfreq(len(bpf), d=1/fs))
-    plt.plot(f/1e6, BPF)
-    plt.title('Filter used to Decimate by 4')
-    plt.xlabel('Frequency (MHz)')
-    plt.ylabel('Magnitude Response (dB)')
-    plt.ylim((-50, 10))
-    plt.grid()
-    plt.savefig('./hw-4/plots/bpf_dec4.png')
-    plt.close()
-
-    # apply the filter and decimate
-    xf = np.convolve(x, bpf, mode='same')[::4]
-    fsd = fs/4 # sample rate after decimation
-
-    # going from 1.25GSps to 10MSps
-    # which is a decimation factor of 125
-    # break this down into 3x decimate by 5 stages
-
-    # Create a filter with cutoff fs/5
-    lpf_dec5 = signal.firwin(num_taps, cutoff=1/10, width=1/20, fs=1)
+    fig, ax = figure('./hw-4/plots/bpf_dec4.png')
+    ax.plot(f/1e6, BPF)
+    ax.set_title('Filter used to Decimate by 4')
+    ax.set_xlabel('Frequency (MHz)')
+    ax.set_ylabel('Magnitude Response (dB)')
+    ax.set_ylim((-50, 10))
+    ax.grid()
+    renderer.submit(fig)
+
+    # the bpf taps only differ from the lpf by sign flips and I/Q swaps,
+    # so receive mixes, filters and decimates with the real lpf instead
+    # (tests/test_decimation.py checks it against filtering with the bpf)
 
     LPF_dec5 = 10 * np.log10(np.abs(fftshift(fft(lpf_dec5))))
     f = fftshift(fftfreq(len(LPF_dec5), d=1))
-    plt.plot(f, LPF_dec5)
-    plt.title('Filter used to Decimate by 5')
-    plt.xlabel('Normalized Frequency (f/fs)')
-    plt.ylabel('Magnitude Response (dB)')
-    plt.xlim((-0.5, 0.5))
-    plt.ylim((-50, 10))
-    plt.grid()
-    plt.savefig('./hw-4/plots/lpf_dec5.png')
-    plt.close()
-
-    # apply the filter and decimate in 3 stages
-    for _ in range(3):
-        xf = np.convolve(xf, lpf_dec5)[::5]
-        fsd /= 5
-
-    # perform pulse compression
-    # create the lfm but at our new sample rate after decimation
-    lfm_10 = chirp(fs=fsd, pw=lfm_pw, bw=lfm_bw)
-    r = np.abs(np.correlate(xf, lfm_10, mode='same')) # pulse compression
+    fig, ax = figure('./hw-4/plots/lpf_dec5.png')
+    ax.plot(f, LPF_dec5)
+    ax.set_title('Filter used to Decimate by 5')
+    ax.set_xlabel('Normalized Frequency (f/fs)')
+    ax.set_ylabel('Magnitude Response (dB)')
+    ax.set_xlim((-0.5, 0.5))
+    ax.set_ylim((-50, 10))
+    ax.grid()
+    renderer.submit(fig)
+
+    if profiler.enabled:
+        print(profiler.report())
+        if args.profile is not None:
+            profiler.write(args.profile)
+        if args.trace is not None:
+            profiler.write_trace(args.trace)
 
     # plot received vs processed data vs pulse compresion
 
-    fig, ax = plt.subplots(3, 1)
+    fig, ax = figure('./hw-4/plots/pulse_compression.png', 3, 1)
     t1 = np.arange(len(x)) / fs
     t2 = np.arange(len(xf)) / fsd
     ax[0].plot(t1*1e6, 20 * np.log10(np.abs(x)))
@@ -205,13 +355,17 @@ if __name__ == '__main__':
     ax[1].set_title(f'Signal after decimation to {fsd/1e6}MSps')
     ax[1].set_xlabel('Time (us)')
     ax[1].set_ylabel('Power (dB)')
-    ax[1].set_ylim(ax[0].get_ylim())
+    fig.link_ylim(ax[0], ax[1])
 
     ax[2].plot(t2*1e6, r)
+    ax[2].plot(t2*1e6, threshold)
+    ax[2].plot([d.time*1e6 for d in detections], [r[d.index] for d in detections], 'x')
     ax[2].set_title('Pulse Compression')
+    ax[2].legend(['Corr Mag', 'CFAR Threshold', 'Detections'], loc='upper right')
     ax[2].set_xlabel('Time (us)')
     ax[2].set_ylabel('Corr Mag')
 
-    plt.tight_layout()
-    plt.savefig('./hw-4/plots/pulse_compression.png')
-    plt.close()
+    fig.tight_layout()
+    renderer.submit(fig)
+
+    renderer.close()
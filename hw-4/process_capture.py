@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Run the hw4 receiver chain over an IQ capture file, one block at a time.
+
+Example:
+    python hw-4/process_capture.py capture.iq --format int16 --fs 5e9
+"""
+
+import argparse
+import sys
+from pathlib import Path
+import numpy as np
+from scipy import signal
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1])) # repo root, for the dsp package
+from dsp import CFARDetector, IQCapture, MatchedFilterBank, SignalMetrics, receive
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('capture', type=Path, help='interleaved IQ file with the carrier at fs/4')
+    parser.add_argument('--format', default='complex64', choices=['int16', 'float32', 'complex64'])
+    parser.add_argument('--fs', type=float, default=5e9, help='sample rate in Sps')
+    parser.add_argument('--pw', type=float, default=10e-6, help='LFM pulse width in seconds')
+    parser.add_argument('--bw', type=float, default=8e6, help='LFM bandwidth in Hz')
+    parser.add_argument('--num-taps', type=int, default=64, help='taps per filter')
+    parser.add_argument('--block-size', type=int, default=2**22, help='samples read per block')
+    parser.add_argument('--pfa', type=float, default=1e-6, help='CFAR false alarm probability')
+    parser.add_argument('--output', type=Path, help='write the pulse compression magnitude here as float32')
+    args = parser.parse_args()
+
+    capture = IQCapture(args.capture, fmt=args.format, block_size=args.block_size)
+    fsd = args.fs / 4 / 5**3 # sample rate after decimation
+
+    lpf = signal.firwin(args.num_taps, cutoff=args.fs/8, width=1e6, fs=args.fs)
+    lpf_dec5 = signal.firwin(args.num_taps, cutoff=1/10, width=1/20, fs=1)
+    bank = MatchedFilterBank.lfm(fs=fsd, pulses=[(args.pw, args.bw)])
+
+    detector = CFARDetector(num_train=16, num_guard=4, pfa=args.pfa, sample_rate=fsd)
+    detections = []
+
+    out = open(args.output, 'wb') if args.output is not None else None
+
+    received = SignalMetrics() # tap on the input blocks
+    compressed = SignalMetrics()
+    blocks = (received.update(block) for block in capture.complex_blocks())
+    for _, (r,) in receive(blocks, lpf, lpf_dec5, bank):
+        compressed.update(r)
+        detections += detector.process(r)
+        if out is not None:
+            r.astype(np.float32).tofile(out)
+
+    detections += detector.flush()
+
+    if out is not None:
+        out.close()
+
+    print(f'{capture.num_samples} samples in, {compressed.count} samples out at {fsd/1e6}MSps')
+    print(f'input power: {received.power_db():.2f}dB, peak {received.peak:.4g}')
+    print(f'strongest return: {compressed.peak:.4g} at {compressed.peak_index / fsd * 1e6:.2f}us')
+    print(f'{len(detections)} CFAR detections')
+    for d in detections:
+        print(f'  {d.time * 1e6:10.2f}us  SNR {d.snr:6.2f}dB')
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""Run many hw4 scenarios in one pool of warm worker processes.
+
+A scenario file is JSON, either a list of scenarios or an object with a
+"scenarios" list and "defaults" applied to each of them. A scenario sets
+any of the hw4 constants in DEFAULTS and an optional name. Each scenario
+is run by hw4.run, which simulates the received signal and runs the
+receiver chain and CFAR as hw4.py does, and adds one row of metrics to the
+results table.
+
+Worker processes are reused from scenario to scenario, so imports are
+paid once per worker. Designed filters, decimation plans and matched
+filter banks, with their reference chirp spectra, are cached in each
+worker and shared by every scenario with the same parameters. Scenarios
+are handed out grouped by those parameters, so the same worker designs
+them once.
+
+Example:
+    python hw-4/run_scenarios.py hw-4/scenarios.json -o results.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1])) # repo root, for the dsp package
+from dsp import get_fft_backend, set_fft_backend, use_precision
+from dsp.transforms import FFT_WORKERS_ENV
+import hw4
+
+# the constants of hw4.py, and how the chain is run
+DEFAULTS = dict(hw4.DEFAULTS, planned=False, precision='double')
+METRICS = ('detections', 'hits', 'misses', 'duplicates', 'false_alarms', 'pd', 'mean_error',
+           'peak_snr', 'seconds')
+
+def load_scenarios(path: Path) -> list:
+    """Scenarios in a JSON file, each with every key of DEFAULTS and a name."""
+    spec = json.loads(Path(path).read_text())
+    if isinstance(spec, list):
+        spec = dict(scenarios=spec)
+    defaults = dict(DEFAULTS, **spec.get('defaults', {}))
+    scenarios = []
+    for i, scenario in enumerate(spec['scenarios']):
+        unknown = set(scenario) - set(DEFAULTS) - {'name'}
+        if unknown:
+            raise ValueError(f'scenario {i} has unknown keys {sorted(unknown)}')
+        scenarios.append(dict(dict(defaults, name=f'scenario{i}'), **scenario))
+    return scenarios
+
+def _design_key(scenario: dict) -> tuple:
+    """Parameters the designs of a scenario depend on."""
+    return tuple(scenario[key] for key in ('fs', 'num_taps', 'lfm_pw', 'lfm_bw', 'planned', 'precision'))
+
+def run_scenario(scenario: dict, noise_workers: Optional[int] = None) -> dict:
+    """Simulate, receive and detect one scenario with hw4.run.
+
+    Args:
+        scenario (dict): Scenario from load_scenarios
+        noise_workers (int, optional): Threads drawing the noise. Defaults to
+            all CPUs.
+
+    Returns:
+        dict: The scenario with the METRICS of its detections added
+    """
+    start = time.perf_counter()
+    with use_precision(scenario['precision']):
+        results = hw4.run(**{key: scenario[key] for key in hw4.DEFAULTS},
+                          planned=scenario['planned'], noise_workers=noise_workers)
+    detections, score = results['detections'], results['score']
+    peak_snr = max((d.snr for d in detections), default=float('nan'))
+    return dict(scenario, detections=len(detections), peak_snr=peak_snr,
+                seconds=time.perf_counter() - start,
+                **{key: score[key] for key in METRICS if key in score})
+
+_worker_started = False
+
+def _run_in_worker(scenario: dict) -> dict:
+    """run_scenario in a pool worker, which shares the CPUs with the others."""
+    global _worker_started
+    if not _worker_started:
+        if not os.environ.get(FFT_WORKERS_ENV):
+            set_fft_backend(get_fft_backend(), workers=1) # the workers already fill the CPUs
+        _worker_started = True
+    return run_scenario(scenario, noise_workers=1) # one thread per worker, as for the FFTs
+
+def run_scenarios(scenarios: list, processes: Optional[int] = None) -> list:
+    """Run scenarios in a process pool.
+
+    Args:
+        scenarios (list of dict): Scenarios from load_scenarios
+        processes (int, optional): Worker processes. Defaults to os.cpu_count().
+            Use 1 to run in the calling process.
+
+    Returns:
+        list of dict: Results in the order of scenarios
+    """
+    # scenarios sharing designs go out next to each other, mostly to the same worker
+    order = sorted(range(len(scenarios)), key=lambda i: _design_key(scenarios[i]))
+    ordered = [scenarios[i] for i in order]
+    processes = processes or os.cpu_count()
+    if processes == 1 or len(scenarios) <= 1:
+        results = [run_scenario(scenario) for scenario in ordered]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        chunksize = max(1, len(ordered) // (4 * processes))
+        with ProcessPoolExecutor(processes) as pool:
+            results = list(pool.map(_run_in_worker, ordered, chunksize=chunksize))
+    out = [None] * len(scenarios)
+    for i, result in zip(order, results):
+        out[i] = result
+    return out
+
+def write_results(path: Path, results: list):
+    """Write the results table to a .csv file, or JSON for any other suffix."""
+    if path.suffix.lower() == '.csv':
+        with path.open('w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['name'] + list(DEFAULTS) + list(METRICS))
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        path.write_text(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenarios', type=Path, help='JSON file of scenarios')
+    parser.add_argument('-o', '--output', type=Path, help='write the results table to this .csv or .json file')
+    parser.add_argument('--processes', type=int, help='worker processes, 1 to run in this one (default all CPUs)')
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.scenarios)
+    start = time.perf_counter()
+    results = run_scenarios(scenarios, args.processes)
+
+    print(f"{'name':>16} {'snr':>5} {'bw (MHz)':>8} {'pw (us)':>7} {'seed':>6} {'hits':>9} {'dup':>4} "
+          f"{'false':>5} {'error':>6} {'peak SNR':>8} {'seconds':>8}")
+    for row in results:
+        print(f"{row['name']:>16} {row['snr']:>5} {row['lfm_bw']/1e6:>8.3g} {row['lfm_pw']*1e6:>7.3g} "
+              f"{row['rng_seed']:>6} {row['hits']:>4}/{row['hits'] + row['misses']:<4} "
+              f"{row['duplicates']:>4} {row['false_alarms']:>5} {row['mean_error']:>6.2f} "
+              f"{row['peak_snr']:>8.2f} {row['seconds']:>8.2f}")
+    print(f'{len(results)} scenarios in {time.perf_counter() - start:.1f}s')
+
+    if args.output is not None:
+        write_results(args.output, results)
@@ -0,0 +1,12 @@
+import pytest
+
+from dsp.convolution import CALIBRATION_ENV
+from dsp.sweep import CACHE_ENV
+
+@pytest.fixture(autouse=True)
+def calibration_path(tmp_path, monkeypatch):
+    """Keep every test on the default cost models, away from the user's calibration."""
+    path = tmp_path / 'convolution.json'
+    monkeypatch.setenv(CALIBRATION_ENV, str(path))
+    monkeypatch.setenv(CACHE_ENV, str(tmp_path / 'sweeps')) # nor the user's sweep results
+    return path
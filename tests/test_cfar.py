@@ -0,0 +1,23 @@
+import warnings
+import numpy as np
+import pytest
+
+from dsp import cfar, cfar_threshold
+
+@pytest.mark.parametrize('method', ['ca', 'os'])
+@pytest.mark.parametrize('n', [1, 10, 20])
+def test_untrained_cells_never_detect(method, n):
+    # no cell of a signal shorter than guard + training cells on one side has training cells
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        threshold = cfar_threshold(np.ones(n), 16, 4, 1e-6, method=method)
+        detections = cfar(np.ones(n), 16, 4, 1e-6, method=method)
+    assert np.all(threshold == np.inf)
+    assert detections == []
+
+def test_one_sided_training_at_the_ends():
+    # with 20 guard and training cells per side, cells 0-9 only train ahead,
+    # 20-29 only behind and 10-19 on neither side
+    threshold = cfar_threshold(np.ones(30), 16, 4, 1e-6)
+    assert np.all(np.isfinite(threshold[:10])) and np.all(np.isfinite(threshold[20:]))
+    assert np.all(threshold[10:20] == np.inf)
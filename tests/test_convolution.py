@@ -0,0 +1,31 @@
+import json
+import time
+import numpy as np
+
+from dsp import decimate, use_fft_backend
+from dsp.convolution import DEFAULT_CALIBRATION, _machine, load_calibration
+
+def test_default_models_without_calibration(calibration_path):
+    start = time.perf_counter()
+    decimate(np.ones(100), np.ones(8), 4)
+    assert time.perf_counter() - start < 1 # nothing is timed
+    assert load_calibration() is DEFAULT_CALIBRATION
+    assert not calibration_path.exists()
+
+def saved_models(path, machine) -> dict:
+    models = {kind: dict(direct=[1.0, 0.0], fft=[0.0, 0.0], overlap_save=[1.0, 1.0])
+              for kind in DEFAULT_CALIBRATION['models']}
+    path.write_text(json.dumps(dict(machine=machine, models=models)))
+    return models
+
+def test_saved_calibration_is_used(calibration_path):
+    models = saved_models(calibration_path, _machine())
+    assert load_calibration()['models'] == models
+
+def test_calibration_follows_the_fft_backend(calibration_path):
+    with use_fft_backend('numpy'):
+        models = saved_models(calibration_path, _machine())
+        assert load_calibration()['models'] == models
+    # timed with numpy.fft, so not used for the backend in use outside
+    if _machine()['fft'] != 'numpy':
+        assert load_calibration() is DEFAULT_CALIBRATION
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+from dsp import FS4Downconverter, PolyphaseDecimator, decimate, fs4_downconvert
+
+def bandpass(taps: np.ndarray) -> np.ndarray:
+    """The fs/4 mixer folded into the taps, as hw4 builds its bpf."""
+    return taps * 1j**np.arange(len(taps))
+
+def received(n: int, complex_input: bool, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    x = rng.standard_normal(n)
+    if complex_input:
+        x = x + 1j * rng.standard_normal(n)
+    return x
+
+def stream(dec, x: np.ndarray, sizes) -> np.ndarray:
+    """Feed x through dec in blocks cycling through sizes, then flush."""
+    out, start, k = [], 0, 0
+    while start < len(x):
+        out.append(dec.process(x[start : start + sizes[k % len(sizes)]]))
+        start += sizes[k % len(sizes)]
+        k += 1
+    out.append(dec.flush())
+    return np.concatenate(out)
+
+@pytest.mark.parametrize('complex_input', [False, True])
+@pytest.mark.parametrize('num_taps', [64, 63])
+@pytest.mark.parametrize('n', [1000, 1001, 40])
+@pytest.mark.parametrize('mode', ['full', 'same'])
+def test_fs4_downconvert_matches_bandpass(mode, n, num_taps, complex_input):
+    taps = signal.firwin(num_taps, 0.2)
+    x = received(n, complex_input)
+    expected = np.convolve(x, bandpass(taps), mode=mode)[::4]
+    assert np.allclose(fs4_downconvert(x, taps, mode=mode), expected, rtol=1e-12, atol=1e-12)
+
+@pytest.mark.parametrize('complex_input', [False, True])
+@pytest.mark.parametrize('sizes', [[1], [7], [3, 11, 1, 5], [1001]])
+def test_fs4_downconverter_streamed(sizes, complex_input):
+    taps = signal.firwin(64, 0.2)
+    x = received(1001, complex_input)
+    expected = np.convolve(x, bandpass(taps))[::4]
+    y = stream(FS4Downconverter(taps), x, sizes)
+    assert np.allclose(y, expected, rtol=1e-12, atol=1e-12)
+
+@pytest.mark.parametrize('complex_input', [False, True])
+@pytest.mark.parametrize('sizes', [[5], [3, 11, 1, 5]])
+def test_fs4_downconverter_streamed_same(sizes, complex_input):
+    # the centred phase hw4 streams with, trimmed to the 'same' length
+    taps = signal.firwin(64, 0.2)
+    x = received(1001, complex_input)
+    expected = np.convolve(x, bandpass(taps), mode='same')[::4]
+    y = stream(FS4Downconverter(taps, phase=(len(taps) - 1) // 2), x, sizes)[: len(expected)]
+    assert np.allclose(y, expected, rtol=1e-12, atol=1e-12)
+
+@pytest.mark.parametrize('sizes', [[13], [3, 11, 1, 5]])
+def test_polyphase_decimator_streamed(sizes):
+    taps = signal.firwin(31, 0.15)
+    x = received(997, complex_input=True)
+    expected = np.convolve(x, taps)[2::5]
+    assert np.allclose(stream(PolyphaseDecimator(taps, 5, phase=2), x, sizes), expected,
+                       rtol=1e-12, atol=1e-12)
+    assert np.allclose(decimate(x, taps, 5, mode='same'), np.convolve(x, taps, mode='same')[::5],
+                       rtol=1e-12, atol=1e-12)
+
+@pytest.mark.parametrize('axis', [0, 1])
+def test_channels_match_single_channel_calls(axis):
+    taps = signal.firwin(31, 0.15)
+    x = np.stack([received(997, True, seed) for seed in range(3)], axis=1 - axis)
+    for func, kwargs in [(decimate, dict(factor=5)), (fs4_downconvert, {})]:
+        for mode in ['full', 'same']:
+            y = func(x, taps, mode=mode, axis=axis, **kwargs)
+            for k in range(3):
+                assert np.allclose(np.take(y, k, axis=1 - axis),
+                                   func(np.take(x, k, axis=1 - axis), taps, mode=mode, **kwargs),
+                                   rtol=1e-12, atol=1e-12)
+
+@pytest.mark.parametrize('axis', [0, 1])
+def test_channels_streamed(axis):
+    taps = signal.firwin(64, 0.2)
+    x = np.stack([received(1001, False, seed) for seed in range(2)], axis=1 - axis)
+    for dec, single in [(FS4Downconverter(taps, axis=axis), FS4Downconverter(taps)),
+                        (PolyphaseDecimator(taps, 5, 2, axis=axis), PolyphaseDecimator(taps, 5, 2))]:
+        blocks = np.split(x, [3, 14, 15, 500], axis=axis)
+        y = np.concatenate([dec.process(block) for block in blocks] + [dec.flush()], axis=axis)
+        for k in range(2):
+            assert np.allclose(np.take(y, k, axis=1 - axis),
+                               stream(single, np.take(x, k, axis=1 - axis), [3, 11, 1, 485]),
+                               rtol=1e-12, atol=1e-12)
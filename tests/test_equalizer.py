@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from dsp.equalizer import _bands, design_inverse_sinc, equalizer_response
+
+@pytest.mark.parametrize('factor, passband, num_taps', [(10, 0.45, 255), (4, 0.4, 63), (8, 0.3, 101)])
+def test_equiripple_levels_the_error(factor, passband, num_taps):
+    f, desired, n_pass = _bands(factor, passband, 16, num_taps)
+    peak = {}
+    for method in ('ls', 'equiripple'):
+        taps = design_inverse_sinc(factor, passband, num_taps, method=method)
+        assert np.array_equal(taps, taps[::-1])
+        peak[method] = np.max(np.abs(equalizer_response(taps, f) - desired))
+    assert peak['equiripple'] < peak['ls']
+    # alternation theorem: the minimax error peaks num_taps // 2 + 2 times at its maximum
+    taps = design_inverse_sinc(factor, passband, num_taps, method='equiripple')
+    error = np.abs(equalizer_response(taps, f) - desired)
+    num_peaks = 0
+    for band in (error[:n_pass], error[n_pass:]):
+        padded = np.concatenate([[0], band, [0]])
+        num_peaks += np.sum((band >= padded[:-2]) & (band >= padded[2:]) & (band >= 0.99 * error.max()))
+    assert num_peaks >= num_taps // 2 + 2
@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'hw-4')) # for the hw4 script
+import hw4
+
+def test_planned_chain_matches_hand_picked():
+    scenario = dict(hw4.DEFAULTS, T=2e-4)
+    hand, planned = hw4.run(**scenario), hw4.run(**scenario, planned=True)
+    assert hand['fsd'] == planned['fsd']
+    for results in (hand, planned):
+        assert results['score']['hits'] == len(results['truth']) > 0
+        assert results['score']['false_alarms'] == 0
+        assert results['score']['mean_error'] <= 1
+
+    # the filters differ, so compare the compression peaks and noise floor,
+    # each chain's output aligned by its own delay
+    peaks = [np.abs(results['r'][np.round(results['truth']).astype(int)]) for results in (hand, planned)]
+    np.testing.assert_allclose(peaks[1], peaks[0], rtol=0.1)
+    floors = [np.median(np.abs(results['r'])) for results in (hand, planned)]
+    np.testing.assert_allclose(floors[1], floors[0], rtol=0.1)
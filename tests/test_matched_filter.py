@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from dsp import MatchedFilterBank, matched_filter
+
+def signal(rng: np.random.Generator, n: int) -> np.ndarray:
+    return rng.standard_normal(n) + 1j * rng.standard_normal(n)
+
+@pytest.mark.parametrize('n, m', [(1, 9), (4, 9), (5, 9), (4, 8), (5, 8), (8, 8), (9, 8), (100, 9)])
+def test_matches_np_correlate_same(n, m):
+    rng = np.random.default_rng(n * 100 + m)
+    x, ref = signal(rng, n), signal(rng, m)
+    y = matched_filter(x, [ref, 2 * ref])
+    assert y.shape == (2, max(n, m))
+    np.testing.assert_allclose(y[0], np.correlate(x, ref, mode='same'), atol=1e-12)
+    np.testing.assert_allclose(y[1], np.correlate(x, 2 * ref, mode='same'), atol=1e-12)
+
+def test_short_channels_on_axis_0():
+    rng = np.random.default_rng(0)
+    x, ref = signal(rng, 5), signal(rng, 9)
+    y = matched_filter(np.stack([x, 2 * x], axis=1), [ref], axis=0)
+    assert y.shape == (1, 9, 2)
+    for k in range(2):
+        np.testing.assert_allclose(y[0, :, k], np.correlate((k + 1) * x, ref, mode='same'),
+                                   atol=1e-12)
+
+@pytest.mark.parametrize('axis', [0, 1])
+@pytest.mark.parametrize('n', [40, 3000])
+def test_channels_match_single_channel_calls(n, axis):
+    rng = np.random.default_rng(n)
+    x = np.stack([signal(rng, n) for _ in range(3)], axis=1 - axis)
+    refs = [signal(rng, 9), signal(rng, 32)]
+    y = matched_filter(x, refs, axis=axis)
+    for k in range(3):
+        # the references axis goes in before the samples, (n, 3) gives (2, n, 3)
+        np.testing.assert_allclose(np.take(y, k, axis=2 if axis == 0 else 0),
+                                   matched_filter(np.take(x, k, axis=1 - axis), refs), atol=1e-12)
+
+@pytest.mark.parametrize('axis', [0, 1])
+def test_channels_streamed(axis):
+    rng = np.random.default_rng(1)
+    x = np.stack([signal(rng, 2000) for _ in range(2)], axis=1 - axis)
+    refs = [signal(rng, 9), signal(rng, 32)]
+    bank = MatchedFilterBank(refs, axis=axis)
+    y = np.concatenate([bank.process(block) for block in np.split(x, [1, 50, 1500], axis=axis)]
+                       + [bank.flush()], axis=axis + 1)
+    for k in range(2):
+        np.testing.assert_allclose(np.take(y, k, axis=2 if axis == 0 else 0),
+                                   matched_filter(np.take(x, k, axis=1 - axis), refs), atol=1e-12)
+
+def test_short_input_needs_equal_references():
+    with pytest.raises(ValueError):
+        matched_filter(np.ones(5), [np.ones(9), np.ones(7)])
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from dsp import plan_decimation
+
+@pytest.mark.parametrize('input_rate, output_rate, passband, kwargs', [
+    (5e9, 10e6, 4e6, dict(fs4=True)), # hw4
+    (48000, 1000, 400, {}),
+    (1e6, 1e6 / 12, 30e3, dict(method='remez', stopband_atten=80, ripple=0.2)),
+])
+def test_plan_meets_specification(input_rate, output_rate, passband, kwargs):
+    plan = plan_decimation(input_rate, output_rate, passband, **kwargs)
+    assert np.prod(plan.factors) == round(input_rate / output_rate)
+    assert np.isclose(plan.output_rate, output_rate)
+
+    f = np.linspace(0, input_rate / 2, 20001)
+    gain = 20 * np.log10(np.maximum(plan.response(f), 1e-300))
+    ripple = kwargs.get('ripple', 0.1)
+    in_band = f <= passband
+    assert np.all(np.abs(gain[in_band]) <= ripple * 1.01) # the stage ripples compound slightly
+    # everything that folds into the passband at the output rate
+    aliases = (np.abs((f + output_rate / 2) % output_rate - output_rate / 2) <= passband) & ~in_band
+    assert np.all(gain[aliases] <= -kwargs.get('stopband_atten', 60))
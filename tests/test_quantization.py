@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from dsp import (SNRMetrics, get_quantization_levels, multitone, quantization_sqnr, quantize,
+                 use_precision)
+
+def nearest(x: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """Brute force quantizer, the lowest of the nearest levels."""
+    return levels[np.argmin(np.abs(x[..., None] - levels), axis=-1)]
+
+@pytest.mark.parametrize('levels', [
+    np.array([-2, -1, 0, 1, 2]), # integer, uniform
+    np.array([-3, -1, 0, 4]), # integer, non-uniform
+    np.array([-1.5, -0.2, 0.1, 2.0]), # float, non-uniform
+    get_quantization_levels(2, 3),
+])
+def test_complex_matches_each_rail(levels):
+    rng = np.random.default_rng(0)
+    x = 2 * (rng.standard_normal(1000) + 1j * rng.standard_normal(1000))
+    q = quantize(x, levels)
+    assert np.iscomplexobj(q)
+    assert np.array_equal(q.real, nearest(x.real, levels.astype(float)))
+    assert np.array_equal(q.imag, nearest(x.imag, levels.astype(float)))
+
+def test_complex_integer_levels():
+    q = quantize(np.array([0.4 + 1.6j, -2.2 - 0.1j]), np.array([-2, -1, 0, 1, 2]))
+    assert np.array_equal(q, [0 + 2j, -2 + 0j])
+
+def test_real_matches_brute_force():
+    rng = np.random.default_rng(1)
+    x = 3 * rng.standard_normal((7, 300))
+    levels = np.array([-2.5, -1, 0, 0.5, 3])
+    assert np.array_equal(quantize(x, levels, chunk_size=64), nearest(x, levels))
+
+@pytest.mark.parametrize('precision', ['double', 'single'])
+@pytest.mark.parametrize('complex_input', [True, False])
+def test_batched_sqnr_matches_quantize(precision, complex_input):
+    bits = np.array([[1, 2, 4], [8, 12, 16]])
+    with use_precision(precision):
+        x = multitone(3000, [100, 200, 300], 300e-3) / 3
+        x = x if complex_input else x.real
+        sqnr = quantization_sqnr(x, 0.9, bits)
+        assert sqnr.shape == bits.shape
+        for i in np.ndindex(bits.shape):
+            metrics = SNRMetrics()
+            metrics.update(x, quantize(x, get_quantization_levels(0.9, bits[i])))
+            assert sqnr[i] == metrics.snr
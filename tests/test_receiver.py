@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from dsp import MatchedFilterBank, Pipeline, receive, receiver_pipeline
+
+def chain():
+    rng = np.random.default_rng(0)
+    lpf = rng.standard_normal(32)
+    lpf_dec5 = rng.standard_normal(16)
+    bank = MatchedFilterBank([rng.standard_normal(24) + 1j * rng.standard_normal(24),
+                              rng.standard_normal(10) + 0j])
+    return lpf, lpf_dec5, bank
+
+def blocks(x, sizes):
+    i = 0
+    while i < x.shape[-1]:
+        for size in sizes:
+            yield x[..., i : i + size]
+            i += size
+
+@pytest.mark.parametrize('sizes', [[4096], [1000, 37, 2503], [1, 2, 997]])
+@pytest.mark.parametrize('channels', [(), (2,)])
+def test_pipeline_matches_receive(sizes, channels):
+    rng = np.random.default_rng(1)
+    x = rng.standard_normal(channels + (9001,)) + 1j * rng.standard_normal(channels + (9001,))
+    lpf, lpf_dec5, bank = chain()
+    xf, r = (np.concatenate(out, axis=-1)
+             for out in zip(*receive(blocks(x, sizes), lpf, lpf_dec5, bank, num_dec5=2)))
+    pipeline = receiver_pipeline(lpf, lpf_dec5, bank, num_dec5=2, capacity=2048)
+    xf_threads, r_threads = pipeline.run(blocks(x, sizes), outputs=[-2, -1])
+    assert np.array_equal(xf_threads, xf)
+    assert np.array_equal(r_threads, r)
+
+class Failing:
+    """Passes blocks through and fails on the third."""
+
+    def reset(self):
+        self.calls = 0
+
+    def process(self, x):
+        self.calls += 1
+        if self.calls == 3:
+            raise ZeroDivisionError('stage failed')
+        return x
+
+    def flush(self):
+        return np.zeros(0)
+
+def test_stage_error_reaches_the_caller():
+    lpf, lpf_dec5, bank = chain()
+    x = np.ones(50000, dtype=complex)
+    pipeline = receiver_pipeline(lpf, lpf_dec5, bank, num_dec5=2, capacity=1024)
+    pipeline.stages.insert(1, ('failing', Failing()))
+    with pytest.raises(ZeroDivisionError, match='stage failed'):
+        pipeline.run(blocks(x, [1000]))
+    with pytest.raises(ZeroDivisionError, match='stage failed'):
+        list(pipeline.stream(blocks(x, [1000])))
+
+def test_source_error_reaches_the_caller():
+    def source():
+        yield np.ones(100)
+        raise KeyError('source failed')
+
+    with pytest.raises(KeyError, match='source failed'):
+        Pipeline([('failing', Failing()), ('pass', Failing())]).run(source())
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from dsp import NoiseSource, PulseScenario, complex_noise
+
+B = 1000 # small noise blocks, so short draws cross several of them
+
+def test_any_worker_count_gives_the_same_noise():
+    with NoiseSource(7, block_size=B, workers=1) as serial, \
+            NoiseSource(7, block_size=B, workers=4) as threaded:
+        assert np.array_equal(serial.generate(10500), threaded.generate(10500))
+
+def test_blocks_are_spawned_children_of_the_seed():
+    x = NoiseSource(7, block_size=B, workers=1).generate(3 * B)
+    children = np.random.SeedSequence(7).spawn(3)
+    for k, child in enumerate(children):
+        expected = complex_noise(B, rng=np.random.default_rng(child), dtype=x.dtype)
+        assert np.array_equal(x[k * B : (k + 1) * B], expected)
+
+@pytest.mark.parametrize('workers', [1, 4])
+@pytest.mark.parametrize('offset, n', [(0, 1), (999, 2), (1500, 1000), (250, 4321), (3000, 7)])
+def test_offset_draw_is_a_slice_of_the_whole(workers, offset, n):
+    whole = NoiseSource(7, block_size=B, workers=1).generate(6000)
+    with NoiseSource(7, block_size=B, workers=workers) as source:
+        assert np.array_equal(source.generate(n, offset), whole[offset : offset + n])
+
+@pytest.mark.parametrize('block_size', [7, 333, 1000, 4096, 20000])
+def test_scenario_blocks_concatenate_to_the_whole(block_size):
+    pulse = np.exp(1j * np.linspace(0, 3, 50))
+    starts = [0, 480, 990, 4000, 9960]
+    with PulseScenario(10000, pulse, starts, amplitudes=[1, 2j, 3, 4, 5], seed=11,
+                       workers=2) as scenario:
+        whole = scenario.generate()
+        # each block is overwritten by the next, so copy it
+        blocks = [block.copy() for block in scenario.blocks(block_size)]
+    assert np.array_equal(np.concatenate(blocks), whole)
@@ -0,0 +1,29 @@
+import numpy as np
+
+from dsp import code_hash, sweep
+
+def scaled(scale: float):
+    """A function scale * x, all with the same module and name, as if edited."""
+    namespace = dict(__name__=__name__)
+    exec(f'def scaled(x, offset):\n    return {scale} * x + offset\n', namespace)
+    return namespace['scaled']
+
+def test_code_hash_follows_the_code():
+    assert code_hash(scaled(2)) == code_hash(scaled(2))
+    assert code_hash(scaled(2)) != code_hash(scaled(3))
+
+def test_cached_points_are_reused(tmp_path):
+    grid = dict(x=[1, 2, 3], offset=[0, 10])
+    first = sweep(scaled(2), grid, batch=['x'], cache_dir=tmp_path, processes=1)
+    again = sweep(scaled(2), grid, batch=['x'], cache_dir=tmp_path, processes=1)
+    assert first.computed == 6 and again.computed == 0
+    assert np.array_equal(again.data, [[2, 12], [4, 14], [6, 16]])
+
+def test_edited_function_is_recomputed(tmp_path):
+    grid = dict(x=[1, 2, 3], offset=[0])
+    sweep(scaled(2), grid, batch=['x'], cache_dir=tmp_path, processes=1)
+    edited = sweep(scaled(3), grid, batch=['x'], cache_dir=tmp_path, processes=1)
+    assert edited.computed == 3
+    assert np.array_equal(edited.data[:, 0], [3, 6, 9])
+    bumped = sweep(scaled(3), grid, batch=['x'], cache_dir=tmp_path, processes=1, version=2)
+    assert bumped.computed == 3